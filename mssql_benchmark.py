@@ -0,0 +1,326 @@
+#!/usr/bin/env -S uv run --script
+
+# Benchmark of the copy modes of mssql_copy_table.py on synthetic tables, e.g. on a local sql server container:
+# docker run -e "ACCEPT_EULA=Y" -e "MSSQL_SA_PASSWORD=MyPassw0rd!" -p 1433:1433 -d mcr.microsoft.com/mssql/server:2022-latest
+
+import pyodbc
+from time import perf_counter
+from datetime import datetime
+from typing import List, Dict, NamedTuple
+
+import sys, traceback
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+
+from mssql_connection import create_connection
+from mssql_copy_table import (copy_data, create_table, drop_table_if_exists, table_exists, execute_sql,
+                              clear_catalog_cache, estimate_row_bytes, get_row_count,
+                              PAGING_KEYSET, PAGING_OFFSET, PAGING_STREAM, WRITER_BCP, WRITER_BULK_INSERT)
+
+KEY_INT = 'int'
+KEY_BIGINT = 'bigint'
+KEY_COMPOSITE = 'composite'
+KEY_NONE = 'none'
+
+class TableSpec(NamedTuple):
+    name: str
+    key: str = KEY_INT
+    columns: int = 10 # number of int, varchar and datetime2 columns (in turns)
+    decimals: int = 0
+    lobs: int = 0
+    identity: bool = False
+
+# default tables if no --spec is given
+DEFAULT_SPECS = [
+    TableSpec('bench_narrow', KEY_INT, columns=5, identity=True),
+    TableSpec('bench_wide_decimal', KEY_BIGINT, columns=40, decimals=10),
+    TableSpec('bench_composite', KEY_COMPOSITE, columns=10, decimals=2),
+    TableSpec('bench_heap', KEY_NONE, columns=10),
+    TableSpec('bench_lob', KEY_INT, columns=5, lobs=2),
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the copy modes of mssql_copy_table on synthetic tables (source and target schema in the same database)')
+
+    parser.add_argument('--driver', dest='driver', default='{ODBC Driver 18 for SQL Server}', help='database server driver (default: %(default)s)')
+    parser.add_argument('--server', dest='server', default='localhost', help='database server name (default: %(default)s)')
+    parser.add_argument('--db', dest='db', default='master', help='database name (default: %(default)s)')
+    parser.add_argument('--authentication', dest='authentication', default='UsernamePassword', help='database authentication. Possible to use AzureActiveDirectory (default: %(default)s)')
+    parser.add_argument('--user', dest='user', default='sa', help='database username, if authentication is set to UsernamePassword (default: %(default)s)')
+    parser.add_argument('--password', dest='password', help='database password, if authentication is set to UsernamePassword')
+    parser.add_argument('--source-schema', dest='source_schema', default='benchmark_source', help='schema of the generated source tables (default: %(default)s)')
+    parser.add_argument('--target-schema', dest='target_schema', default='benchmark_target', help='schema the tables are copied to (default: %(default)s)')
+
+    parser.add_argument('--rows', dest='rows', default=100000, type=int, help='Number of rows of every generated table. (default: %(default)d)')
+    parser.add_argument('--spec', dest='specs', action='append', default=None, help='Table to generate as "NAME:key=int|bigint|composite|none,columns=N,decimals=N,lobs=N,identity=0|1", can be repeated. (default: a narrow, a wide decimal, a composite key, a heap and a LOB table)')
+    parser.add_argument('--regenerate', dest='regenerate', default=False, action=argparse.BooleanOptionalAction, help='Generate the source tables again, even if they exist with the requested number of rows. (default: %(default)s)')
+    parser.add_argument('--mode', dest='modes', nargs='+', action='extend', default=None, help=f'Copy modes to run (default: all available modes of {", ".join(get_modes(None).keys())})')
+    parser.add_argument('--page-size', dest='page_size', default=50000, type=int, help='Page size of the copy modes. (default: %(default)d)')
+    parser.add_argument('--repeat', dest='repeat', default=1, type=int, help='Number of runs per table and mode, the median is reported. (default: %(default)d)')
+    parser.add_argument('--bulk-dir', dest='bulk_dir', default=None, help='Directory for the data files of the bcp and bulk-insert modes, the bulk-insert mode only runs if it is set. (default: %(default)s)')
+    parser.add_argument('--bulk-server-dir', dest='bulk_server_dir', default=None, help='Path of "--bulk-dir" as seen by the sql server (e.g. the mount point in the container). (default: same as --bulk-dir)')
+    parser.add_argument('--bcp-path', dest='bcp_path', default='bcp', help='Path of the bcp executable, the bcp mode only runs if it is found. (default: %(default)s)')
+
+    parser.add_argument('--report', dest='report_file_name', default='benchmark-report.json', help='File the report is written to (JSON). (default: %(default)s)')
+    parser.add_argument('--baseline', dest='baseline_file_name', default=None, help='Report of an earlier run to compare with. (default: %(default)s)')
+    parser.add_argument('--tolerance', dest='tolerance', default=10.0, type=float, help='Percent the rows/sec may be lower than the baseline before it is reported as regression. (default: %(default)s)')
+    parser.add_argument('--fail-on-regression', dest='fail_on_regression', default=False, action=argparse.BooleanOptionalAction, help='Exit with an error code if a regression was found. (default: %(default)s)')
+
+    parser.add_argument('--debug-sql', dest='debug_sql', default = False, action='store_true', help='If enabled, prints sql statements. (default: %(default)d)')
+
+    return parser
+
+def parse_spec(text) -> TableSpec:
+    name, _, options = text.partition(':')
+    values = {}
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        if key not in TableSpec._fields or key == 'name':
+            raise ValueError(f'Unknown option "{key}" in table spec "{text}"')
+        values[key] = value if key == 'key' else (value in ['1', 'true', 'yes'] if key == 'identity' else int(value))
+    if values.get('key', KEY_INT) not in [KEY_INT, KEY_BIGINT, KEY_COMPOSITE, KEY_NONE]:
+        raise ValueError(f'Unknown key type "{values["key"]}" in table spec "{text}"')
+    return TableSpec(name, **values)
+
+def get_modes(args, config = None) -> Dict[str, dict]:
+    """
+    The copy modes (keyword arguments of copy_data) available with the given arguments.
+    """
+    modes = {
+        'keyset': {'paging': PAGING_KEYSET},
+        'offset': {'paging': PAGING_OFFSET},
+        'stream': {'paging': PAGING_STREAM},
+        'keyset-pipeline': {'paging': PAGING_KEYSET, 'pipeline_depth': 2},
+        'auto-page-size': {'paging': PAGING_KEYSET, 'auto_page_size': {'target_page_bytes': 32 * 1024 * 1024, 'max_page_bytes': 256 * 1024 * 1024}},
+    }
+    bulk_options = {
+        'dir': args.bulk_dir if args else None,
+        'server_dir': (args.bulk_server_dir or args.bulk_dir) if args else None,
+        'tablock': True,
+        'bcp': args.bcp_path if args else 'bcp',
+        'config': config,
+    }
+    # bcp cannot log in with the az login identity of AzureActiveDirectory authentication
+    if args is None or (shutil.which(bulk_options['bcp']) and config['authentication'] != 'AzureActiveDirectory'):
+        modes['bcp'] = {'paging': PAGING_KEYSET, 'bulk_options': {**bulk_options, 'writer': WRITER_BCP}}
+    if args is None or args.bulk_dir:
+        modes['bulk-insert'] = {'paging': PAGING_KEYSET, 'bulk_options': {**bulk_options, 'writer': WRITER_BULK_INSERT}}
+    return modes
+
+def get_column_definitions(spec) -> List[tuple]:
+    """
+    (name, type, expression of the row number "i") of every column of the table. The values only depend on the
+    row number, so the generated tables are the same on every run.
+    """
+    columns = []
+    if spec.key == KEY_COMPOSITE:
+        columns.append(('k1', 'int NOT NULL', 'CAST(i / 100 AS int)'))
+        columns.append(('k2', 'varchar(20) NOT NULL', "CONCAT('k', i % 100)"))
+    elif spec.key != KEY_NONE or spec.identity:
+        columns.append(('id', f"{'bigint' if spec.key == KEY_BIGINT else 'int'}{' IDENTITY(1, 1)' if spec.identity else ''} NOT NULL", 'i'))
+    else:
+        columns.append(('id', 'int NOT NULL', 'i'))
+
+    for number in range(spec.columns):
+        if number % 3 == 0:
+            columns.append((f'int_{number}', 'int', f'CASE WHEN i % 10 = {number % 10} THEN NULL ELSE (i * {number + 7}) % 1000003 END'))
+        elif number % 3 == 1:
+            columns.append((f'text_{number}', 'nvarchar(100)', f"CONCAT(N'value ', (i * {number + 3}) % 977, N' ', REPLICATE(N'x', i % 40))"))
+        else:
+            columns.append((f'date_{number}', 'datetime2(3)', f"DATEADD(second, i * {number}, CAST('2020-01-01' AS datetime2(3)))"))
+    for number in range(spec.decimals):
+        columns.append((f'amount_{number}', 'decimal(18, 4)', f'CAST(((i * {number + 13}) % 10000000) / 100.0 AS decimal(18, 4))'))
+    for number in range(spec.lobs):
+        columns.append((f'lob_{number}', 'nvarchar(max)', f"REPLICATE(CAST(N'lorem ipsum dolor sit amet ' AS nvarchar(max)), 20 + (i * {number + 1}) % 200)"))
+    return columns
+
+def create_schema_if_not_exists(conn, schema_name):
+    with conn.cursor() as cursor:
+        execute_sql(cursor, f"IF SCHEMA_ID(?) IS NULL EXEC('CREATE SCHEMA [{schema_name}]')", schema_name)
+    conn.commit()
+
+def generate_table(conn, schema_name, spec, rows, regenerate = False):
+    if not regenerate and table_exists(conn, schema_name, spec.name) and get_row_count(conn, schema_name, spec.name, None, None) == rows:
+        print(f"Table {schema_name}.{spec.name} exists with {rows:_} rows - not generated again.")
+        return
+
+    print(f"Generating table {schema_name}.{spec.name} with {rows:_} rows ({spec}) ...", end="", flush=True)
+    start_time = perf_counter()
+    drop_table_if_exists(conn, schema_name, spec.name)
+    columns = get_column_definitions(spec)
+    column_sql = ', '.join([f'[{name}] {data_type}' for name, data_type, expression in columns])
+    if spec.key == KEY_COMPOSITE:
+        column_sql += f', CONSTRAINT [PK_{spec.name}] PRIMARY KEY CLUSTERED ([k1], [k2])'
+    elif spec.key != KEY_NONE:
+        column_sql += f', CONSTRAINT [PK_{spec.name}] PRIMARY KEY CLUSTERED ([id])'
+
+    with conn.cursor() as cursor:
+        execute_sql(cursor, f"CREATE TABLE [{schema_name}].[{spec.name}] ({column_sql})")
+        if spec.identity:
+            execute_sql(cursor, f"SET IDENTITY_INSERT [{schema_name}].[{spec.name}] ON")
+        execute_sql(cursor, f"""
+            WITH numbers AS (
+                SELECT TOP ({rows}) CAST(ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS bigint) AS i
+                FROM sys.all_objects a CROSS JOIN sys.all_objects b CROSS JOIN sys.all_objects c
+            )
+            INSERT INTO [{schema_name}].[{spec.name}] WITH (TABLOCK) ({', '.join([f'[{name}]' for name, data_type, expression in columns])})
+            SELECT {', '.join([expression for name, data_type, expression in columns])}
+            FROM numbers
+        """)
+        if spec.identity:
+            execute_sql(cursor, f"SET IDENTITY_INSERT [{schema_name}].[{spec.name}] OFF")
+    conn.commit()
+    print(f" - done in {perf_counter() - start_time:.1f} seconds")
+
+def get_table_bytes(conn, schema_name, table_name, rows) -> int:
+    """
+    Size of the table data (used pages incl. LOB pages), estimated from the column types if the server statistics cannot be read.
+    """
+    try:
+        with conn.cursor() as cursor:
+            execute_sql(cursor, "SELECT SUM(used_page_count) * 8192 FROM sys.dm_db_partition_stats WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)", f'{schema_name}.{table_name}')
+            table_bytes = cursor.fetchone()[0]
+            if table_bytes:
+                return table_bytes
+    except pyodbc.Error:
+        pass
+    return estimate_row_bytes(conn, schema_name, table_name) * rows
+
+def run_benchmark(source_conn, target_conn, args, specs, modes) -> List[dict]:
+    results = []
+    for spec in specs:
+        table_bytes = get_table_bytes(source_conn, args.source_schema, spec.name, args.rows)
+        for mode_name, copy_options in modes.items():
+            durations = []
+            for run in range(args.repeat):
+                drop_table_if_exists(target_conn, args.target_schema, spec.name)
+                create_table(source_conn, target_conn, args.source_schema, spec.name, args.target_schema)
+                clear_catalog_cache()
+                print(f"[{mode_name} run {run + 1}/{args.repeat}] ", end="")
+                start_time = perf_counter()
+                copy_data(source_conn, target_conn, args.source_schema, spec.name, args.target_schema, 0, page_size=args.page_size, **copy_options)
+                durations.append(perf_counter() - start_time)
+
+                copied_rows = get_row_count(target_conn, args.target_schema, spec.name, None, None)
+                if copied_rows != args.rows:
+                    raise RuntimeError(f"Mode {mode_name} copied {copied_rows:_} of {args.rows:_} rows of table {spec.name}")
+
+            duration_sec = statistics.median(durations)
+            results.append({
+                'table': spec.name,
+                'spec': spec._asdict(),
+                'mode': mode_name,
+                'rows': args.rows,
+                'mb': round(table_bytes / 1024 / 1024, 2),
+                'seconds': round(duration_sec, 3),
+                'rows_per_sec': round(args.rows / duration_sec, 1),
+                'mb_per_sec': round(table_bytes / 1024 / 1024 / duration_sec, 2),
+            })
+        drop_table_if_exists(target_conn, args.target_schema, spec.name)
+    return results
+
+def print_report(results, baseline_results = None, tolerance = 10.0) -> int:
+    """
+    Print the results (and the difference to the baseline), return the number of regressions.
+    """
+    baseline = {(result['table'], result['mode']): result for result in baseline_results or []}
+    regressions = 0
+    print(f"\n{'table':<24} {'mode':<16} {'rows':>12} {'MB':>9} {'seconds':>9} {'rows/sec':>12} {'MB/sec':>9}{'  vs baseline' if baseline else ''}")
+    for result in results:
+        line = f"{result['table']:<24} {result['mode']:<16} {result['rows']:>12_} {result['mb']:>9.1f} {result['seconds']:>9.2f} {result['rows_per_sec']:>12_.0f} {result['mb_per_sec']:>9.2f}"
+        base = baseline.get((result['table'], result['mode']))
+        if base:
+            change = (result['rows_per_sec'] / base['rows_per_sec'] - 1) * 100 if base['rows_per_sec'] else 0
+            line += f"  {change:+.1f}%"
+            if change < -tolerance:
+                line += " REGRESSION"
+                regressions += 1
+        elif baseline:
+            line += "  (new)"
+        print(line)
+    return regressions
+
+def main():
+    logging.basicConfig()
+
+    parser = parse_args()
+    ARGS = parser.parse_args()
+
+    if ARGS.debug_sql:
+        logging.getLogger('sql').setLevel(logging.DEBUG)
+
+    config = {
+        'driver': ARGS.driver,
+        'server': ARGS.server,
+        'database': ARGS.db,
+        'authentication': ARGS.authentication,
+        'user': ARGS.user,
+        'password': ARGS.password,
+    }
+
+    try:
+        specs = [parse_spec(spec) for spec in ARGS.specs] if ARGS.specs else DEFAULT_SPECS
+        available_modes = get_modes(ARGS, config)
+        modes = {name: options for name, options in available_modes.items() if not ARGS.modes or name in ARGS.modes}
+        for name in ARGS.modes or []:
+            if name not in available_modes:
+                print(f"WARNING: mode {name} is not available (unknown, bcp not found or not usable with AzureActiveDirectory, or --bulk-dir not set) - skipped!")
+    except ValueError as e:
+        parser.error(str(e))
+
+    source_conn = None
+    target_conn = None
+    try:
+        print(f'connecting to server {config["server"]} db {config["database"]}... ', end="", flush=True)
+        source_conn = create_connection(config)
+        target_conn = create_connection(config)
+        print(' - DONE')
+
+        create_schema_if_not_exists(source_conn, ARGS.source_schema)
+        create_schema_if_not_exists(target_conn, ARGS.target_schema)
+        for spec in specs:
+            generate_table(source_conn, ARGS.source_schema, spec, ARGS.rows, ARGS.regenerate)
+
+        results = run_benchmark(source_conn, target_conn, ARGS, specs, modes)
+
+        baseline_results = None
+        if ARGS.baseline_file_name:
+            with open(ARGS.baseline_file_name, 'r') as file:
+                baseline_results = json.load(file)['results']
+        regressions = print_report(results, baseline_results, ARGS.tolerance)
+
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'server': config['server'],
+            'database': config['database'],
+            'rows': ARGS.rows,
+            'page_size': ARGS.page_size,
+            'repeat': ARGS.repeat,
+            'results': results,
+        }
+        with open(ARGS.report_file_name, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\nReport written to {os.path.abspath(ARGS.report_file_name)}")
+
+        if regressions:
+            print(f"{regressions} regression(s) of more than {ARGS.tolerance}% compared to {ARGS.baseline_file_name}")
+            if ARGS.fail_on_regression:
+                sys.exit(1)
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        traceback.print_exc(file=sys.stdout)
+        sys.exit(-1)
+    finally:
+        if source_conn:
+            source_conn.close()
+        if target_conn:
+            target_conn.close()
+
+
+if __name__ == '__main__':
+    main()
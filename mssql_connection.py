@@ -0,0 +1,369 @@
+# Connections to the sql server shared by mssql_copy_table.py, mssql_execute_sql.py and mssql_benchmark.py:
+# the Azure AD access tokens are cached and refreshed in the background, and idle connections are pooled per
+# server, database and login, so parallel workers and reconnects do not pay the login (and az CLI) time again.
+
+# pip install azure-identity
+# from https://stackoverflow.com/questions/58440480/connect-to-azure-sql-in-python-with-mfa-active-directory-interactive-authenticat
+
+try:
+    from azure.identity import AzureCliCredential
+    azure_identity_available = True
+except ImportError:
+    azure_identity_available = False
+
+import pyodbc
+import sys
+import re
+import struct
+import time
+import threading
+import weakref
+from typing import List, Dict, Tuple
+
+AZURE_SQL_TOKEN_SCOPE = 'https://database.windows.net/'
+SQL_COPT_SS_ACCESS_TOKEN = 1256
+
+TOKEN_REFRESH_MARGIN_SEC = 300 # a token is not used anymore if it expires within this time
+TOKEN_RETRY_SEC = 30 # minimal wait of the background refresh, e.g. after the az CLI failed
+
+DEFAULT_POOL_SIZE = 8
+POOL_VALIDATE_IDLE_SEC = 60 # connections idle for longer are checked with a query before they are reused
+
+DEFAULT_RECONNECT_ATTEMPTS = 5
+IDENTITY_INSERT_PATTERN = re.compile(r'^\s*SET\s+IDENTITY_INSERT\s+(\S+)\s+(ON|OFF)\s*;?\s*$', re.IGNORECASE)
+READ_ONLY_PATTERN = re.compile(r'^\s*(SELECT|WITH|SET|DECLARE)\b', re.IGNORECASE) # statements that leave nothing uncommitted behind
+
+def is_azure_active_directory(config) -> bool:
+    return "authentication" in config and config["authentication"] == 'AzureActiveDirectory'
+
+def get_connection_string(config) -> str:
+    """
+    The ODBC connection string of the config. For username/password authentication it contains the credentials,
+    for AzureActiveDirectory authentication the access token is passed as connection attribute (see create_connection).
+    """
+    conn_str = f'DRIVER={config["driver"]};SERVER={config["server"]};DATABASE={config["database"]};Encrypt=Yes;TrustServerCertificate=Yes;hostNameInCertificate=*.database.windows.net;loginTimeout=30'
+    if not is_azure_active_directory(config):
+        conn_str = conn_str + f';UID={config["user"]};PWD={config["password"]}'
+    return conn_str
+
+class TokenCache:
+    """
+    Access tokens of the Azure CLI credential per scope. A token is reused until TOKEN_REFRESH_MARGIN_SEC before
+    it expires. After the first request of a scope, a daemon thread fetches a new token twice this margin before
+    expiry, so connections opened later (workers, reconnects) neither wait for the az CLI nor get an expired token,
+    also if the copy runs longer than the token lifetime.
+    """
+    def __init__(self, refresh_margin_sec=TOKEN_REFRESH_MARGIN_SEC):
+        self.refresh_margin_sec = refresh_margin_sec
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock() # only one az CLI call at a time, concurrent callers use its token
+        self.credential = None
+        self.tokens = {} # scope -> AccessToken (token, expires_on)
+        self.refresh_threads: Dict[str, threading.Thread] = {}
+        self.stopped = threading.Event()
+
+    def is_valid(self, token) -> bool:
+        return token is not None and token.expires_on - time.time() >= self.refresh_margin_sec
+
+    def fetch_token(self, scope):
+        if self.credential is None:
+            # Use the cli credential to get a token after the user has signed in via the Azure CLI 'az login' command.
+            self.credential = AzureCliCredential()
+        token = self.credential.get_token(scope)
+        with self.lock:
+            self.tokens[scope] = token
+        return token
+
+    def get_token(self, scope=AZURE_SQL_TOKEN_SCOPE) -> str:
+        with self.lock:
+            token = self.tokens.get(scope)
+        if not self.is_valid(token):
+            with self.fetch_lock:
+                with self.lock:
+                    token = self.tokens.get(scope)
+                if not self.is_valid(token):
+                    token = self.fetch_token(scope)
+        with self.lock:
+            if scope not in self.refresh_threads:
+                thread = threading.Thread(target=self.refresh_loop, args=(scope,), name='token-refresh', daemon=True)
+                self.refresh_threads[scope] = thread
+                thread.start()
+        return token.token
+
+    def refresh_loop(self, scope):
+        while True:
+            with self.lock:
+                expires_on = self.tokens[scope].expires_on
+            wait_sec = max(TOKEN_RETRY_SEC, expires_on - time.time() - 2 * self.refresh_margin_sec)
+            if self.stopped.wait(wait_sec):
+                return
+            try:
+                with self.fetch_lock:
+                    self.fetch_token(scope)
+            except Exception as e:
+                print(f"WARNING: refreshing the access token failed, retrying in {TOKEN_RETRY_SEC} seconds: {e}", flush=True)
+
+    def stop(self):
+        self.stopped.set()
+
+    def get_token_struct(self, scope=AZURE_SQL_TOKEN_SCOPE) -> bytes:
+        # get bytes from token obtained
+        tokenb = bytes(self.get_token(scope), "UTF-16-LE")
+        return struct.pack("=i", len(tokenb)) + tokenb
+
+token_cache = TokenCache()
+
+# Function to create a connection',
+def create_connection(config, verbose=True) -> pyodbc.Connection:
+#    conn_str = f'DRIVER={config["driver"]};SERVER={config["server"]};DATABASE={config["database"]};UID={config["user"]};PWD={config["password"]};Encrypt=Yes;TrustServerCertificate=Yes;'
+# jdbc:sqlserver://portal-int-cl1-prod-sqlserver.database.windows.net:1433;encrypt=true;trustServerCertificate=false;hostNameInCertificate=*.database.windows.net;loginTimeout=30;authentication=ActiveDirectoryPassword
+
+    conn_str = get_connection_string(config)
+    attrs_before = None
+
+    if is_azure_active_directory(config):
+        if not azure_identity_available:
+            print("For AzureActiveDirectory authentication, please install azure-identity first!")
+            sys.exit(-1)
+
+        attrs_before = {SQL_COPT_SS_ACCESS_TOKEN: token_cache.get_token_struct()}
+        if verbose:
+            print(f'using authentication {config["authentication"]}...', end="")
+
+    elif verbose:
+        # username/password:
+        print('using authentication username/password', end="")
+
+    return pyodbc.connect(conn_str, attrs_before = attrs_before)
+
+def close_quietly(conn):
+    try:
+        conn.close()
+    except pyodbc.Error:
+        pass # connection is probably broken already
+
+def is_connection_alive(conn) -> bool:
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1").fetchall()
+        return True
+    except pyodbc.Error:
+        return False
+
+def is_connection_lost(e) -> bool:
+    """
+    True if the error means that the connection is broken (SQLSTATE class 08, e.g. 08S01 communication link
+    failure, or a TCP provider error), so a statement can only be repeated on a new connection.
+    """
+    state = e.args[0] if e.args and isinstance(e.args[0], str) else ''
+    return state.startswith('08') or 'TCP Provider' in str(e) or 'Communication link failure' in str(e)
+
+class ConnectionPool:
+    """
+    Idle connections per server, database and login (see get_key), at most max_idle of each. acquire() returns an
+    idle connection if there is one (checked with a query if it was idle for more than POOL_VALIDATE_IDLE_SEC)
+    and opens a new one otherwise. release() rolls back the open transaction and keeps the connection for the next
+    acquire(), discard() closes it, e.g. after an error that may have left session state (IDENTITY_INSERT) behind.
+    warm() opens connections in the background before they are needed. With max_idle 0 nothing is pooled.
+    """
+    def __init__(self, max_idle=DEFAULT_POOL_SIZE):
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        self.idle: Dict[tuple, List[Tuple[pyodbc.Connection, float]]] = {}
+        self.warm_threads: List[threading.Thread] = []
+
+    @staticmethod
+    def get_key(config) -> tuple:
+        return (config['driver'], config['server'], config['database'], config.get('authentication'), config.get('user'))
+
+    def acquire(self, config, verbose=False) -> pyodbc.Connection:
+        key = self.get_key(config)
+        while True:
+            with self.lock:
+                idle = self.idle.get(key)
+                if not idle:
+                    break
+                conn, idle_since = idle.pop()
+            if time.monotonic() - idle_since < POOL_VALIDATE_IDLE_SEC or is_connection_alive(conn):
+                return conn
+            close_quietly(conn)
+        return create_connection(config, verbose)
+
+    def release(self, config, conn):
+        try:
+            conn.rollback()
+        except pyodbc.Error:
+            close_quietly(conn)
+            return
+        with self.lock:
+            idle = self.idle.setdefault(self.get_key(config), [])
+            if len(idle) < self.max_idle:
+                idle.append((conn, time.monotonic()))
+                return
+        close_quietly(conn)
+
+    def discard(self, conn):
+        close_quietly(conn)
+
+    def warm(self, config, count):
+        """
+        Open connections in daemon threads until count (at most max_idle) connections of the config are idle.
+        Errors are ignored, acquire() opens the connection itself then.
+        """
+        def open_connection():
+            try:
+                conn = create_connection(config, verbose=False)
+            except Exception:
+                return
+            self.release(config, conn)
+
+        with self.lock:
+            missing = min(count, self.max_idle) - len(self.idle.get(self.get_key(config), []))
+            for _ in range(missing):
+                thread = threading.Thread(target=open_connection, name='connection-warm', daemon=True)
+                self.warm_threads.append(thread)
+                thread.start()
+
+    def close_all(self):
+        with self.lock:
+            warm_threads = self.warm_threads
+            self.warm_threads = []
+        for thread in warm_threads:
+            thread.join()
+        with self.lock:
+            idle = self.idle
+            self.idle = {}
+        for connections in idle.values():
+            for conn, idle_since in connections:
+                close_quietly(conn)
+
+connection_pool = ConnectionPool()
+
+class Session:
+    """
+    A connection of the config that is reopened if it was lost (see reconnect), used like the pyodbc connection.
+    The cursors of the session (see SessionCursor) move to the new connection together with their settings, and
+    the session state set through them (SET IDENTITY_INSERT ... ON) is restored. What was not committed is lost:
+    dirty tells if statements that may have changed data were executed since the last commit or rollback.
+    """
+    max_reconnects = DEFAULT_RECONNECT_ATTEMPTS # connection attempts of reconnect(), 0 does not reconnect
+
+    def __init__(self, conn, config):
+        self.conn = conn
+        self.config = config
+        self.lock = threading.Lock()
+        self.cursors = weakref.WeakSet()
+        self.identity_insert_table = None # only one table of a session can have IDENTITY_INSERT ON
+        self.dirty = False
+        self.reconnects = 0
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def cursor(self) -> 'SessionCursor':
+        cursor = SessionCursor(self, self.conn.cursor())
+        with self.lock:
+            self.cursors.add(cursor)
+        return cursor
+
+    def commit(self):
+        self.conn.commit()
+        self.dirty = False
+
+    def rollback(self):
+        self.conn.rollback()
+        self.dirty = False
+
+    def can_reconnect(self) -> bool:
+        return self.max_reconnects > 0
+
+    def reconnect(self):
+        """
+        Open a new connection (from the connection pool), restore the session state and move the cursors to it.
+        """
+        close_quietly(self.conn)
+        delay = 1
+        for attempt in range(self.max_reconnects):
+            try:
+                conn = connection_pool.acquire(self.config)
+                break
+            except pyodbc.Error as e:
+                if attempt >= self.max_reconnects - 1:
+                    raise
+                print(f" reconnecting to {self.config['server']} failed, retrying in {delay} seconds (attempt {attempt + 1}/{self.max_reconnects}): {e}", flush=True)
+                time.sleep(delay)
+                delay *= 2
+        if self.identity_insert_table:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SET IDENTITY_INSERT {self.identity_insert_table} ON")
+        self.conn = conn
+        self.dirty = False
+        self.reconnects += 1
+        with self.lock:
+            cursors = list(self.cursors)
+        for cursor in cursors:
+            cursor.reopen(conn)
+
+    def recover(self):
+        """
+        Roll back the open transaction after an error, reconnect if the connection was lost.
+        """
+        try:
+            self.rollback()
+            if is_connection_alive(self.conn):
+                return
+        except pyodbc.Error:
+            pass
+        self.reconnect()
+
+class SessionCursor:
+    """
+    Cursor of a session (see Session), used like the pyodbc cursor. Its attributes (e.g. fast_executemany) and
+    input sizes are set again on the cursor of the new connection after a reconnect.
+    """
+    def __init__(self, session, cursor):
+        self.__dict__.update(session=session, cursor=cursor, attributes={}, input_sizes=None)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.cursor, name, value)
+        self.attributes[name] = value
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        # commits like the pyodbc cursor if there was no error
+        self.cursor.__exit__(exc_type, exc_value, exc_traceback)
+        if exc_type is None and not self.session.conn.autocommit:
+            self.session.dirty = False
+
+    def execute(self, sql, *parameters) -> 'SessionCursor':
+        if not READ_ONLY_PATTERN.match(sql):
+            self.session.dirty = True
+        self.cursor.execute(sql, *parameters)
+        match = IDENTITY_INSERT_PATTERN.match(sql)
+        if match:
+            self.session.identity_insert_table = match.group(1) if match.group(2).upper() == 'ON' else None
+        return self
+
+    def executemany(self, sql, parameters):
+        self.session.dirty = True
+        self.cursor.executemany(sql, parameters)
+
+    def setinputsizes(self, input_sizes):
+        self.cursor.setinputsizes(input_sizes)
+        self.__dict__['input_sizes'] = input_sizes
+
+    def reopen(self, conn):
+        cursor = conn.cursor()
+        for name, value in self.attributes.items():
+            setattr(cursor, name, value)
+        if self.input_sizes is not None:
+            cursor.setinputsizes(self.input_sizes)
+        self.__dict__['cursor'] = cursor
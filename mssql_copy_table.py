@@ -1,13 +1,18 @@
 #!/usr/bin/env -S uv run --script
 
-# pip install azure-identity
-# from https://stackoverflow.com/questions/58440480/connect-to-azure-sql-in-python-with-mfa-active-directory-interactive-authenticat
+# pip install pyarrow (Parquet export/import) arrow-odbc (arrow engine)
+try:
+    import pyarrow
+    import pyarrow.parquet
+    pyarrow_available = True
+except ImportError:
+    pyarrow_available = False
 
 try:
-    from azure.identity import AzureCliCredential
-    azure_identity_available = True
+    import arrow_odbc
+    arrow_odbc_available = pyarrow_available
 except ImportError:
-    azure_identity_available = False
+    arrow_odbc_available = False
 
 import pyodbc
 from time import perf_counter
@@ -17,21 +22,85 @@ import argparse
 import re
 import logging
 import time
-from datetime import datetime
-from typing import List, Dict, Tuple
+from datetime import datetime, date
+from typing import List, Dict, Tuple, NamedTuple
 import os
+import queue
+import threading
+import io
+import json
+import shutil
+import subprocess
+import tempfile
+import sqlite3
+import contextlib
+import cProfile
+import pstats
+import tracemalloc
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION, FIRST_COMPLETED
+
+from mssql_connection import (create_connection, get_connection_string, connection_pool, token_cache, is_connection_lost, Session, SessionCursor,
+                              DEFAULT_POOL_SIZE, DEFAULT_RECONNECT_ATTEMPTS)
 
 STATUS_START = 'START'
 STATUS_SUCCESS = 'SUCCESS'
 STATUS_ERROR = 'ERROR'
+STATUS_WATERMARK = 'WATERMARK'
+STATUS_VERSION = 'VERSION'
+STATUS_CHECKPOINT = 'CHECKPOINT'
+STATUS_RANGES = 'RANGES'
+
+PAGING_KEYSET = 'keyset'
+PAGING_OFFSET = 'offset'
+PAGING_STREAM = 'stream'
+
+WRITER_INSERT = 'insert'
+WRITER_BCP = 'bcp'
+WRITER_BULK_INSERT = 'bulk-insert'
+
+ENGINE_PYODBC = 'pyodbc'
+ENGINE_ARROW = 'arrow'
+
+PARQUET_METADATA_KEY = b'mssql_copy_table'
+PARQUET_MANIFEST_FILE = '_manifest.json'
+
+MERGE_MODE_MERGE = 'merge'
+MERGE_MODE_DELETE_INSERT = 'delete-insert'
+STAGING_TABLE_SUFFIX = '_staging'
+STAGING_TABLE_PROPERTY = 'mssql_copy_table_staging' # extended property that marks the staging tables created by this script
+
+COMPARE_HASH_CHECKSUM = 'checksum'
+COMPARE_HASH_HASHBYTES = 'hashbytes'
+COMPARE_MAX_PRINTED_KEYS = 20
+
+DIFF_SOURCE_ONLY = 'source_only'
+DIFF_TARGET_ONLY = 'target_only'
+DIFF_MISSING = 'missing'
+DIFF_DIFFERENT = 'different'
+SCHEMA_DIFF_COLUMN_ATTRIBUTES = ['DATA_TYPE', 'CHARACTER_MAXIMUM_LENGTH', 'NUMERIC_PRECISION', 'NUMERIC_SCALE', 'DATETIME_PRECISION', 'IS_NULLABLE', 'COLUMN_DEFAULT', 'is_identity', 'is_computed']
+
+SYNC_CHANGE_TRACKING = 'change-tracking'
+SYNC_CDC = 'cdc'
+
+SCHEDULER_SERIAL = 'serial'
+SCHEDULER_DAG = 'dag'
+
+NODE_TABLE = 'table'
+NODE_INDICES = 'indices'
+NODE_VIEW = 'view'
+NODE_SYNONYM = 'synonym'
 
 sql_logger = logging.getLogger('sql')
+progress_track_lock = threading.Lock()
+retry_counter = threading.local() # retries of execute_sql_with_retry in the current thread (see get_retry_count)
+query_timer = threading.local() # wall clock and CPU seconds of the source queries in the current thread (see get_query_time)
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Copy one or more tables from an sql server to another sql server')
     parser.add_argument('--source-driver', dest='source_driver', default='{ODBC Driver 18 for SQL Server}', help='source database server driver (default: %(default)s)')
-    parser.add_argument('--source-server', dest='source_server', help='source database server name', required=True)
-    parser.add_argument('--source-db', dest='source_db', help='source database name', required=True)
+    parser.add_argument('--source-server', dest='source_server', help='source database server name (required, except with --import-dir)')
+    parser.add_argument('--source-db', dest='source_db', help='source database name (required, except with --import-dir)')
     parser.add_argument('--source-schema', dest='source_schema', default='dbo', help='source database schema name (default: %(default)s)')
     parser.add_argument('--source-authentication', dest='source_authentication', default='UsernamePassword', help='source database authentication. Possible to use AzureActiveDirectory (default: %(default)s)')
     parser.add_argument('--source-user', dest='source_user', help='source database username, if authentication is set to UsernamePassword')
@@ -39,8 +108,8 @@ def parse_args():
     parser.add_argument('--source-list-tables', dest='source_list_tables', default=False, action='store_true', help='If set, a list of tables is printed, no data is copied! (default: %(default)s)')
 
     parser.add_argument('--target-driver', dest='target_driver', default='{ODBC Driver 18 for SQL Server}', help='target database server driver (default: %(default)s)')
-    parser.add_argument('--target-server', dest='target_server', help='target database server name', required=True)
-    parser.add_argument('--target-db', dest='target_db', help='target database name', required=True)
+    parser.add_argument('--target-server', dest='target_server', help='target database server name (required, except with --export-dir)')
+    parser.add_argument('--target-db', dest='target_db', help='target database name (required, except with --export-dir)')
     parser.add_argument('--target-schema', dest='target_schema', default='dbo', help='target database schema name (default: %(default)s)')
     parser.add_argument('--target-authentication', dest='target_authentication', default='UsernamePassword', help='target database authentication. Possible to use AzureActiveDirectory (default: %(default)s)')
     parser.add_argument('--target-user', dest='target_user', help='source database username, if authentication is set to UsernamePassword')
@@ -50,19 +119,69 @@ def parse_args():
     parser.add_argument('--truncate-table', dest='truncate_table', default=False, action=argparse.BooleanOptionalAction, help='If set, truncate the target table before inserting rows from source table. If this option is set, the tables are NOT recreated, even if --create-table is used! (default: %(default)s)')
     parser.add_argument('--create-table', dest='create_table', default=True, action=argparse.BooleanOptionalAction, help='If set, drop (if exists) and (re)create the target table before inserting rows from source table. All columns, types and not-null and primary key constraints will also be copied. Indices of the table will also be recreated if not prevented by --no-copy-indices flag (default: %(default)s)')
     parser.add_argument('--copy-indices', dest='copy_indices', default=True, action=argparse.BooleanOptionalAction, help='Create the indices for the target tables as they exist on the source table (default: %(default)s)')
+    parser.add_argument('--index-workers', dest='index_workers', default = 1, type=int, help='Number of indices created at the same time by --copy-indices, each one on its own target connection. If greater than 1 (and tables are copied one after the other), the indices of all tables are created together after the data of all tables was copied. (default: %(default)d)')
+    parser.add_argument('--index-sort-in-tempdb', dest='index_sort_in_tempdb', default=False, action=argparse.BooleanOptionalAction, help='Create the indices WITH (SORT_IN_TEMPDB = ON). (default: %(default)s)')
+    parser.add_argument('--index-online', dest='index_online', default=False, action=argparse.BooleanOptionalAction, help='Create the indices WITH (ONLINE = ON), the table can be used while its indices are built (needs an edition that supports online index operations). (default: %(default)s)')
+    parser.add_argument('--index-maxdop', dest='index_maxdop', default = 0, type=int, help='Create the indices WITH (MAXDOP = n), limits the processors used by one index build. 0 uses the server setting. (default: %(default)d)')
+    parser.add_argument('--index-data-compression', dest='index_data_compression', default=None, choices=['NONE', 'ROW', 'PAGE'], help='Create the indices WITH (DATA_COMPRESSION = ...). (default: %(default)s)')
     parser.add_argument('--drop-indices', dest='drop_indices', default=True, action=argparse.BooleanOptionalAction, help='Drop indices before copying data for performance reasons. The indices are created after copying by --copy-indices afterwards (default: %(default)s)')
     parser.add_argument('--copy-data', dest='copy_data', default=True, action=argparse.BooleanOptionalAction, help='Copy the data of the tables. Default True! Use --no-copy-data if you want to creat the indices only. (default: %(default)s)')
     parser.add_argument('--dry-run', dest='dry_run', default=False, action='store_true', help='Do not modify target database, just print what would happen. (default: %(default)s)')
 
-    parser.add_argument('--compare-table', dest='compare_table', default=False, action=argparse.BooleanOptionalAction, help='If set, do not copy any data, but compare the source and the target table(s) and print if there are any differences in columns, indices or content rows. (default: %(default)s)')
-    parser.add_argument('--compare-view', dest='compare_view', default=False, action=argparse.BooleanOptionalAction, help='If set, do not copy any data, but compare the source and the target view(s) and print if there are any differences in columns. (default: %(default)s)')
+    parser.add_argument('--compare-table', dest='compare_table', default=False, action=argparse.BooleanOptionalAction, help='If set, do not copy any data, but compare the source and the target table(s) and print if there are any differences in columns (type, length, precision, nullability, default, identity), primary keys, indices, row counts (exact, see --compare-approximate-counts) or content rows (see --compare-content). The catalogs of both schemas are loaded with a few set-based queries and compared in memory, the differences are also written to "--compare-report". Without "--table" all tables are compared (like with "--all-tables"), and tables that only exist in the target are reported as well. (default: %(default)s)')
+    parser.add_argument('--compare-approximate-counts', dest='compare_approximate_counts', default=False, action=argparse.BooleanOptionalAction, help='Used with --compare-table: read the row counts from the partition metadata instead of counting the rows (COUNT_BIG) of every table. The tables are not scanned, but the counts are approximate and include uncommitted rows, so a difference can be missed or reported wrongly. (default: %(default)s)')
+    parser.add_argument('--compare-content', dest='compare_content', default=False, action=argparse.BooleanOptionalAction, help='Used with --compare-table: also compare the content of the rows of tables with primary key. Both tables are split into primary key ranges, a hash of every range is computed on both servers at the same time, and only ranges with different hashes are split again, down to the keys of the rows that differ. Only hashes and keys are transferred. (default: %(default)s)')
+    parser.add_argument('--compare-hash', dest='compare_hash', default=COMPARE_HASH_CHECKSUM, choices=[COMPARE_HASH_CHECKSUM, COMPARE_HASH_HASHBYTES], help='Row hash of "--compare-content": "checksum" uses BINARY_CHECKSUM (fast, ignores text/ntext/image/xml columns, rare collisions), "hashbytes" uses HASHBYTES(SHA2_256) of all columns (slower, reliable). (default: %(default)s)')
+    parser.add_argument('--compare-chunks', dest='compare_chunks', default = 16, type=int, help='Number of primary key ranges a table or a differing range is split into by "--compare-content". (default: %(default)d)')
+    parser.add_argument('--compare-min-rows', dest='compare_min_rows', default = 1000, type=int, help='Ranges with at most this number of rows are compared row by row (key and hash of every row) by "--compare-content". (default: %(default)d)')
+    parser.add_argument('--repair', dest='repair', default=False, action=argparse.BooleanOptionalAction, help='Repair the target tables instead of copying them: compare the content as "--compare-content" does (see the compare options) and only delete and copy again the primary key ranges that differ. Ranges that match are not touched. (default: %(default)s)')
+    parser.add_argument('--repair-workers', dest='repair_workers', default = 4, type=int, help='Number of differing ranges that "--repair" copies at the same time, each one with its own connections. (default: %(default)d)')
+    parser.add_argument('--compare-view', dest='compare_view', default=False, action=argparse.BooleanOptionalAction, help='If set, do not copy any data, but compare the source and the target view(s) and synonym(s) and print if there are any differences in columns, view definitions (normalized) or synonym base objects. The views and synonyms are selected by "--view", "--synonym" and their filters. Can be combined with "--compare-table". (default: %(default)s)')
+    parser.add_argument('--compare-report', dest='compare_report_file_name', default='schema-diff.json', help='File the differences found by "--compare-table" and "--compare-view" are written to (JSON). (default: %(default)s)')
 
     parser.add_argument('-t', '--table', nargs='+', action='extend', dest='tables', help='Specify the tables you want to copy. Either repeat "-t <name> -t <name2>" or by "-t <name> <name2>"')
     parser.add_argument('--all-tables', dest='copy_all_tables', default=False, action='store_true', help='Copy all tables in the schema from the source db to the target db. (default: %(default)s)')
     parser.add_argument('--table-filter', dest='table_filter', default = None, help='Filter on table names using this regular expression (regexp must match table names). Use with "--all-tables" or one of the "list-tables" arguments. (default: %(default)s)')
     parser.add_argument('--table-filter-exclude', dest='table_filter_exclude', default = None, help='Filter out table names using this regular expression (regexp must match table names). Use with "--all-tables" or one of the "list-tables" arguments. (default: %(default)s)')
     parser.add_argument('--page-size', dest='page_size', default = 50000, type=int, help='Page size of rows that are copied in one step. Depending on the size of table, values between 50000 (default) and 500000 are working well (depending on the number of rows, etc.). (default: %(default)d)')
-    parser.add_argument('--page-start', dest='page_start', default = 1, type=int, help='Page to start with. Please note that the first page number ist 1 to match the output during copying of the data. The output of a page number indicates the page is read. The "w" after the page number shows that the pages was successfully written. Please also note that this settings does not make much sense if you copy more than one table! (default: %(default)d)')
+    parser.add_argument('--auto-page-size', dest='auto_page_size', default=False, action=argparse.BooleanOptionalAction, help='Choose the page size per table: the first page size is computed from the estimated row size and "--target-page-mb", then the page size is adjusted from the measured read/write throughput of every page, up to "--max-page-mb". The page sizes used are printed (e.g. "[12_000]" after a page and in the summary of the table), so they can be set with --page-size later. --page-size is ignored. (default: %(default)s)')
+    parser.add_argument('--target-page-mb', dest='target_page_mb', default = 32, type=int, help='Initial page size in MB (estimated) for "--auto-page-size". (default: %(default)d)')
+    parser.add_argument('--max-page-mb', dest='max_page_mb', default = 256, type=int, help='Maximum page size in MB (estimated) for "--auto-page-size". Please note that "--pipeline-depth" keeps that many pages in memory in addition. (default: %(default)d)')
+    parser.add_argument('--page-start', dest='page_start', default = 1, type=int, help='Page to start with. Please note that the first page number ist 1 to match the output during copying of the data. The output of a page number indicates the page is read. The "w" after the page number shows that the pages was successfully written. Please also note that this settings does not make much sense if you copy more than one table! With a progress track file, an interrupted copy with keyset paging continues automatically after the key of its last committed page, without recreating the table (see --progress-track-file). (default: %(default)d)')
+    parser.add_argument('--pipeline-depth', dest='pipeline_depth', default = 0, type=int, help='If greater than 0, pages are read from the source in a separate thread while the previous pages are written to the target. The value is the maximum number of pages that are buffered in memory. 0 reads and writes the pages one after the other. (default: %(default)d)')
+    parser.add_argument('--paging', dest='paging', default=PAGING_KEYSET, choices=[PAGING_KEYSET, PAGING_OFFSET, PAGING_STREAM], help='Paging strategy to read the source table. "keyset" seeks to the next page using the last primary key read (constant cost per page, also for combined primary keys). "offset" numbers all rows on each page (ROW_NUMBER or OFFSET/FETCH) and gets slower the deeper it reads into the table. "stream" executes only one query for the whole table and fetches it page by page (no sorting, also for tables without primary key, but the query stays open during the whole copy). Tables without primary key (or with a key column pyodbc cannot read exactly, e.g. datetime2(7)) use "offset" instead of "keyset", "--page-start" always uses "offset". (default: %(default)s)')
+
+    parser.add_argument('--heap-load', dest='heap_load', default=False, action=argparse.BooleanOptionalAction, help='Used with --create-table: create the target table without primary key (as heap), load it with a table lock (TABLOCK) so the load can be minimally logged, and add the primary key after the data was copied (before the indices are created). (default: %(default)s)')
+    parser.add_argument('--writer', dest='writer', default=WRITER_INSERT, choices=[WRITER_INSERT, WRITER_BCP, WRITER_BULK_INSERT], help='How the pages are written to the target table: "insert" uses INSERT statements (executemany), "bcp" writes every page to a data file in "--bulk-dir" and loads it with the bcp tool, "bulk-insert" loads the data file with BULK INSERT (the server must be able to read the file, see "--bulk-server-dir"). (default: %(default)s)')
+    parser.add_argument('--bulk-dir', dest='bulk_dir', default=None, help='Directory for the data and format files of the "bcp" and "bulk-insert" writers. (default: system temp directory)')
+    parser.add_argument('--bulk-server-dir', dest='bulk_server_dir', default=None, help='Path of "--bulk-dir" as seen by the target sql server (e.g. the mount point in a container), used by the "bulk-insert" writer. (default: same as --bulk-dir)')
+    parser.add_argument('--bulk-tablock', dest='bulk_tablock', default=True, action=argparse.BooleanOptionalAction, help='Use a table lock (TABLOCK) for the "bcp" and "bulk-insert" writers. (default: %(default)s)')
+    parser.add_argument('--bcp-path', dest='bcp_path', default='bcp', help='Path of the bcp executable used by the "bcp" writer. (default: %(default)s)')
+    parser.add_argument('--engine', dest='engine', default=ENGINE_PYODBC, choices=[ENGINE_PYODBC, ENGINE_ARROW], help='How the data is transferred: "pyodbc" fetches and inserts rows as Python objects, "arrow" fetches and inserts columnar Apache Arrow record batches with arrow-odbc (pip install arrow-odbc pyarrow), without a Python object per row. Tables with identity columns, AzureActiveDirectory authentication and "--page-start" use "pyodbc". (default: %(default)s)')
+    parser.add_argument('--engine-table-filter', dest='engine_table_filter', default=None, help='Used with --engine arrow: only the tables matching this regular expression are copied with the arrow engine, the others with pyodbc. (default: all tables)')
+    parser.add_argument('--arrow-max-text-size', dest='arrow_max_text_size', default=1048576, type=int, help='Used with --engine arrow: maximum size in bytes of a text value of (n)varchar(max) columns, the buffers of the record batches are allocated for this size. (default: %(default)s)')
+    parser.add_argument('--arrow-max-binary-size', dest='arrow_max_binary_size', default=1048576, type=int, help='Used with --engine arrow: maximum size in bytes of a varbinary(max) value. (default: %(default)s)')
+    parser.add_argument('--export-dir', dest='export_dir', default=None, help='Export the tables to Parquet files in this directory instead of copying them to a target server (needs pyarrow): a directory "schema.table" per table with one compressed file per page (using the paging, where and join options) and the table definition embedded in every file. An interrupted export continues after the last complete file. No target server is needed. (default: %(default)s)')
+    parser.add_argument('--import-dir', dest='import_dir', default=None, help='Import the tables exported with --export-dir from this directory instead of reading a source server (needs pyarrow): the target tables are created from the embedded table definition (see --create-table), every file is loaded in one transaction and tracked in the progress track file on its own. No source server is needed, --source-schema is the schema the tables were exported from. (default: %(default)s)')
+    parser.add_argument('--parquet-compression', dest='parquet_compression', default='zstd', choices=['zstd', 'snappy', 'gzip', 'lz4', 'none'], help='Compression of the Parquet files written by --export-dir. (default: %(default)s)')
+    parser.add_argument('--range-partitions', dest='range_partitions', default = 1, type=int, help='If greater than 1, the rows of a table are split into this number of ranges of its numerical primary key and the ranges are copied at the same time, each one with its own connections. A range that fails is retried (see "--range-retries") without copying the other ranges again. (default: %(default)d)')
+    parser.add_argument('--range-split', dest='range_split', default='minmax', choices=['minmax', 'quantile'], help='How the ranges of "--range-partitions" are determined: "minmax" splits the values between the minimum and maximum key into equal ranges, "quantile" splits the rows into ranges with the same number of rows (reads all keys once). (default: %(default)s)')
+    parser.add_argument('--range-retries', dest='range_retries', default = 3, type=int, help='Number of times a failed range of "--range-partitions" is retried. The rows of the range are deleted in the target table before a retry. (default: %(default)d)')
+    parser.add_argument('--parallel-tables', dest='parallel_tables', default = 1, type=int, help='Number of tables that are copied at the same time. Every worker uses its own source and target connection. The largest tables are started first. The output of a table is printed as one block when the table is done. (default: %(default)d)')
+    parser.add_argument('--scheduler', dest='scheduler', default=SCHEDULER_SERIAL, choices=[SCHEDULER_SERIAL, SCHEDULER_DAG], help='"serial" copies the tables, then the views, then the synonyms (views in the order of their dependencies). "dag" builds a dependency graph of the tables, their indices, the views and the synonyms (sys.sql_expression_dependencies) and copies independent objects at the same time with "--scheduler-workers" connection pairs: a view only waits for the objects it uses, the indices of a table for its data. If an object fails, only the objects that depend on it are skipped. Cannot be combined with the compare, repair and continuous sync modes. (default: %(default)s)')
+    parser.add_argument('--scheduler-workers', dest='scheduler_workers', default = 4, type=int, help='Number of objects copied at the same time by "--scheduler dag", each one with its own source and target connection. (default: %(default)d)')
+    parser.add_argument('--connection-pool-size', dest='connection_pool_size', default = DEFAULT_POOL_SIZE, type=int, help='Maximum number of idle connections kept open per server and database. Workers (see "--parallel-tables", "--range-partitions", "--repair-workers", "--index-workers") take their connections from this pool and return them when they are done, so the next tables and reconnects need no new login. 0 disables the pool. (default: %(default)d)')
+    parser.add_argument('--warm-connections', dest='warm_connections', default=True, action=argparse.BooleanOptionalAction, help='Open the connections of the parallel workers in the background while the tables are prepared, instead of when the workers start. (default: %(default)s)')
+    parser.add_argument('--reconnect-attempts', dest='reconnect_attempts', default = DEFAULT_RECONNECT_ATTEMPTS, type=int, help='Number of attempts to open a new connection if a source or target connection was lost (e.g. after a VPN interruption). The session state (IDENTITY_INSERT) is restored on the new connection, reads are repeated and copies with keyset paging continue after the last committed page. 0 disables reconnecting. (default: %(default)d)')
+
+    parser.add_argument('--incremental', dest='incremental', default=False, action=argparse.BooleanOptionalAction, help='Copy only the rows that changed since the last run: the high-water mark of "--watermark-column" is stored in the progress track file (required), the rows above it are copied into a staging table and applied to the target table with "--merge-mode" on its primary key. The target table is created if it does not exist, otherwise it is not truncated, recreated or reindexed. Deleted rows are not detected. (default: %(default)s)')
+    parser.add_argument('--watermark-column', dest='watermark_column', default = None, help='Column used as high-water mark by "--incremental", e.g. a modified date column. (default: the rowversion column of the table)')
+    parser.add_argument('--merge-mode', dest='merge_mode', default=MERGE_MODE_MERGE, choices=[MERGE_MODE_MERGE, MERGE_MODE_DELETE_INSERT], help='How "--incremental" applies the staging table to the target table: "merge" updates existing and inserts new rows with one MERGE statement, "delete-insert" deletes the existing rows and inserts all rows of the staging table. (default: %(default)s)')
+
+    parser.add_argument('--continuous-sync', dest='continuous_sync', default=None, choices=[SYNC_CHANGE_TRACKING, SYNC_CDC], help='Keep the target tables in sync with the source tables: copy every table once (if no sync version is stored in the progress track file, which is required), then read the changes since the last applied version from SQL Server Change Tracking ("change-tracking") or Change Data Capture ("cdc") and apply the inserts, updates and deletes to the target tables, every "--sync-poll-interval" seconds. Stop with Ctrl-C. (default: %(default)s)')
+    parser.add_argument('--sync-batch-size', dest='sync_batch_size', default = 10000, type=int, help='Maximum number of changed rows applied to the target table in one transaction by "--continuous-sync". (default: %(default)d)')
+    parser.add_argument('--sync-poll-interval', dest='sync_poll_interval', default = 10, type=float, help='Seconds to wait between two cycles of "--continuous-sync". (default: %(default)s)')
+    parser.add_argument('--sync-cycles', dest='sync_cycles', default = 0, type=int, help='Stop "--continuous-sync" after this number of cycles, 0 runs until it is stopped. (default: %(default)d)')
 
     parser.add_argument('--where', dest='where_clause', default = None, help='If set, this where clause is added to all queries executed on the source data source. If you only want to add some rows, use in combination with the params "--no-create-table --no-drop-indices --no-copy-indices". (default: %(default)s)')
     parser.add_argument('--delete-where', dest='delete_where', default = False, action=argparse.BooleanOptionalAction, help='Delete all rows in the target table using the given where clause if a where clause is set with the "--where" parameter. (default: %(default)s)')
@@ -80,7 +199,15 @@ def parse_args():
 
     parser.add_argument('--debug-sql', dest='debug_sql', default = False, action='store_true', help='If enabled, prints sql statements. (default: %(default)d)')
 
-    parser.add_argument('--progress-track-file', dest='progress_file_name', default = None, help='If set, a file with the given name is used to remember which tables/views it already processed sucessfully. If the script is restarted, all tables/views are not processed that were processed sucessfully before.". (default: %(default)s)')
+    parser.add_argument('--metrics-file', dest='metrics_file_name', default = None, help='If set, structured metrics are appended to this JSON lines file: one event per page (rows, estimated bytes, read/convert/write/commit seconds, retries), per table and per run. (default: %(default)s)')
+    parser.add_argument('--metrics-prometheus-file', dest='metrics_prometheus_file_name', default = None, help='If set, the per table and per run metrics are written as gauges to this Prometheus textfile (e.g. in the directory of the node_exporter textfile collector), after every table and at the end of the run. (default: %(default)s)')
+    parser.add_argument('--profile', dest='profile', default=False, action=argparse.BooleanOptionalAction, help='Measure the wall clock and CPU seconds of the phases of every page (query, fetch, convert, write, commit), print a breakdown per table with what the copy waited for most (client CPU, source or target) and write it to the "--profile-report". (default: %(default)s)')
+    parser.add_argument('--profile-report', dest='profile_report_file_name', default='copy-profile.json', help='File the profile report is written to (JSON), after every table. (default: %(default)s)')
+    parser.add_argument('--profile-cprofile', dest='profile_cprofile', default=False, action=argparse.BooleanOptionalAction, help='With "--profile", copy the tables under cProfile (one table at a time), add the top functions to the report and write the statistics of every table to a .pstats file next to the report. (default: %(default)s)')
+    parser.add_argument('--profile-memory', dest='profile_memory', default=False, action=argparse.BooleanOptionalAction, help='With "--profile", trace the Python memory with tracemalloc and add the peak memory of every page to the report. Slows down the copy. (default: %(default)s)')
+
+    parser.add_argument('--progress-track-file', dest='progress_file_name', default = None, help='If set, a SQLite database with the given name is used to remember which tables/views it already processed sucessfully, together with their status, timing, errors, watermarks and checkpoints. If the script is restarted, all tables/views are not processed that were processed sucessfully before. An old text progress file is migrated automatically. (default: %(default)s)')
+    parser.add_argument('--progress-list', dest='progress_list', nargs='?', const='pending', default=None, choices=['pending', 'failed', 'success', 'all'], help='Only list the operations of the "--progress-track-file" with their status, start time, duration, attempts and error and exit: "pending" (started but not finished, i.e. running or interrupted), "failed", "success" or "all". No server is needed. (default: %(default)s, without value: pending)')
 
 
     return parser
@@ -105,63 +232,504 @@ def execute_sql_with_retry(cursor, sql, *parameters, max_retries=20, delay=1, ba
         try:
             return execute_sql(cursor, sql, *parameters)
         except pyodbc.OperationalError as e:
+            # A lost connection of a session is reopened, if nothing uncommitted is lost with it (see Session)
+            if isinstance(cursor, SessionCursor) and is_connection_lost(e) and cursor.session.can_reconnect():
+                if cursor.session.dirty or attempt >= max_retries - 1:
+                    raise
+                print(f"Connection lost, reconnecting to {cursor.session.config['server']} (attempt {attempt + 1}/{max_retries})...", flush=True)
+                retry_counter.count = get_retry_count() + 1
+                cursor.session.reconnect()
+                continue
             # Only retry for specific network/transient errors (e.g., TCP Provider 10060/0x274C)
             if "TCP Provider: Error code 0x274C" in str(e) or "10060" in str(e) or "TCP Provider: Error code 0x68" in str(e) or "104" in str(e) or "08S01" in str(e):
                 if attempt < max_retries - 1:
                     print(f"Transient network error encountered, retrying in {delay} seconds (attempt {attempt + 1}/{max_retries})...", flush=True)
+                    retry_counter.count = get_retry_count() + 1
                     time.sleep(delay)
                     delay *= backoff
                     continue
             raise    # rethrow other errors
 
-# Function to create a connection',
-def create_connection(config) -> pyodbc.Connection:
-#    conn_str = f'DRIVER={config["driver"]};SERVER={config["server"]};DATABASE={config["database"]};UID={config["user"]};PWD={config["password"]};Encrypt=Yes;TrustServerCertificate=Yes;'
-# jdbc:sqlserver://portal-int-cl1-prod-sqlserver.database.windows.net:1433;encrypt=true;trustServerCertificate=false;hostNameInCertificate=*.database.windows.net;loginTimeout=30;authentication=ActiveDirectoryPassword
+def get_retry_count() -> int:
+    return getattr(retry_counter, 'count', 0)
+
+def execute_query_timed(cursor, sql, *parameters) -> pyodbc.Cursor:
+    """
+    execute_sql_with_retry, adding the wall clock and CPU seconds of the current thread to its query timer, so the
+    time to read a page can be split into executing the query and fetching the rows (see time_pages).
+    """
+    start_time = perf_counter()
+    start_cpu = time.thread_time()
+    try:
+        return execute_sql_with_retry(cursor, sql, *parameters)
+    finally:
+        query_sec, query_cpu_sec = get_query_time()
+        query_timer.seconds = (query_sec + perf_counter() - start_time, query_cpu_sec + time.thread_time() - start_cpu)
+
+def get_query_time() -> Tuple[float, float]:
+    return getattr(query_timer, 'seconds', (0.0, 0.0))
+
+class MetricsSink:
+    """
+    Structured metrics of the run: every page, table and the run are written as one JSON object per line to the
+    JSON lines file, and the table and run summaries are written as gauges to a Prometheus textfile (for the
+    textfile collector of the node_exporter) after every table and at the end of the run. Without files,
+    nothing is written.
+    """
+    def __init__(self):
+        self.json_file_name = None
+        self.prometheus_file_name = None
+        self.run_id = None
+        self.start_time = perf_counter()
+        self.tables: Dict[str, Dict[str, float]] = {}
+        self.ranges: Dict[str, Dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def configure(self, json_file_name, prometheus_file_name):
+        self.json_file_name = json_file_name
+        self.prometheus_file_name = prometheus_file_name
+        self.run_id = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        self.start_time = perf_counter()
+
+    def write_event(self, event, **fields):
+        if not self.json_file_name:
+            return
+        record = {'event': event, 'time': datetime.now().isoformat(timespec='milliseconds'), 'run_id': self.run_id, **fields}
+        with self.lock, open(self.json_file_name, 'a') as file:
+            file.write(json.dumps(record, default=str) + '\n')
+
+    def page(self, **fields):
+        self.write_event('page', **fields)
+
+    def table(self, table, key_range=None, **summary):
+        """
+        Record the summary of copying (a part of) a table: rows, bytes, pages, retries and seconds.
+
+        The summary of a key range (see copy_data_ranges) is written as "range" event only, the ranges run at the
+        same time and their seconds cannot be added up. Their rows, bytes, pages and retries are collected for the
+        summary of the whole table (see finish_ranges).
+        """
+        if key_range is not None:
+            self.write_event('range', table=table, range=key_range, **summary)
+            with self.lock:
+                totals = self.ranges.setdefault(table, {})
+                for name in ['rows', 'bytes', 'pages', 'retries']:
+                    totals[name] = totals.get(name, 0) + summary.get(name, 0)
+            return
+        self.write_event('table', table=table, **summary)
+        with self.lock:
+            totals = self.tables.setdefault(table, {})
+            for name in ['rows', 'bytes', 'pages', 'retries', 'duration_sec']:
+                totals[name] = totals.get(name, 0) + summary.get(name, 0)
+        self.write_prometheus(finished=False)
+
+    def finish_ranges(self, table, duration_sec, **fields):
+        """
+        Record the summary of a table copied in key ranges, with the wall clock seconds of copying all ranges.
+        """
+        with self.lock:
+            totals = self.ranges.pop(table, {'rows': 0, 'bytes': 0, 'pages': 0, 'retries': 0})
+        self.table(table, duration_sec=round(duration_sec, 3), rows_per_sec=round(totals['rows'] / duration_sec, 1) if duration_sec > 0 else 0,
+                   mb_per_sec=round(totals['bytes'] / duration_sec / 1024 / 1024, 2) if duration_sec > 0 else 0, **fields, **totals)
+
+    def finish(self, success):
+        with self.lock:
+            totals = {name: sum(table.get(name, 0) for table in self.tables.values()) for name in ['rows', 'bytes', 'retries']}
+        duration_sec = perf_counter() - self.start_time
+        self.write_event('run', success=success, tables=len(self.tables), duration_sec=round(duration_sec, 3),
+                         rows_per_sec=round(totals['rows'] / duration_sec, 1) if duration_sec > 0 else 0, **totals)
+        self.write_prometheus(finished=True, success=success)
+
+    def write_prometheus(self, finished, success=True):
+        if not self.prometheus_file_name:
+            return
+        with self.lock:
+            tables = {name: dict(totals) for name, totals in self.tables.items()}
+        lines = []
+        def escape_label(label):
+            return str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        def gauge(name, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in samples:
+                label_text = ','.join([f'{key}="{escape_label(label)}"' for key, label in labels.items()])
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        gauge('mssql_copy_table_rows', 'Rows copied per table in the last run.', [({'table': name}, totals['rows']) for name, totals in tables.items()])
+        gauge('mssql_copy_table_bytes', 'Estimated bytes copied per table in the last run.', [({'table': name}, totals['bytes']) for name, totals in tables.items()])
+        gauge('mssql_copy_table_pages', 'Pages copied per table in the last run.', [({'table': name}, totals['pages']) for name, totals in tables.items()])
+        gauge('mssql_copy_table_retries', 'Retries of transient errors per table in the last run.', [({'table': name}, totals['retries']) for name, totals in tables.items()])
+        gauge('mssql_copy_table_duration_seconds', 'Seconds used to copy the data per table in the last run.', [({'table': name}, round(totals['duration_sec'], 3)) for name, totals in tables.items()])
+        gauge('mssql_copy_table_rows_per_second', 'Rows per second per table in the last run.', [({'table': name}, round(totals['rows'] / totals['duration_sec'], 1) if totals['duration_sec'] > 0 else 0) for name, totals in tables.items()])
+        gauge('mssql_copy_run_tables', 'Tables copied in the last run.', [({}, len(tables))])
+        gauge('mssql_copy_run_rows', 'Rows copied in the last run.', [({}, sum(totals['rows'] for totals in tables.values()))])
+        gauge('mssql_copy_run_duration_seconds', 'Seconds since the start of the last run.', [({}, round(perf_counter() - self.start_time, 3))])
+        gauge('mssql_copy_run_finished', '1 if the last run finished, 0 while it is running.', [({}, 1 if finished else 0)])
+        gauge('mssql_copy_run_success', '1 if the last run finished without error.', [({}, 1 if finished and success else 0)])
+        gauge('mssql_copy_run_timestamp_seconds', 'Time of the last update of the metrics.', [({}, round(time.time(), 3))])
+
+        # write to a temporary file and rename it, so the collector never reads a partial file
+        temp_file_name = f'{self.prometheus_file_name}.{os.getpid()}.tmp'
+        with self.lock:
+            with open(temp_file_name, 'w') as file:
+                file.write('\n'.join(lines) + '\n')
+            os.replace(temp_file_name, self.prometheus_file_name)
+
+metrics = MetricsSink()
+
+class TableProfile:
+    """
+    Profile of copying (a part of) one table, see CopyProfiler.
+    """
+    def __init__(self, table, target_table, cprofile=None):
+        self.table = table
+        self.target_table = target_table
+        self.cprofile = cprofile
+        self.pages = []
+        self.rows = 0
+        self.phases = {phase: [0.0, 0.0] for phase in CopyProfiler.PHASES}
+        self.peak_memory_bytes = 0
+
+class CopyProfiler:
+    """
+    Profile of copying the data (--profile): the wall clock and CPU seconds of the phases of every page: executing the
+    source query, fetching the rows, converting them, writing them (executemany or the bulk load) and the commit.
+    The CPU seconds are those of the copying thread (Python and the ODBC driver), the rest of the wall clock time
+    was spent waiting for the network or the servers. Optionally a table is copied under cProfile and the peak
+    Python memory of every page is traced with tracemalloc. The report (JSON) is written after every table.
+    """
+    PHASES = ['query', 'fetch', 'convert', 'write', 'commit']
+    TOP_FUNCTIONS = 25
+
+    def __init__(self):
+        self.report_file_name = None
+        self.use_cprofile = False
+        self.trace_memory = False
+        self.cprofile_table = None # profile of the table copied under cProfile, only one cProfile profiler can be active at a time
+        self.tables: List[dict] = []
+        self.lock = threading.Lock()
+
+    def configure(self, report_file_name, use_cprofile=False, trace_memory=False):
+        self.report_file_name = report_file_name
+        self.use_cprofile = use_cprofile
+        self.trace_memory = trace_memory
+        if trace_memory:
+            tracemalloc.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.report_file_name is not None
+
+    def start_table(self, table, target_table):
+        if not self.enabled:
+            return None
+        table_profile = TableProfile(table, target_table)
+        with self.lock:
+            if self.use_cprofile and self.cprofile_table is None:
+                self.cprofile_table = table_profile
+                table_profile.cprofile = cProfile.Profile()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        if table_profile.cprofile:
+            table_profile.cprofile.enable()
+        return table_profile
+
+    def page(self, table_profile, page, rows, phases):
+        """
+        Record the (wall clock, CPU) seconds of the phases of a page.
+        """
+        if not table_profile:
+            return
+        record = {'page': page, 'rows': rows}
+        for phase, (wall_sec, cpu_sec) in phases.items():
+            table_profile.phases[phase][0] += wall_sec
+            table_profile.phases[phase][1] += cpu_sec
+            record[f'{phase}_sec'] = round(wall_sec, 4)
+            record[f'{phase}_cpu_sec'] = round(cpu_sec, 4)
+        if self.trace_memory:
+            # peak since the previous page, all threads (e.g. the page reader of a pipelined copy) included
+            record['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+            table_profile.peak_memory_bytes = max(table_profile.peak_memory_bytes, record['peak_memory_bytes'])
+            tracemalloc.reset_peak()
+        table_profile.rows += rows
+        table_profile.pages.append(record)
+
+    def stop_table(self, table_profile):
+        """
+        Stop the cProfile profiler of the table (also if copying the table failed), so another table can be profiled.
+        """
+        if table_profile and table_profile.cprofile:
+            table_profile.cprofile.disable()
+            with self.lock:
+                if self.cprofile_table is table_profile:
+                    self.cprofile_table = None
+
+    def finish_table(self, table_profile, duration_sec):
+        if not table_profile:
+            return
+        self.stop_table(table_profile)
+        summary = {
+            'table': table_profile.table,
+            'target_table': table_profile.target_table,
+            'rows': table_profile.rows,
+            'duration_sec': round(duration_sec, 3),
+            'phases': {phase: {'sec': round(wall_sec, 3), 'cpu_sec': round(cpu_sec, 3)} for phase, (wall_sec, cpu_sec) in table_profile.phases.items()},
+            'bound_by': self.get_bound(table_profile.phases),
+        }
+        if self.trace_memory:
+            summary['peak_memory_bytes'] = table_profile.peak_memory_bytes
+        if table_profile.cprofile:
+            summary['cprofile_file'] = f'{os.path.splitext(self.report_file_name)[0]}.{table_profile.table}.pstats'
+            table_profile.cprofile.dump_stats(summary['cprofile_file'])
+            summary['top_functions'] = self.get_top_functions(table_profile.cprofile)
+        summary['pages'] = table_profile.pages
+
+        phase_text = ' '.join([f"{phase} {wall_sec:.1f}s (cpu {cpu_sec:.1f}s)" for phase, (wall_sec, cpu_sec) in table_profile.phases.items()])
+        memory_text = f", peak memory {table_profile.peak_memory_bytes / 1024 / 1024:.1f} MB" if self.trace_memory else ''
+        print(f"Profile of {table_profile.table}: {phase_text}{memory_text} - bound by {summary['bound_by']}", flush=True)
+
+        with self.lock:
+            self.tables.append(summary)
+            report = {'created': datetime.now().isoformat(timespec='seconds'), 'tables': self.tables}
+            with open(self.report_file_name, 'w') as file:
+                json.dump(report, file, indent=2, default=str)
+
+    @staticmethod
+    def get_bound(phases) -> str:
+        """
+        What the copy waited for most: the CPU of the client (Python and the ODBC driver), the source (query and fetch
+        without CPU: server and network) or the target (write and commit without CPU: server and network).
+        """
+        waits = {
+            'client CPU (Python/ODBC driver)': sum(cpu_sec for wall_sec, cpu_sec in phases.values()),
+            'source (server/network)': sum(max(0.0, phases[phase][0] - phases[phase][1]) for phase in ['query', 'fetch']),
+            'target (server/network)': sum(max(0.0, phases[phase][0] - phases[phase][1]) for phase in ['write', 'commit']),
+        }
+        total_sec = sum(waits.values())
+        bound = max(waits, key=waits.get)
+        return f"{bound} {waits[bound] / total_sec * 100:.0f}%" if total_sec > 0 else bound
+
+    @classmethod
+    def get_top_functions(cls, cprofile) -> List[dict]:
+        stats = pstats.Stats(cprofile).stats
+        top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:cls.TOP_FUNCTIONS]
+        return [{'function': pstats.func_std_string(function), 'calls': calls, 'own_sec': round(own_sec, 4), 'cumulative_sec': round(cumulative_sec, 4)}
+                for function, (primitive_calls, calls, own_sec, cumulative_sec, callers) in top]
+
+profiler = CopyProfiler()
+
+class ColumnInfo(NamedTuple):
+    COLUMN_NAME: str
+    DATA_TYPE: str
+    CHARACTER_MAXIMUM_LENGTH: int
+    IS_NULLABLE: str
+    COLUMN_DEFAULT: str
+    DATETIME_PRECISION: int
+    NUMERIC_PRECISION: int
+    NUMERIC_SCALE: int
+    ORDINAL_POSITION: int
+    is_identity: bool
+    is_computed: bool
+
+class PrimaryKeyInfo(NamedTuple):
+    PK_NAME: str
+    INDEX_TYPE: str
+    COLUMN_NAMES: List[str]
+
+class IndexInfo(NamedTuple):
+    index_name: str
+    is_unique: bool
+    is_primary_key: bool
+    is_unique_constraint: bool
+    columns: List[str] # in the order of the index definition (index_column_id)
+    key_columns: List[str] # in key order (key_ordinal), without included columns
+    index_type: str # CLUSTERED, NONCLUSTERED, CLUSTERED COLUMNSTORE, ...
+    descending_columns: List[str]
+    included_columns: List[str]
+    filter_definition: str
+
+class CatalogSnapshot:
+    """
+    Metadata of all tables, views and synonyms of a schema (columns, identity columns, primary keys, indices, view
+    definitions and synonym base objects), loaded with one set-based query per kind and kept in memory, so the
+    per-table functions do not need their own catalog queries (see get_catalog).
+    """
+    def __init__(self, conn, schema_name):
+        self.schema_name = schema_name
+        self.tables: List[str] = []
+        self.views: Dict[str, str] = {} # view name -> definition
+        self.synonyms: Dict[str, str] = {} # synonym name -> base object name
+        self.columns: Dict[str, List[ColumnInfo]] = {}
+        self.primary_keys: Dict[str, PrimaryKeyInfo] = {}
+        self.indices: Dict[str, List[IndexInfo]] = {}
+        self.missing_tables = set() # names that were looked up, but do not exist (see get_catalog)
+        if conn is None:
+            return # filled with add_table_metadata
+        self.load(conn)
+
+    def load(self, conn, table_name=None):
+        """
+        Load the metadata of all objects of the schema, or only of the given table (or view or synonym).
+        """
+        if table_name:
+            self.remove_object(table_name)
+        parameters = [self.schema_name] + ([table_name] if table_name else [])
+
+        with conn.cursor() as cursor:
+            execute_sql_with_retry(cursor, f"""
+                SELECT o.name AS OBJECT_NAME, RTRIM(o.type) AS OBJECT_TYPE, m.definition AS DEFINITION, syn.base_object_name AS BASE_OBJECT_NAME
+                FROM sys.objects o
+                    JOIN sys.schemas s ON o.schema_id = s.schema_id
+                    LEFT JOIN sys.sql_modules m ON m.object_id = o.object_id
+                    LEFT JOIN sys.synonyms syn ON syn.object_id = o.object_id
+                WHERE s.name = ? AND o.type IN ('U', 'V', 'SN'){' AND o.name = ?' if table_name else ''}
+                ORDER BY o.name
+            """, *parameters)
+            for row in cursor.fetchall():
+                if row.OBJECT_TYPE == 'U':
+                    self.tables.append(row.OBJECT_NAME)
+                elif row.OBJECT_TYPE == 'V':
+                    self.views[row.OBJECT_NAME] = row.DEFINITION
+                else:
+                    self.synonyms[row.OBJECT_NAME] = row.BASE_OBJECT_NAME
+
+            execute_sql_with_retry(cursor, f"""
+                SELECT c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE,
+                    c.CHARACTER_MAXIMUM_LENGTH, c.IS_NULLABLE,
+                    c.COLUMN_DEFAULT, c.DATETIME_PRECISION,
+                    c.NUMERIC_PRECISION, c.NUMERIC_SCALE, c.ORDINAL_POSITION,
+                    col.is_identity, col.is_computed
+                FROM INFORMATION_SCHEMA.COLUMNS c
+                JOIN sys.columns col
+                    ON col.object_id = OBJECT_ID(QUOTENAME(c.TABLE_SCHEMA) + '.' + QUOTENAME(c.TABLE_NAME))
+                    AND col.name = c.COLUMN_NAME
+                WHERE c.TABLE_SCHEMA = ?{' AND c.TABLE_NAME = ?' if table_name else ''}
+                ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+            """, *parameters)
+            for row in cursor.fetchall():
+                self.columns.setdefault(row.TABLE_NAME, []).append(ColumnInfo(*row[1:]))
+
+            execute_sql_with_retry(cursor, f"""
+                SELECT t.name AS TABLE_NAME, i.name AS INDEX_NAME, i.type_desc AS INDEX_TYPE,
+                    i.is_unique, i.is_primary_key, i.is_unique_constraint, i.filter_definition,
+                    col.name AS COLUMN_NAME, ic.key_ordinal, ic.is_descending_key, ic.is_included_column
+                FROM sys.tables t
+                    JOIN sys.schemas s ON t.schema_id = s.schema_id
+                    JOIN sys.indexes i ON t.object_id = i.object_id
+                    JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+                    JOIN sys.columns col ON ic.object_id = col.object_id AND ic.column_id = col.column_id
+                WHERE s.name = ? AND i.type_desc <> 'HEAP'{' AND t.name = ?' if table_name else ''}
+                ORDER BY t.name, i.name, ic.index_column_id
+            """, *parameters)
+            index_rows = {}
+            for row in cursor.fetchall():
+                index_rows.setdefault((row.TABLE_NAME, row.INDEX_NAME), []).append(row)
+            for (index_table_name, index_name), rows in index_rows.items():
+                first = rows[0]
+                key_columns = [row.COLUMN_NAME for row in sorted(rows, key=lambda row: row.key_ordinal) if row.key_ordinal > 0]
+                self.indices.setdefault(index_table_name, []).append(IndexInfo(index_name, first.is_unique, first.is_primary_key, first.is_unique_constraint,
+                    [row.COLUMN_NAME for row in rows], key_columns, first.INDEX_TYPE,
+                    [row.COLUMN_NAME for row in rows if row.is_descending_key],
+                    [row.COLUMN_NAME for row in rows if row.is_included_column],
+                    first.filter_definition))
+                if first.is_primary_key:
+                    self.primary_keys[index_table_name] = PrimaryKeyInfo(index_name, first.INDEX_TYPE, key_columns)
+
+    def remove_object(self, name):
+        """
+        Forget the metadata of the table, view or synonym (e.g. after it was created, changed or dropped).
+        """
+        if name in self.tables:
+            self.tables.remove(name)
+        for metadata in [self.views, self.synonyms, self.columns, self.primary_keys, self.indices]:
+            metadata.pop(name, None)
+        self.missing_tables.discard(name)
+
+    def has_table(self, table_name) -> bool:
+        return table_name in self.columns
+
+    def get_columns(self, table_name) -> List[ColumnInfo]:
+        return self.columns.get(table_name, [])
+
+    def get_primary_key(self, table_name) -> PrimaryKeyInfo:
+        return self.primary_keys.get(table_name)
+
+    def get_indices(self, table_name) -> List[IndexInfo]:
+        return self.indices.get(table_name, [])
 
-    conn_str = f'DRIVER={config["driver"]};SERVER={config["server"]};DATABASE={config["database"]};Encrypt=Yes;TrustServerCertificate=Yes;hostNameInCertificate=*.database.windows.net;loginTimeout=30'
-    attrs_before = None
+    def get_table_metadata(self, table_name) -> dict:
+        """
+        The metadata of the table as JSON serializable dict (e.g. to embed the table definition in exported files).
+        """
+        primary_key = self.get_primary_key(table_name)
+        return {
+            'columns': [column._asdict() for column in self.get_columns(table_name)],
+            'primary_key': primary_key._asdict() if primary_key else None,
+            'indices': [index._asdict() for index in self.get_indices(table_name)],
+        }
+
+    def add_table_metadata(self, table_name, metadata):
+        self.tables.append(table_name)
+        self.columns[table_name] = [ColumnInfo(**column) for column in metadata['columns']]
+        if metadata['primary_key']:
+            self.primary_keys[table_name] = PrimaryKeyInfo(**metadata['primary_key'])
+        self.indices[table_name] = [IndexInfo(**index) for index in metadata['indices']]
+
+catalog_cache: Dict[Tuple[str, str, str], CatalogSnapshot] = {}
+catalog_cache_lock = threading.Lock()
+
+def get_catalog(conn, schema_name, table_name=None) -> CatalogSnapshot:
+    """
+    Return the cached catalog snapshot of the schema of this server and database, load it on first use.
 
-    if "authentication" in config and config["authentication"]  == 'AzureActiveDirectory':
-        if not azure_identity_available:
-            print("For AzureActiveDirectory authentication, please install azure-identity first!")
-            sys.exit(-1)
+    If a table name is given that is not part of the snapshot (e.g. it was created after the snapshot was
+    taken), only this table is loaded. A table that does not exist is remembered, so it is not looked up
+    again until it is created (see invalidate_catalog_object).
+    """
+    key = get_catalog_key(conn, schema_name)
+    with catalog_cache_lock:
+        catalog = catalog_cache.get(key)
+        if catalog is None:
+            catalog = CatalogSnapshot(conn, schema_name)
+            catalog_cache[key] = catalog
+        elif table_name is not None and not catalog.has_table(table_name) and table_name not in catalog.missing_tables:
+            catalog.load(conn, table_name)
+            if not catalog.has_table(table_name):
+                catalog.missing_tables.add(table_name)
+        return catalog
+
+def invalidate_catalog_object(conn, schema_name, name):
+    """
+    Forget the cached metadata of a table, view or synonym after DDL on it (create, drop, alter, indices),
+    it is loaded again on its next lookup.
+    """
+    with catalog_cache_lock:
+        catalog = catalog_cache.get(get_catalog_key(conn, schema_name))
+        if catalog is not None:
+            catalog.remove_object(name)
 
-        # Use the cli credential to get a token after the user has signed in via the Azure CLI 'az login' command.
-        credential = AzureCliCredential()
-        databaseToken = credential.get_token('https://database.windows.net/')
+def load_catalog(conn, schema_name) -> CatalogSnapshot:
+    """
+    Load a new catalog snapshot of the schema (e.g. to compare the current state) and replace the cached one.
+    """
+    catalog = CatalogSnapshot(conn, schema_name)
+    with catalog_cache_lock:
+        catalog_cache[get_catalog_key(conn, schema_name)] = catalog
+    return catalog
 
-        # get bytes from token obtained
-        tokenb = bytes(databaseToken[0], "UTF-16-LE")
-        tokenstruct = struct.pack("=i", len(tokenb)) + tokenb;
-        SQL_COPT_SS_ACCESS_TOKEN = 1256 
-        attrs_before = {SQL_COPT_SS_ACCESS_TOKEN:tokenstruct}
-        print(f'using authentication {config["authentication"]}...', end="")
+def get_catalog_key(conn, schema_name) -> Tuple[str, str, str]:
+    return (conn.getinfo(pyodbc.SQL_SERVER_NAME), conn.getinfo(pyodbc.SQL_DATABASE_NAME), schema_name)
 
-    else:
-        # username/password:    
-        conn_str = conn_str + f';UID={config["user"]};PWD={config["password"]}'
-        print(f'using authentication username/password', end="")
-    
-    return pyodbc.connect(conn_str, attrs_before = attrs_before)
+def clear_catalog_cache():
+    with catalog_cache_lock:
+        catalog_cache.clear()
 
 # Function to get the create table query
-def get_create_table_query(source_cursor, source_schema, table_name, target_schema) -> str:
-    # Get column definitions
-    source_cursor.execute(f"""
-        SELECT 
-            c.COLUMN_NAME, c.DATA_TYPE, 
-            c.CHARACTER_MAXIMUM_LENGTH, c.IS_NULLABLE, 
-            c.COLUMN_DEFAULT, c.DATETIME_PRECISION,
-            c.NUMERIC_PRECISION, c.NUMERIC_SCALE,
-            col.is_identity
-        FROM INFORMATION_SCHEMA.COLUMNS c
-        JOIN sys.columns col
-            ON col.name = c.COLUMN_NAME
-            AND col.object_id = OBJECT_ID(N'{source_schema}.{table_name}')
-        WHERE c.TABLE_SCHEMA = N'{source_schema}' AND c.TABLE_NAME = N'{table_name}'
-    """)
-    columns = source_cursor.fetchall()
+def get_create_table_query(source_cursor, source_schema, table_name, target_schema, include_primary_key=True, catalog=None) -> str:
+    # Get column definitions (of the given catalog snapshot, e.g. read from exported files)
+    catalog = catalog or get_catalog(source_cursor.connection, source_schema, table_name)
+    columns = catalog.get_columns(table_name)
 
     column_definitions = []
     for column in columns:
@@ -189,55 +757,44 @@ def get_create_table_query(source_cursor, source_schema, table_name, target_sche
 
         column_definitions.append(col_def)
 
-    # Improved query to fetch primary key information
-    source_cursor.execute(f"""
-        SELECT 
-            kc.name AS PK_NAME, 
-            i.type_desc AS INDEX_TYPE,
-            STRING_AGG(col.name, ', ') WITHIN GROUP (ORDER BY ic.key_ordinal) AS COLUMN_NAMES
-        FROM 
-            sys.tables t
-            JOIN sys.schemas s ON t.schema_id = s.schema_id
-            JOIN sys.indexes i ON t.object_id = i.object_id
-            JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
-            JOIN sys.columns col ON ic.object_id = col.object_id AND ic.column_id = col.column_id
-            JOIN sys.key_constraints kc ON t.object_id = kc.parent_object_id AND kc.type = 'PK' AND i.index_id = kc.unique_index_id
-        WHERE 
-            t.name = N'{table_name}' 
-            AND s.name = N'{source_schema}'
-            AND i.is_primary_key = 1
-        GROUP BY kc.name, i.type_desc
-    """)
-    pk_info = source_cursor.fetchone()
-
-    pk_definition = ''
-    if pk_info:
-        pk_name = pk_info.PK_NAME
-        index_type = "CLUSTERED" if pk_info.INDEX_TYPE == "CLUSTERED" else "NONCLUSTERED"
-        pk_definition = f", CONSTRAINT {pk_name} PRIMARY KEY {index_type} ({pk_info.COLUMN_NAMES})"
+    pk_definition = get_primary_key_definition(source_cursor, source_schema, table_name, catalog) if include_primary_key else None
 
     # Combine to form CREATE TABLE statement
-    create_table_statement = f"CREATE TABLE [{target_schema}].[{table_name}] ({', '.join(column_definitions)}{pk_definition})"
+    create_table_statement = f"CREATE TABLE [{target_schema}].[{table_name}] ({', '.join(column_definitions)}{', ' + pk_definition if pk_definition else ''})"
     return create_table_statement
 
+def get_primary_key_definition(source_cursor, source_schema, table_name, catalog=None) -> str:
+    """
+    Return the primary key constraint definition ("CONSTRAINT name PRIMARY KEY CLUSTERED (columns)") of the table,
+    or None if the table has no primary key.
+    """
+    pk_info = (catalog or get_catalog(source_cursor.connection, source_schema, table_name)).get_primary_key(table_name)
+    if not pk_info:
+        return None
+    pk_name = pk_info.PK_NAME
+    index_type = "CLUSTERED" if pk_info.INDEX_TYPE == "CLUSTERED" else "NONCLUSTERED"
+    return f"CONSTRAINT {pk_name} PRIMARY KEY {index_type} ({', '.join(pk_info.COLUMN_NAMES)})"
+
+
+def get_copy_columns(conn, schema_name, table_name) -> List[ColumnInfo]:
+    """
+    The columns whose values are copied: all columns except rowversion (timestamp) columns, which cannot be
+    inserted and get new values in the target table.
+    """
+    columns = get_catalog(conn, schema_name, table_name).get_columns(table_name)
+    return [column for column in columns if column.DATA_TYPE != 'timestamp']
 
 # fetch input sizes for decimal columns (see https://github.com/mkleehammer/pyodbc/issues/845)
 def get_input_sizes(conn, schema_name, table_name) -> []:
-    cursor = conn.cursor()
-    
-    # Query column types, precision, scale, and character maximum length
-    execute_sql(cursor, f"""
-        SELECT COLUMN_NAME, DATA_TYPE, NUMERIC_PRECISION, NUMERIC_SCALE, CHARACTER_MAXIMUM_LENGTH 
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
-    """, (schema_name, table_name))
+    # column types, precision, scale, and character maximum length
+    columns = get_copy_columns(conn, schema_name, table_name)
 
     # Define a large size for VARCHAR(MAX)
     varchar_max_size = 512000  # This is a large size that is typically used to represent VARCHAR(MAX)
 
     input_sizes = []
-    for row in cursor.fetchall():
-        column_name, data_type, precision, scale, char_max_length = row
+    for column in columns:
+        data_type, precision, scale = column.DATA_TYPE, column.NUMERIC_PRECISION, column.NUMERIC_SCALE
         
         # Handle decimal columns
         if data_type == 'decimal':
@@ -257,35 +814,26 @@ def get_input_sizes(conn, schema_name, table_name) -> []:
 
     return input_sizes
 
-def get_primary_key(source_conn, source_schema, table_name):
+class PrimaryKeyColumn(NamedTuple):
+    COLUMN_NAME: str
+    DATA_TYPE: str
+    DATETIME_PRECISION: int = None
+
+def get_primary_key(source_conn, source_schema, table_name) -> List[PrimaryKeyColumn]:
     """
-    Return all primar key columns comma separated
+    Return all primary key columns (COLUMN_NAME, DATA_TYPE, DATETIME_PRECISION) in key order.
 
     :param source_conn: The database connection object.
     :param source_schema: The schema of the table.
     :param table_name: The name of the table.
-    :return: The name of the numerical primary key column, or None if not found.
+    :return: The primary key rows, an empty list if the table has no primary key.
     """
-    with source_conn.cursor() as cursor:
-        # Query to find the primary key
-        pk_query = f"""
-            SELECT kcu.COLUMN_NAME, c.DATA_TYPE
-            FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
-            INNER JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
-                ON tc.CONSTRAINT_NAME = kcu.CONSTRAINT_NAME
-                AND tc.TABLE_SCHEMA = kcu.TABLE_SCHEMA
-                AND tc.TABLE_NAME = kcu.TABLE_NAME
-            INNER JOIN INFORMATION_SCHEMA.COLUMNS c
-                ON kcu.COLUMN_NAME = c.COLUMN_NAME
-                AND kcu.TABLE_SCHEMA = c.TABLE_SCHEMA
-                AND kcu.TABLE_NAME = c.TABLE_NAME
-            WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
-                AND tc.TABLE_SCHEMA = '{source_schema}'
-                AND tc.TABLE_NAME = '{table_name}'
-        """
-        execute_sql(cursor, pk_query)
-        rows = cursor.fetchall()
-        return rows
+    catalog = get_catalog(source_conn, source_schema, table_name)
+    pk_info = catalog.get_primary_key(table_name)
+    if not pk_info:
+        return []
+    columns = {column.COLUMN_NAME: column for column in catalog.get_columns(table_name)}
+    return [PrimaryKeyColumn(column_name, columns[column_name].DATA_TYPE, columns[column_name].DATETIME_PRECISION) for column_name in pk_info.COLUMN_NAMES]
 
 
 def get_numerical_primary_key(source_conn, source_schema, table_name) -> str:
@@ -317,125 +865,703 @@ def get_primary_key_column_names(source_conn, source_schema, table_name):
     primary_key_columns_str = ', '.join(primary_key_columns)
     return primary_key_columns_str
 
+# estimated bytes per value of fixed size types (incl. python object overhead)
+FIXED_TYPE_BYTES = {
+    'bit': 1, 'tinyint': 1, 'smallint': 2, 'int': 4, 'bigint': 8, 'real': 4, 'float': 8,
+    'smallmoney': 4, 'money': 8, 'decimal': 17, 'numeric': 17,
+    'date': 3, 'time': 5, 'smalldatetime': 4, 'datetime': 8, 'datetime2': 8, 'datetimeoffset': 10,
+    'uniqueidentifier': 16, 'timestamp': 8,
+}
+PYTHON_VALUE_OVERHEAD_BYTES = 40
+LOB_VALUE_BYTES = 8000
+
+def estimate_row_bytes(conn, schema_name, table_name) -> int:
+    """
+    Estimate the memory used by one row of the table while copying it, from the column metadata. Variable
+    length columns are assumed to be half filled, (max) columns are assumed to hold LOB_VALUE_BYTES.
+    """
+    row_bytes = 0
+    for column in get_catalog(conn, schema_name, table_name).get_columns(table_name):
+        data_type, char_max_length = column.DATA_TYPE, column.CHARACTER_MAXIMUM_LENGTH
+        if data_type in FIXED_TYPE_BYTES:
+            value_bytes = FIXED_TYPE_BYTES[data_type]
+        elif char_max_length is None or char_max_length == -1:
+            value_bytes = LOB_VALUE_BYTES # (max), text, xml, ...
+        else:
+            value_bytes = char_max_length * (2 if data_type in ['nchar', 'nvarchar'] else 1)
+            if data_type not in ['char', 'nchar', 'binary']:
+                value_bytes //= 2
+        row_bytes += value_bytes + PYTHON_VALUE_OVERHEAD_BYTES
+    return max(row_bytes, 1)
+
+class PageSizer:
+    """
+    Number of rows of the next page. A fixed page size is used as given. With auto sizing, the first page
+    size is computed from the estimated row size and the target page size in bytes, and after every page it is
+    adjusted from the measured throughput (rows per second of reading and writing the page): the size keeps
+    growing (or shrinking) as long as the throughput improves, turns around with a smaller step when it gets
+    worse and stays when the difference is too small. The page size never exceeds the maximum page bytes.
+    """
+    MIN_PAGE_SIZE = 100
+    STEP_FACTOR = 1.5
+    MIN_IMPROVEMENT = 1.05
+
+    def __init__(self, page_size, row_bytes=None, target_page_bytes=None, max_page_bytes=None):
+        self.auto = row_bytes is not None
+        self.size = page_size
+        self.sizes_used = set()
+        if self.auto:
+            self.max_size = max(self.MIN_PAGE_SIZE, max_page_bytes // row_bytes)
+            self.size = self.limit(target_page_bytes // row_bytes)
+            self.factor = self.STEP_FACTOR
+            self.last_rows_per_sec = None
+
+    def limit(self, size) -> int:
+        return int(min(max(size, self.MIN_PAGE_SIZE), self.max_size))
+
+    def update(self, row_count, duration_sec) -> bool:
+        """
+        Record the rows and seconds (read and write) of a page. Returns True if the page size was changed.
+        """
+        self.sizes_used.add(self.size)
+        if not self.auto or row_count < self.size or duration_sec <= 0:
+            return False # incomplete (last) page, says nothing about the page size
+        rows_per_sec = row_count / duration_sec
+        last_rows_per_sec = self.last_rows_per_sec
+        self.last_rows_per_sec = rows_per_sec
+        if last_rows_per_sec is not None and rows_per_sec < last_rows_per_sec * self.MIN_IMPROVEMENT:
+            if rows_per_sec * self.MIN_IMPROVEMENT > last_rows_per_sec:
+                return False # about the same throughput: keep the page size
+            # got worse: turn around with a smaller step
+            self.factor = 1 / self.factor ** 0.5
+        new_size = self.limit(self.size * self.factor)
+        changed = new_size != self.size
+        self.size = new_size
+        return changed
+
+def placeholder(data_type) -> str:
+    """
+    Parameter placeholder for a comparison with a column of the given type. Parameters of (var)char, datetime
+    and rowversion columns are cast to the column type, so the comparison does not convert the column and
+    the index can be used.
+    """
+    if data_type in ['varchar', 'char']:
+        return 'CAST(? AS varchar(8000))'
+    if data_type in ['datetime', 'smalldatetime', 'date']:
+        return f'CAST(? AS {data_type})'
+    if data_type == 'timestamp':
+        return 'CAST(? AS binary(8))'
+    return '?'
+
+def get_lossy_key_column(primary_key) -> PrimaryKeyColumn:
+    """
+    Return the first primary key column whose values do not survive the round trip through pyodbc, or None.
+
+    pyodbc reads datetime2, time and datetimeoffset values with microseconds only, a key of a higher precision
+    (e.g. datetime2(7)) sought with "> last key" would read the last row of the page again. Keyset paging and
+    the checkpoints (see copy_data) need the exact key, these tables use offset paging.
+    """
+    for column in primary_key:
+        if column.DATA_TYPE in ['datetime2', 'time'] and (column.DATETIME_PRECISION or 0) > 6:
+            return column
+        if column.DATA_TYPE in ['datetimeoffset', 'sql_variant', 'hierarchyid']:
+            return column
+    return None
+
+def get_keyset_condition(primary_key, last_key) -> Tuple[str, list]:
+    """
+    Build the seek condition "(pk1, pk2, ...) > last_key" used for keyset paging.
+
+    SQL Server does not support row value comparisons, so the comparison is expanded to
+    "(pk1 > ?) OR (pk1 = ? AND pk2 > ?) OR ..." (see placeholder for the parameter types).
+
+    :param primary_key: The primary key rows (COLUMN_NAME, DATA_TYPE) as returned by get_primary_key.
+    :param last_key: The primary key values of the last row read.
+    :return: The condition and the list of parameters for it.
+    """
+    conditions = []
+    parameters = []
+    for index, key_column in enumerate(primary_key):
+        parts = [f"source_table.[{column.COLUMN_NAME}] = {placeholder(column.DATA_TYPE)}" for column in primary_key[:index]]
+        parts.append(f"source_table.[{key_column.COLUMN_NAME}] > {placeholder(key_column.DATA_TYPE)}")
+        conditions.append(f"({' AND '.join(parts)})")
+        parameters.extend(last_key[:index + 1])
+    return f"({' OR '.join(conditions)})", parameters
+
+def read_pages(source_conn, source_cursor, source_schema, table_name, columns, page_start, page_sizer, where_clause=None, joins=None, primary_key=None, paging=PAGING_KEYSET, where_parameters=None, start_key=None):
+    """
+    Read the rows of the source table page by page and yield the rows of every page.
+
+    Keyset paging needs the primary key rows (see get_primary_key), streaming reads all rows with a single
+    query, the other paging strategies use the numerical primary key or an OFFSET query. The size of every
+    page is taken from the page sizer (see PageSizer), so it can change during the copy. The where clause
+    may contain "?" placeholders for the where parameters. Keyset paging starts after the start key, if given.
+    """
+    join_sql = " ".join([f'\nJOIN {join}' for join in joins]) if joins else ''
+    select_list = ', '.join([f'source_table.[{column}]' for column in columns])
+    where_parameters = list(where_parameters or [])
+
+    if paging == PAGING_STREAM:
+        # one query for all rows, the driver fetches one page at a time, so only one page is held in memory
+        execute_query_timed(source_cursor, f"""
+            SELECT {select_list}
+            FROM {source_schema}.{table_name} source_table
+            {join_sql}
+            {'WHERE ' + where_clause if where_clause else ''}
+        """, *where_parameters)
+        while True:
+            rows = source_cursor.fetchmany(page_sizer.size)
+            if not rows:
+                return
+            yield rows
+
+    if paging == PAGING_KEYSET:
+        order_by = ', '.join([f'source_table.[{column.COLUMN_NAME}]' for column in primary_key])
+        key_indices = [columns.index(column.COLUMN_NAME) for column in primary_key]
+        last_key = start_key
+        while True:
+            page_size = page_sizer.size
+            conditions = [f'({where_clause})'] if where_clause else []
+            parameters = list(where_parameters)
+            if last_key is not None:
+                keyset_condition, keyset_parameters = get_keyset_condition(primary_key, last_key)
+                conditions.append(keyset_condition)
+                parameters.extend(keyset_parameters)
+            execute_query_timed(source_cursor, f"""
+                SELECT TOP ({page_size}) {select_list}
+                FROM {source_schema}.{table_name} source_table
+                {join_sql}
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY {order_by}
+            """, *parameters)
+            rows = source_cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return # last page, no need to query again
+            last_key = tuple(rows[-1][index] for index in key_indices)
+
+    primary_key_name = get_numerical_primary_key(source_conn, source_schema, table_name)
+    offset = page_start * page_sizer.size
+    while True:
+        page_size = page_sizer.size
+        if primary_key_name:
+            # Use primary key for efficient paging
+            execute_query_timed(source_cursor, f"""
+                WITH fetching AS (
+                    SELECT source_table.{primary_key_name}, n=ROW_NUMBER() OVER ( ORDER BY source_table.{primary_key_name})
+                    FROM {source_schema}.{table_name} source_table
+                    {join_sql}
+                    {'WHERE ' + where_clause if where_clause else ''}
+                )
+                SELECT {select_list} 
+                FROM fetching f 
+                JOIN {source_schema}.{table_name} source_table ON source_table.{primary_key_name} = f.{primary_key_name}
+                WHERE f.n > {offset} and f.n <= {offset + page_size}
+                OPTION (RECOMPILE)
+            """, *where_parameters)
+        else:
+            # Use OFFSET for paging when no numerical primary key is available
+            primary_key_column_names = get_primary_key_column_names(source_conn, source_schema, table_name) or '(SELECT NULL)'
+            execute_query_timed(source_cursor, f"""
+                SELECT {select_list} FROM {source_schema}.{table_name} source_table
+                {join_sql}
+                {'WHERE ' + where_clause if where_clause else ''}
+                ORDER BY {primary_key_column_names}
+                OFFSET {offset} ROWS FETCH NEXT {page_size} ROWS ONLY
+            """, *where_parameters)
+
+        rows = source_cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        offset += len(rows)
+
+def time_pages(pages):
+    """
+    Yield (rows, duration in seconds to read the page, retries while reading the page, phases) for every page of the
+    given generator. The phases are the (wall clock, CPU) seconds of the query and of fetching the rows.
+    """
+    while True:
+        start_time_page = perf_counter()
+        start_cpu_page = time.thread_time()
+        start_retry_count = get_retry_count()
+        start_query_sec, start_query_cpu_sec = get_query_time()
+        rows = next(pages, None)
+        if not rows:
+            return
+        duration_sec_page_read = perf_counter() - start_time_page
+        query_sec, query_cpu_sec = get_query_time()
+        query_sec, query_cpu_sec = query_sec - start_query_sec, query_cpu_sec - start_query_cpu_sec
+        phases = {'query': (query_sec, query_cpu_sec), 'fetch': (duration_sec_page_read - query_sec, time.thread_time() - start_cpu_page - query_cpu_sec)}
+        yield rows, duration_sec_page_read, get_retry_count() - start_retry_count, phases
+
+def prefetch_pages(pages, pipeline_depth):
+    """
+    Read the pages of the given generator in a reader thread, while the caller writes the previous pages.
+
+    At most pipeline_depth pages are buffered, so the memory used is limited. Errors of the reader thread
+    (including KeyboardInterrupt and SystemExit) are raised in the caller. Closing the generator stops the reader thread after its current page.
+    """
+    page_queue = queue.Queue(maxsize=pipeline_depth)
+    stop_event = threading.Event()
+
+    def put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                page_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(None)
+        except BaseException as e:
+            # also KeyboardInterrupt/SystemExit, the caller would wait for the next page forever otherwise
+            put(e)
+
+    reader_thread = threading.Thread(target=reader, name='page-reader', daemon=True)
+    reader_thread.start()
+    try:
+        while True:
+            item = page_queue.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop_event.set()
+        reader_thread.join()
+
+def format_bulk_value(value, data_type) -> str:
+    """
+    Format a value as text the way bcp/BULK INSERT convert character data to the column type.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex() # character data for binary columns is read as hex
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    if isinstance(value, datetime):
+        text = value.isoformat(sep=' ')
+        # datetime and smalldatetime do not accept more than 3 fractional digits
+        return text[:23] if data_type in ['datetime', 'smalldatetime'] else text
+    if hasattr(value, 'isoformat'): # date and time
+        return value.isoformat()
+    return str(value)
+
+def write_bulk_format_file(file_name, columns, target_column_ordinals):
+    """
+    Write a (non-XML) bcp format file for the data files written by write_bulk_data_file: every field is
+    unicode character data with a 4 byte length prefix, so no terminators need to be escaped and empty strings
+    and NULL values can be told apart.
+
+    :param columns: The column names in the order of the fields in the data file.
+    :param target_column_ordinals: The ordinal position of every column in the target table.
+    """
+    with open(file_name, 'w', encoding='ascii', newline='\r\n') as file:
+        file.write('14.0\n')
+        file.write(f'{len(columns)}\n')
+        for index, column in enumerate(columns):
+            # the column name is informational only, but must not contain blanks
+            field_name = re.sub(r'\s', '_', column)
+            file.write(f'{index + 1} SQLNCHAR 4 0 "" {target_column_ordinals[column]} {field_name} ""\n')
+
+def write_bulk_data_file(file_name, rows, data_types):
+    null_field = struct.pack('<i', -1)
+    with open(file_name, 'wb') as file:
+        for row in rows:
+            fields = []
+            for value, data_type in zip(row, data_types):
+                if value is None:
+                    fields.append(null_field)
+                else:
+                    encoded = format_bulk_value(value, data_type).encode('utf-16-le')
+                    fields.append(struct.pack('<i', len(encoded)))
+                    fields.append(encoded)
+            file.write(b''.join(fields))
+
+def get_column_ordinals(conn, schema_name, table_name) -> Dict[str, int]:
+    columns = get_catalog(conn, schema_name, table_name).get_columns(table_name)
+    return {column.COLUMN_NAME: column.ORDINAL_POSITION for column in columns}
+
+def bulk_load_page(target_cursor, target_schema, table_name, rows, data_types, format_file_name, bulk_options):
+    """
+    Write the rows to a data file and load it into the target table with bcp or BULK INSERT.
+
+    :param bulk_options: dict with the writer, the directories, the bcp path, the table lock flag and the target connection config.
+    :return: the wall clock and CPU seconds used to write the data file.
+    """
+    start_time = perf_counter()
+    start_cpu = time.thread_time()
+    file_descriptor, data_file_name = tempfile.mkstemp(prefix=f'{table_name}_', suffix='.dat', dir=bulk_options['dir'])
+    os.close(file_descriptor)
+    try:
+        write_bulk_data_file(data_file_name, rows, data_types)
+        duration_sec_convert = perf_counter() - start_time
+        cpu_sec_convert = time.thread_time() - start_cpu
+
+        if bulk_options['writer'] == WRITER_BCP:
+            config = bulk_options['config']
+            command = [bulk_options['bcp'], f'[{config["database"]}].[{target_schema}].[{table_name}]', 'in', data_file_name,
+                       '-f', format_file_name, '-S', config['server'], '-b', str(len(rows)), '-E', '-k', '-u']
+            if bulk_options['tablock']:
+                command += ['-h', 'TABLOCK']
+            # bcp has no other way to get the password, it is visible in the process list (see the warning in main)
+            command += ['-U', config['user'], '-P', config['password']]
+            result = subprocess.run(command, capture_output=True, text=True)
+            if result.returncode != 0 or 'Error = ' in result.stdout:
+                raise RuntimeError(f"bcp failed for table {target_schema}.{table_name}: {result.stdout} {result.stderr}")
+        else:
+            server_dir = bulk_options['server_dir']
+            server_data_file = os.path.join(server_dir, os.path.basename(data_file_name)) if server_dir else data_file_name
+            server_format_file = os.path.join(server_dir, os.path.basename(format_file_name)) if server_dir else format_file_name
+            tablock = ', TABLOCK' if bulk_options['tablock'] else ''
+            # the file names are string literals (BULK INSERT does not accept parameters)
+            server_data_file = server_data_file.replace("'", "''")
+            server_format_file = server_format_file.replace("'", "''")
+            execute_sql_with_retry(target_cursor, f"""
+                BULK INSERT {target_schema}.{table_name}
+                FROM '{server_data_file}'
+                WITH (FORMATFILE = '{server_format_file}', BATCHSIZE = {len(rows)}, KEEPIDENTITY, KEEPNULLS{tablock})
+            """)
+    finally:
+        os.remove(data_file_name)
+    return duration_sec_convert, cpu_sec_convert
+
+def get_arrow_fallback_reason(source_conn, source_schema, table_name, page_start, where_parameters, arrow_options) -> str:
+    """
+    Why the table cannot be copied with the arrow engine, or None if it can.
+    """
+    if not arrow_odbc_available:
+        return "arrow-odbc and pyarrow are not installed"
+    if not arrow_options['source_config'] or not arrow_options['target_config']:
+        return "the connection configs are not available here"
+    for config in [arrow_options['source_config'], arrow_options['target_config']]:
+        if config.get('authentication') == 'AzureActiveDirectory':
+            return "AzureActiveDirectory authentication (access token) is not supported by arrow-odbc"
+    if page_start > 0:
+        return "a start page is given"
+    if any(column.is_identity for column in get_copy_columns(source_conn, source_schema, table_name)):
+        return "identity columns need IDENTITY_INSERT on the connection of the insert"
+    if any(parameter is not None and not isinstance(parameter, (str, int, Decimal)) for parameter in where_parameters or []):
+        return "the where parameters can only be passed as text"
+    return None
+
+def copy_data_arrow(source_conn, target_conn, source_schema, table_name, target_schema, dry_run=False, page_size=50000, where_clause=None, joins=None, where_parameters=None, target_table_name=None, arrow_options=None, metrics_range=None):
+    """
+    Copy the data with arrow-odbc: the rows are fetched and inserted as columnar Arrow record batches of page_size
+    rows, so no Python object is created per row or value. Both sides use their own ODBC connection (opened by
+    arrow-odbc from the connection string), the source rows are read with one query (like the "stream" paging).
+
+    :param arrow_options: dict with the source and target config and the maximum text and binary size of a value.
+    """
+    target_table_name = target_table_name or table_name
+    print(f"Copying table {table_name} {'into ' + target_table_name + ' ' if target_table_name != table_name else ''}{'using where clause [' + where_clause + ']' if where_clause else ''}... with the arrow engine ...", end="", flush=True)
+    start_time = perf_counter()
+
+    columns = [column.COLUMN_NAME for column in get_copy_columns(source_conn, source_schema, table_name)]
+    total_row_count = get_row_count(source_conn, source_schema, table_name, where_clause, joins, where_parameters)
+    print(f" {total_row_count:_} rows ..." + get_dry_run_text(dry_run), end="", flush=True)
+
+    join_sql = " ".join([f'\nJOIN {join}' for join in joins]) if joins else ''
+    query = f"""
+        SELECT {', '.join([f'source_table.[{column}]' for column in columns])}
+        FROM {source_schema}.{table_name} source_table
+        {join_sql}
+        {'WHERE ' + where_clause if where_clause else ''}
+    """
+    parameters = [None if parameter is None else str(parameter) for parameter in where_parameters or []]
+    if sql_logger.isEnabledFor(logging.DEBUG):
+        sql_logger.debug(f"execute sql (arrow): {query} with params: {parameters}")
+
+    row_bytes = estimate_row_bytes(source_conn, source_schema, table_name)
+    totals = {'rows': 0, 'bytes': 0, 'pages': 0, 'retries': 0, 'read_sec': 0.0, 'write_sec': 0.0}
+    if not dry_run:
+        reader = arrow_odbc.read_arrow_batches_from_odbc(query=query, connection_string=get_connection_string(arrow_options['source_config']), batch_size=page_size,
+                                                         parameters=parameters, max_text_size=arrow_options['max_text_size'], max_binary_size=arrow_options['max_binary_size'])
+
+        def timed_batches():
+            # arrow-odbc writes a batch while the next one is requested, so the time until then is the write time
+            start_time_page = perf_counter()
+            for batch in reader:
+                duration_sec_page_read = perf_counter() - start_time_page
+                totals['pages'] += 1
+                print(f" {totals['pages']}r({duration_sec_page_read:.1f}s)", end="", flush=True)
+                start_time_page_write = perf_counter()
+                yield batch
+                duration_sec_page_write = perf_counter() - start_time_page_write
+                print(f"w({duration_sec_page_write:.1f}s)", end="", flush=True)
+
+                page_metrics = {'rows': batch.num_rows, 'bytes': batch.num_rows * row_bytes, 'read_sec': duration_sec_page_read, 'write_sec': duration_sec_page_write}
+                metrics.page(table=f'{source_schema}.{table_name}', target_table=f'{target_schema}.{target_table_name}', page=totals['pages'], retries=0,
+                             **{name: round(value, 3) if isinstance(value, float) else value for name, value in page_metrics.items()})
+                for name, value in page_metrics.items():
+                    totals[name] += value
+                start_time_page = perf_counter()
+
+        arrow_odbc.insert_into_table(reader=pyarrow.RecordBatchReader.from_batches(reader.schema, timed_batches()), chunk_size=page_size,
+                                     table=f'{target_schema}.{target_table_name}', connection_string=get_connection_string(arrow_options['target_config']))
+
+    duration_sec = perf_counter() - start_time
+    print(f" - done in {duration_sec:.1f} seconds ({int(round(total_row_count / duration_sec))} rows/sec)")
+    metrics.table(f'{source_schema}.{table_name}', key_range=metrics_range, target_table=f'{target_schema}.{target_table_name}', duration_sec=round(duration_sec, 3),
+                  rows_per_sec=round(totals['rows'] / duration_sec, 1), mb_per_sec=round(totals['bytes'] / duration_sec / 1024 / 1024, 2),
+                  **{name: round(value, 3) if isinstance(value, float) else value for name, value in totals.items()})
+
 # Function to copy data from source to target
-def copy_data(source_conn, target_conn, source_schema, table_name, target_schema, page_start, dry_run=False, page_size=50000, where_clause=None, joins=None):
-    print(f"Copying table {table_name} {'using where clause [' + where_clause + ']' if where_clause else ''}...", end="", flush=True)
+def copy_data(source_conn, target_conn, source_schema, table_name, target_schema, page_start, dry_run=False, page_size=50000, where_clause=None, joins=None, paging=PAGING_KEYSET, pipeline_depth=0, bulk_options=None, table_lock=False, auto_page_size=None, where_parameters=None, target_table_name=None, arrow_options=None, progress_file_name=None, checkpoint_id=None, metrics_range=None):
+    """
+    Copy the rows of the source table (with the where clause and joins) to the target table page by page.
+
+    With a checkpoint id, the key of the last row of every committed page is written to the progress track file
+    (keyset paging only). If a checkpoint is found at the start, the copy continues after its key, the rows after
+    the key that were written to the target table after the checkpoint are deleted first.
+    """
+    if arrow_options and (not arrow_options['table_filter'] or re.match(arrow_options['table_filter'], table_name)):
+        fallback_reason = get_arrow_fallback_reason(source_conn, source_schema, table_name, page_start, where_parameters, arrow_options)
+        if not fallback_reason:
+            copy_data_arrow(source_conn, target_conn, source_schema, table_name, target_schema, dry_run, page_size, where_clause, joins, where_parameters, target_table_name, arrow_options, metrics_range)
+            return
+        print(f"Table {table_name} is copied with the pyodbc engine: {fallback_reason}.")
+
+    target_table_name = target_table_name or table_name
+    print(f"Copying table {table_name} {'into ' + target_table_name + ' ' if target_table_name != table_name else ''}{'using where clause [' + where_clause + ']' if where_clause else ''}...", end="", flush=True)
     start_time = perf_counter()
 
-    primary_key = get_numerical_primary_key(source_conn, source_schema, table_name)
-    if primary_key:
-        print(f" using primary key '{primary_key}' for optimization ...", end="", flush=True)
+    primary_key = get_primary_key(source_conn, source_schema, table_name)
+    if paging != PAGING_OFFSET and page_start > 0:
+        print(" a start page is given, using offset paging ...", end="", flush=True)
+        paging = PAGING_OFFSET
+    elif paging == PAGING_KEYSET and not primary_key:
+        print(" no primary key, using offset paging ...", end="", flush=True)
+        paging = PAGING_OFFSET
+    elif paging == PAGING_KEYSET and get_lossy_key_column(primary_key):
+        print(f" primary key column '{get_lossy_key_column(primary_key).COLUMN_NAME}' cannot be sought exactly, using offset paging ...", end="", flush=True)
+        paging = PAGING_OFFSET
+
+    if paging == PAGING_STREAM:
+        print(" streaming all rows with one query ...", end="", flush=True)
+    elif paging == PAGING_KEYSET:
+        print(f" using keyset paging on primary key ({', '.join([row.COLUMN_NAME for row in primary_key])}) ...", end="", flush=True)
+    else:
+        primary_key_name = get_numerical_primary_key(source_conn, source_schema, table_name)
+        if primary_key_name:
+            print(f" using primary key '{primary_key_name}' for optimization ...", end="", flush=True)
+
+    start_key = None
+    checkpoint_id = checkpoint_id if paging == PAGING_KEYSET and not joins and not dry_run else None
+    checkpoint = get_progress_track_value(progress_file_name, checkpoint_id, STATUS_CHECKPOINT) if checkpoint_id else None
+    if checkpoint:
+        start_key = decode_key(checkpoint, primary_key)
+        print(f" continuing after the checkpoint key {checkpoint} ...", end="", flush=True)
+        delete_rows_after_key(target_conn, target_schema, target_table_name, primary_key, start_key, where_clause, where_parameters)
 
     with source_conn.cursor() as source_cursor, target_conn.cursor() as target_cursor:
+        column_infos = get_copy_columns(source_conn, source_schema, table_name)
+
         # Check if table has any identity columns
-        execute_sql_with_retry(source_cursor, f"""
-            SELECT COLUMN_NAME 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_SCHEMA = '{source_schema}' AND TABLE_NAME = '{table_name}' AND COLUMNPROPERTY(object_id(TABLE_SCHEMA + '.' + TABLE_NAME), COLUMN_NAME, 'IsIdentity') = 1
-        """)
-        identity_columns = [row.COLUMN_NAME for row in source_cursor.fetchall()]
+        identity_columns = [column.COLUMN_NAME for column in column_infos if column.is_identity]
 
         # Set IDENTITY_INSERT ON only if there are identity columns
         if identity_columns:
-            execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{table_name} ON")
+            execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{target_table_name} ON")
 
-        # Get column names for the INSERT statement
-        execute_sql_with_retry(source_cursor, f"""
-            SELECT COLUMN_NAME 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_SCHEMA = '{source_schema}' AND TABLE_NAME = '{table_name}'
-        """)
-        columns = [row.COLUMN_NAME for row in source_cursor.fetchall()]
+        # Get column names for the INSERT statement (in the order of the table definition)
+        columns = [column.COLUMN_NAME for column in column_infos]
+        data_types = [column.DATA_TYPE for column in column_infos]
         column_list = ", ".join(columns)
 
         # Get total row count
-        total_row_count = get_row_count(source_conn, source_schema, table_name, where_clause, joins)
+        total_row_count = get_row_count(source_conn, source_schema, table_name, where_clause, joins, where_parameters)
         print(f" {total_row_count:_} rows ..." + get_dry_run_text(dry_run), end="", flush=True)
 
         input_sizes = get_input_sizes(source_conn, source_schema, table_name)
         target_cursor.fast_executemany = True
         target_cursor.setinputsizes(input_sizes)
 
+        format_file_name = None
+        if bulk_options and not dry_run:
+            if bulk_options['writer'] == WRITER_BCP and not shutil.which(bulk_options['bcp']):
+                raise RuntimeError(f"bcp executable '{bulk_options['bcp']}' not found, please install the sql server command line tools or use --bcp-path")
+            print(f" writing with {bulk_options['writer']} ...", end="", flush=True)
+            file_descriptor, format_file_name = tempfile.mkstemp(prefix=f'{table_name}_', suffix='.fmt', dir=bulk_options['dir'])
+            os.close(file_descriptor)
+            write_bulk_format_file(format_file_name, columns, get_column_ordinals(target_conn, target_schema, target_table_name))
+
         page_count = page_start
-        offset = page_start * page_size
         print_page_info = True
 
-        while True:
-            start_time_page = perf_counter()
-            page_count += 1
-
-            join_sql = " ".join([f'\nJOIN {join}' for join in joins]) if joins else ''
-
-            if primary_key:
-                # Use primary key for efficient paging
-                execute_sql_with_retry(source_cursor, f"""
-                    WITH fetching AS (
-                        SELECT source_table.{primary_key}, n=ROW_NUMBER() OVER ( ORDER BY source_table.{primary_key})
-                        FROM {source_schema}.{table_name} source_table
-                        {join_sql}
-                        {'WHERE ' + where_clause if where_clause else ''}
-                    )
-                    SELECT source_table.* 
-                    FROM fetching f 
-                    JOIN {source_schema}.{table_name} source_table ON source_table.{primary_key} = f.{primary_key}
-                    WHERE f.n > {offset} and f.n <= {offset + page_size}
-                    OPTION (RECOMPILE)
-                """)
-            else:
-                # Use OFFSET for paging when no numerical primary key is available
-                primary_key_column_names = get_primary_key_column_names(source_conn, source_schema, table_name) or '(SELECT NULL)'
-                execute_sql_with_retry(source_cursor, f"""
-                    SELECT * FROM {source_schema}.{table_name} source_table
-                    {join_sql}
-                    {'WHERE ' + where_clause if where_clause else ''}
-                    ORDER BY {primary_key_column_names}
-                    OFFSET {offset} ROWS FETCH NEXT {page_size} ROWS ONLY
-                """)
-
-            rows = source_cursor.fetchall()
-            if not rows:
-                break
-
-            duration_sec_page_read = perf_counter() - start_time_page
-            row_count = len(rows)
-
-            if row_count == page_size:
-                if print_page_info:
-                    print(f" paging {int(total_row_count / page_size + 1)} pages each {page_size:_} rows, page", end="")
-                    print_page_info = False
-                print(f" {page_count}r({duration_sec_page_read:.1f}s)", end="", flush=True)
-            else:
-                print(f" reading {row_count:_} rows ({duration_sec_page_read:.1f}s) ", end="", flush=True)
-
-            if not dry_run:
-                # Convert pyodbc.Row objects to plain tuples to avoid executemany hanging
-                rows_to_insert = [tuple(r) for r in rows]
-                #print(f" inserting into {target_schema}.{table_name} ({column_list}) ({len(rows_to_insert)} rows) ", flush=True)
-                placeholders = ', '.join(['?' for _ in rows_to_insert[0]])
-                insert_sql = f"INSERT INTO {target_schema}.{table_name} ({column_list}) VALUES ({placeholders})"
-                target_cursor.executemany(insert_sql, rows_to_insert)
-                #print(f" before commit {target_schema}.{table_name}", flush=True)
-                target_conn.commit()
-                #print(f" after commit {target_schema}.{table_name}", flush=True)
-                duration_sec_page_write = perf_counter() - start_time_page - duration_sec_page_read
-                print(f"w({duration_sec_page_write:.1f}s)", end="", flush=True)
-
-            offset += page_size
+        row_bytes = estimate_row_bytes(source_conn, source_schema, table_name)
+        totals = {'rows': 0, 'bytes': 0, 'pages': 0, 'retries': 0, 'read_sec': 0.0, 'query_sec': 0.0, 'fetch_sec': 0.0, 'convert_sec': 0.0, 'write_sec': 0.0, 'commit_sec': 0.0}
+        if auto_page_size and page_start == 0:
+            page_sizer = PageSizer(page_size, row_bytes, auto_page_size['target_page_bytes'], auto_page_size['max_page_bytes'])
+            page_size = page_sizer.size
+            print(f" auto page size {page_size:_} rows (~{row_bytes:_} bytes per row) ...", end="", flush=True)
+        else:
+            page_sizer = PageSizer(page_size)
+
+        # with sessions, a copy with keyset paging continues after the key of the last committed page if a connection was lost
+        resumable = (paging == PAGING_KEYSET and not joins and isinstance(source_conn, Session) and isinstance(target_conn, Session)
+                     and target_conn.can_reconnect())
+        key_indices = [columns.index(column.COLUMN_NAME) for column in primary_key] if checkpoint_id or resumable else []
+        last_key = start_key
+        last_key_page_count = page_count
+        page_key = None # last key of the page that is written, but not committed yet
+        resume_attempts = 0
+
+        def open_pages(start_key):
+            pages = time_pages(read_pages(source_conn, source_cursor, source_schema, table_name, columns, page_start, page_sizer, where_clause, joins, primary_key, paging, where_parameters, start_key))
+            return prefetch_pages(pages, pipeline_depth) if pipeline_depth > 0 else pages
+
+        pages = open_pages(start_key)
+        if pipeline_depth > 0:
+            print(f" pipelined with {pipeline_depth} page(s) read ahead ...", end="", flush=True)
+
+        table_profile = profiler.start_table(f'{source_schema}.{table_name}', f'{target_schema}.{target_table_name}')
+        try:
+            while True:
+                try:
+                    for rows, duration_sec_page_read, read_retries, phases in pages:
+                        start_time_page_write = perf_counter()
+                        start_cpu_page_write = time.thread_time()
+                        start_retry_count = get_retry_count()
+                        page_count += 1
+                        row_count = len(rows)
+                        duration_sec_convert = duration_sec_insert = duration_sec_commit = 0.0
+                        cpu_sec_convert = cpu_sec_insert = cpu_sec_commit = 0.0
+
+                        if row_count == page_size or page_sizer.auto:
+                            if print_page_info:
+                                print(f" paging {int(total_row_count / page_size + 1)} pages each {page_size:_} rows, page", end="")
+                                print_page_info = False
+                            print(f" {page_count}r({duration_sec_page_read:.1f}s)", end="", flush=True)
+                        else:
+                            print(f" reading {row_count:_} rows ({duration_sec_page_read:.1f}s) ", end="", flush=True)
+
+                        if key_indices and not dry_run:
+                            page_key = tuple(rows[-1][index] for index in key_indices)
+
+                        if not dry_run and format_file_name:
+                            duration_sec_convert, cpu_sec_convert = bulk_load_page(target_cursor, target_schema, target_table_name, rows, data_types, format_file_name, bulk_options)
+                            start_time_commit = perf_counter()
+                            start_cpu_commit = time.thread_time()
+                            duration_sec_insert = start_time_commit - start_time_page_write - duration_sec_convert
+                            cpu_sec_insert = start_cpu_commit - start_cpu_page_write - cpu_sec_convert
+                            target_conn.commit()
+                            duration_sec_commit = perf_counter() - start_time_commit
+                            cpu_sec_commit = time.thread_time() - start_cpu_commit
+                            duration_sec_page_write = perf_counter() - start_time_page_write
+                            print(f"w({duration_sec_page_write:.1f}s)", end="", flush=True)
+                        elif not dry_run:
+                            # Convert pyodbc.Row objects to plain tuples to avoid executemany hanging
+                            rows_to_insert = [tuple(r) for r in rows]
+                            duration_sec_convert = perf_counter() - start_time_page_write
+                            cpu_sec_convert = time.thread_time() - start_cpu_page_write
+                            #print(f" inserting into {target_schema}.{table_name} ({column_list}) ({len(rows_to_insert)} rows) ", flush=True)
+                            placeholders = ', '.join(['?' for _ in rows_to_insert[0]])
+                            insert_sql = f"INSERT INTO {target_schema}.{target_table_name} {'WITH (TABLOCK) ' if table_lock else ''}({column_list}) VALUES ({placeholders})"
+                            target_cursor.executemany(insert_sql, rows_to_insert)
+                            start_time_commit = perf_counter()
+                            start_cpu_commit = time.thread_time()
+                            duration_sec_insert = start_time_commit - start_time_page_write - duration_sec_convert
+                            cpu_sec_insert = start_cpu_commit - start_cpu_page_write - cpu_sec_convert
+                            #print(f" before commit {target_schema}.{table_name}", flush=True)
+                            target_conn.commit()
+                            #print(f" after commit {target_schema}.{table_name}", flush=True)
+                            duration_sec_commit = perf_counter() - start_time_commit
+                            cpu_sec_commit = time.thread_time() - start_cpu_commit
+                            duration_sec_page_write = perf_counter() - start_time_page_write
+                            print(f"w({duration_sec_page_write:.1f}s)", end="", flush=True)
+
+                        if page_key is not None:
+                            # the page is committed: a restart (see checkpoint_id) or a resume after a lost connection continues after its last key
+                            last_key, page_key = page_key, None
+                            last_key_page_count = page_count
+                            resume_attempts = 0
+                        if checkpoint_id:
+                            write_progress_track(progress_file_name, checkpoint_id, f'{STATUS_CHECKPOINT} {encode_key(last_key)}')
+
+                        page_metrics = {'rows': row_count, 'bytes': row_count * row_bytes, 'retries': read_retries + get_retry_count() - start_retry_count,
+                                        'read_sec': duration_sec_page_read, 'query_sec': phases['query'][0], 'fetch_sec': phases['fetch'][0],
+                                        'convert_sec': duration_sec_convert, 'write_sec': duration_sec_insert, 'commit_sec': duration_sec_commit}
+                        metrics.page(table=f'{source_schema}.{table_name}', target_table=f'{target_schema}.{target_table_name}', page=page_count,
+                                     **{name: round(value, 3) if isinstance(value, float) else value for name, value in page_metrics.items()})
+                        totals['pages'] += 1
+                        for name, value in page_metrics.items():
+                            totals[name] += value
+                        phases.update({'convert': (duration_sec_convert, cpu_sec_convert), 'write': (duration_sec_insert, cpu_sec_insert), 'commit': (duration_sec_commit, cpu_sec_commit)})
+                        profiler.page(table_profile, page_count, row_count, phases)
+
+                        if page_sizer.update(row_count, perf_counter() - start_time_page_write + duration_sec_page_read):
+                            print(f"[{page_sizer.size:_}]", end="", flush=True)
+                    break
+                except pyodbc.Error as e:
+                    if not resumable or not is_connection_lost(e) or resume_attempts >= Session.max_reconnects:
+                        raise
+                    resume_attempts += 1
+                    pages.close()
+                    print(f" connection lost ({e.args[0]}), reconnecting to continue after the last committed page ...", end="", flush=True)
+                    source_conn.recover()
+                    target_conn.recover() # the uncommitted page is rolled back
+                    if page_key is not None:
+                        # the commit of the page may have reached the server before the connection was lost
+                        delete_rows_after_key(target_conn, target_schema, target_table_name, primary_key, last_key, where_clause, where_parameters, page_key)
+                        page_key = None
+                    page_count = last_key_page_count
+                    pages = open_pages(last_key)
+        finally:
+            pages.close()
+            profiler.stop_table(table_profile)
+            if format_file_name:
+                os.remove(format_file_name)
 
         # Set IDENTITY_INSERT OFF after copying data
         if identity_columns:
-            execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{table_name} OFF")
+            execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{target_table_name} OFF")
 
         duration_sec = perf_counter() - start_time
         rows_per_sec = int(round(total_row_count / duration_sec))
-        print(f" - done in {duration_sec:.1f} seconds ({rows_per_sec} rows/sec)")
+        page_size_info = f", page sizes {min(page_sizer.sizes_used):_} - {max(page_sizer.sizes_used):_}, last {page_sizer.size:_}" if page_sizer.auto and page_sizer.sizes_used else ''
+        print(f" - done in {duration_sec:.1f} seconds ({rows_per_sec} rows/sec{page_size_info})")
+        profiler.finish_table(table_profile, duration_sec)
+        metrics.table(f'{source_schema}.{table_name}', key_range=metrics_range, target_table=f'{target_schema}.{target_table_name}', duration_sec=round(duration_sec, 3),
+                      rows_per_sec=round(totals['rows'] / duration_sec, 1), mb_per_sec=round(totals['bytes'] / duration_sec / 1024 / 1024, 2),
+                      **{name: round(value, 3) if isinstance(value, float) else value for name, value in totals.items()})
+
+def delete_rows_after_key(connection, schema_name, table_name, primary_key, last_key, where_clause = None, where_parameters = None, upper_key = None):
+    """
+    Delete the rows after the key (up to the upper key, if given, see get_keyset_range_condition), e.g. the rows of
+    a page that was written but whose checkpoint was not recorded any more before the copy was interrupted.
+    """
+    condition, parameters = get_keyset_range_condition(primary_key, last_key, upper_key)
+    condition = condition or '1 = 1'
+    if where_clause:
+        condition = f"({where_clause}) AND {condition}"
+        parameters = list(where_parameters or []) + parameters
+    with connection.cursor() as cursor:
+        execute_sql_with_retry(cursor, f"DELETE source_table FROM {schema_name}.{table_name} source_table WHERE {condition}", *parameters)
+        deleted_row_count = cursor.rowcount
+    connection.commit()
+    if deleted_row_count > 0:
+        print(f" {deleted_row_count:_} rows after the last committed key deleted ...", end="", flush=True)
 
-def delete_data(connection, schema_name, table_name, where_clause, joins, dry_run = False):
+def delete_data(connection, schema_name, table_name, where_clause, joins, dry_run = False, where_parameters = None):
     print(f"Deleting data in table {table_name} using where clause \"{where_clause}\" {get_dry_run_text(dry_run)} ...", end="", flush=True)
     if not dry_run:
         with connection.cursor() as cursor:
             join_sql = " ".join([f'\nJOIN {join}' for join in joins]) if joins else ''
-            execute_sql(cursor, f"DELETE source_table FROM {schema_name}.{table_name} source_table {join_sql} WHERE {where_clause}")
+            execute_sql(cursor, f"DELETE source_table FROM {schema_name}.{table_name} source_table {join_sql} WHERE {where_clause}", *(where_parameters or []))
         connection.commit()
     print(" - done")
 
@@ -447,87 +1573,178 @@ def truncate_table(connection, schema_name, table_name, dry_run = False):
         connection.commit()
     print(" - done")
 
-def get_row_count(connection, schema_name, table_name, where_clause, joins) -> int:
+def get_row_count(connection, schema_name, table_name, where_clause, joins, where_parameters = None) -> int:
     with connection.cursor() as cursor:
         join_sql = " ".join([f'\nJOIN {join}' for join in joins]) if joins else ''
         sql = f"SELECT COUNT(*) FROM {schema_name}.{table_name} source_table {join_sql} {'WHERE ' + where_clause if where_clause else ''}"
-        execute_sql(cursor, sql)
+        execute_sql(cursor, sql, *(where_parameters or []))
         total_rows = cursor.fetchone()[0]
         return total_rows
 
-def create_table(source_conn, target_conn, source_schema, table_name, target_schema, dry_run = False):
-    # Create table in target database (including primary key and null constraints)
+def create_table(source_conn, target_conn, source_schema, table_name, target_schema, dry_run = False, heap = False):
+    # Create table in target database (including primary key and null constraints, heap tables get the primary key after loading)
     with source_conn.cursor() as source_cursor:
-        create_table_query = get_create_table_query(source_cursor, source_schema, table_name, target_schema)
+        create_table_query = get_create_table_query(source_cursor, source_schema, table_name, target_schema, include_primary_key = not heap)
         if not dry_run:
             # print(f'Create query: {create_table_query}')
             target_cursor = target_conn.cursor()
             execute_sql(target_cursor, create_table_query)
+            invalidate_catalog_object(target_conn, target_schema, table_name)
         print(f"Table {target_schema}.{table_name} created successfully." + get_dry_run_text(dry_run))
     target_conn.commit()
 
+def add_primary_key(source_conn, target_conn, source_schema, table_name, target_schema, dry_run = False):
+    """
+    Add the primary key of the source table to the target table, used after loading a heap (see "--heap-load").
+    """
+    with source_conn.cursor() as source_cursor:
+        pk_definition = get_primary_key_definition(source_cursor, source_schema, table_name)
+    if not pk_definition:
+        print(f"Table {source_schema}.{table_name} has no primary key - nothing done.")
+        return
+    print(f"Adding primary key to table {target_schema}.{table_name} ...", end="", flush=True)
+    start_time = perf_counter()
+    if not dry_run:
+        with target_conn.cursor() as target_cursor:
+            execute_sql_with_retry(target_cursor, f"ALTER TABLE [{target_schema}].[{table_name}] ADD {pk_definition}")
+        target_conn.commit()
+        invalidate_catalog_object(target_conn, target_schema, table_name)
+    print(f" - done in {perf_counter() - start_time:.1f} seconds" + get_dry_run_text(dry_run))
+
+def check_minimal_logging(conn, args):
+    """
+    Print warnings if a heap load (see "--heap-load") cannot be minimally logged on the target database.
+    """
+    with conn.cursor() as cursor:
+        execute_sql_with_retry(cursor, "SELECT recovery_model_desc FROM sys.databases WHERE database_id = DB_ID()")
+        recovery_model = cursor.fetchone()[0]
+    if recovery_model == 'FULL':
+        print("WARNING: target database uses the FULL recovery model, loading heaps with TABLOCK is fully logged (minimal logging needs SIMPLE or BULK_LOGGED).")
+    if args.writer == WRITER_INSERT:
+        print("WARNING: INSERT statements are fully logged even into a heap, use --writer bcp or --writer bulk-insert for minimal logging.")
+        if args.range_partitions > 1:
+            print("WARNING: INSERT ... WITH (TABLOCK) locks the whole table, the ranges of --range-partitions are written one after the other.")
+
+def table_exists(conn, schema_name, table_name) -> bool:
+    with conn.cursor() as cursor:
+        # Check if the table exists in the given schema
+        cursor.execute("""
+            SELECT * 
+            FROM INFORMATION_SCHEMA.TABLES 
+            WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+        """, (schema_name, table_name))
+        return cursor.fetchone() is not None
+
 def drop_table_if_exists(conn, schema_name, table_name, dry_run = False):
     cursor = conn.cursor()
 
-    # Check if the table exists in the given schema
-    cursor.execute("""
-        SELECT * 
-        FROM INFORMATION_SCHEMA.TABLES 
-        WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
-    """, (schema_name, table_name))
-
-    if cursor.fetchone():
+    if table_exists(conn, schema_name, table_name):
         # Table exists, drop it
         drop_query = f"DROP TABLE [{schema_name}].[{table_name}]"
         if not dry_run:
             execute_sql(cursor, drop_query)
             conn.commit()
+            invalidate_catalog_object(conn, schema_name, table_name)
         print(f"Table {schema_name}.{table_name} dropped successfully." + get_dry_run_text(dry_run))
     else:
         print(f"Table {schema_name}.{table_name} is not dropped - does not exist.")
 
 
-def copy_indices(source_conn, target_conn, source_schema, table_name, target_schema, dry_run = False):
-    num_indices = 0
-    with source_conn.cursor() as source_cursor:
-        with target_conn.cursor() as target_cursor:
+def get_create_index_query(index, target_schema, table_name, index_options=None) -> str:
+    """
+    CREATE INDEX statement for the index of the source catalog (see IndexInfo), including the descending keys, the
+    included columns and the filter, and the build options (sort_in_tempdb, online, maxdop, data_compression).
+    """
+    columnstore = 'COLUMNSTORE' in index.index_type
+    if columnstore:
+        column_sql = '' if index.index_type.startswith('CLUSTERED') else f" ({', '.join([f'[{column}]' for column in index.columns])})"
+    else:
+        key_columns = [f"[{column}] {'DESC' if column in index.descending_columns else 'ASC'}" for column in index.key_columns]
+        column_sql = f" ({', '.join(key_columns)})"
+        if index.included_columns:
+            column_sql += f" INCLUDE ({', '.join([f'[{column}]' for column in index.included_columns])})"
+        if index.filter_definition:
+            column_sql += f" WHERE {index.filter_definition}"
+
+    options = []
+    if index_options:
+        if index_options['sort_in_tempdb'] and not columnstore:
+            options.append("SORT_IN_TEMPDB = ON")
+        if index_options['online']:
+            options.append("ONLINE = ON")
+        if index_options['maxdop']:
+            options.append(f"MAXDOP = {index_options['maxdop']}")
+        if index_options['data_compression'] and not columnstore:
+            options.append(f"DATA_COMPRESSION = {index_options['data_compression']}")
+
+    unique_clause = "UNIQUE " if index.is_unique else ""
+    return f"CREATE {unique_clause}{index.index_type} INDEX [{index.index_name}] ON [{target_schema}].[{table_name}]{column_sql}{' WITH (' + ', '.join(options) + ')' if options else ''}"
+
+def get_indices_to_copy(source_conn, source_schema, table_name, catalog=None) -> List[IndexInfo]:
+    # index information of the source table (primary keys and unique constraints are part of the table definition)
+    indices = []
+    for index in (catalog or get_catalog(source_conn, source_schema, table_name)).get_indices(table_name):
+        if index.is_primary_key or index.is_unique_constraint:
+            continue
+        if index.index_type not in ['CLUSTERED', 'NONCLUSTERED', 'CLUSTERED COLUMNSTORE', 'NONCLUSTERED COLUMNSTORE']:
+            print(f"WARNING: {index.index_type} index {index.index_name} of table {source_schema}.{table_name} is not supported - not copied!")
+            continue
+        indices.append(index)
+    return indices
 
-            # Query to get index information from the source database
-            source_cursor.execute("""
-            SELECT 
-                i.name AS index_name,
-                STRING_AGG(c.name, ', ') WITHIN GROUP (ORDER BY ic.index_column_id) AS columns,
-                i.is_unique
-            FROM 
-                sys.indexes i
-                INNER JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
-                INNER JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
-                INNER JOIN sys.tables t ON i.object_id = t.object_id
-                INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
-            WHERE 
-                t.name = ? AND s.name = ? AND i.is_primary_key = 0 AND i.is_unique_constraint = 0
-            GROUP BY i.name, i.is_unique, t.name
-            """, (table_name, source_schema))
-
-            # Construct and execute CREATE INDEX statements
-            indices = source_cursor.fetchall()
-            num_indices = len(indices)
-            if num_indices > 0:
-                print(f"Create {len(indices)} index object(s) for table {target_schema}.{table_name}: ", end="")
-                for row in indices:
-                    index_name, columns, is_unique = row
-                    unique_clause = "UNIQUE" if is_unique else ""
-                    create_index_query = f"CREATE {unique_clause} INDEX [{index_name}] ON [{target_schema}].[{table_name}] ({columns})"
-                    if not dry_run:
-                        print(f"{index_name} ", end="", flush=True)
-                        execute_sql_with_retry(target_cursor, create_index_query)
-                print("") # new line
+def build_indices(source_conn, target_conn, source_schema, table_names, target_schema, dry_run = False, index_options = None, index_workers = 1, target_config = None, progress_file_name = None):
+    """
+    Create the indices of the given tables in the target database, up to index_workers indices at the same
+    time (across the tables and within a table), each worker with its own target connection. The clustered
+    indices are built first, as building them rebuilds the nonclustered indices of the table. Every index is
+    tracked in the progress track file on its own and its build time is printed.
 
-    if not dry_run:
-        target_conn.commit()
+    :return: the number of indices.
+    """
+    index_builds = [(table_name, index) for table_name in table_names for index in get_indices_to_copy(source_conn, source_schema, table_name)]
+    phases = [
+        [(table_name, index) for table_name, index in index_builds if index.index_type.startswith('CLUSTERED')],
+        [(table_name, index) for table_name, index in index_builds if not index.index_type.startswith('CLUSTERED')],
+    ]
+    worker_connections = WorkerConnections(None, target_config) if index_workers > 1 and target_config else None
+
+    def build_index(table_name, index):
+        create_index_query = get_create_index_query(index, target_schema, table_name, index_options)
+        def create_index():
+            start_time = perf_counter()
+            if not dry_run:
+                conn = worker_connections.get()[1] if worker_connections else target_conn
+                with conn.cursor() as cursor:
+                    execute_sql_with_retry(cursor, create_index_query)
+                conn.commit()
+                invalidate_catalog_object(conn, target_schema, table_name)
+            print(f"  index {index.index_name} on {target_schema}.{table_name} created in {perf_counter() - start_time:.1f} seconds{get_dry_run_text(dry_run)}\n", end="", flush=True)
+        execute_with_progress_track(progress_file_name, f'create-index_{target_schema}.{table_name}.{index.index_name}', create_index)
+
+    try:
+        for phase in phases:
+            if not worker_connections:
+                for table_name, index in phase:
+                    build_index(table_name, index)
+                continue
+            with ThreadPoolExecutor(max_workers=index_workers, thread_name_prefix='index') as executor:
+                futures = [executor.submit(build_index, table_name, index) for table_name, index in phase]
+                wait(futures)
+                failed = [future.exception() for future in futures if future.exception()]
+                if failed:
+                    print(f"{len(failed)} of {len(futures)} indices could not be created, restart to create the missing indices.")
+                    raise failed[0]
+    finally:
+        if worker_connections:
+            worker_connections.close_all()
+    return len(index_builds)
+
+def copy_indices(source_conn, target_conn, source_schema, table_name, target_schema, dry_run = False, index_options = None, index_workers = 1, target_config = None):
+    print(f"Create index object(s) for table {target_schema}.{table_name}:", flush=True)
+    num_indices = build_indices(source_conn, target_conn, source_schema, [table_name], target_schema, dry_run, index_options, index_workers, target_config)
 
     if num_indices > 0:
-        print(f"Indices for table {target_schema}.{table_name} created successfully." + get_dry_run_text(dry_run))
+        print(f"{num_indices} indices for table {target_schema}.{table_name} created successfully." + get_dry_run_text(dry_run))
     else:
         print(f"No indices for table {target_schema}.{table_name} found - nothing done.")
 
@@ -566,8 +1783,9 @@ def drop_all_indices(conn, schema_name, table_name, dry_run = False):
 
     if not dry_run:
         conn.commit()
+        invalidate_catalog_object(conn, schema_name, table_name)
 
-    print(f"Indices for table {target_schema}.{table_name} dropped successfully." + get_dry_run_text(dry_run))
+    print(f"Indices for table {schema_name}.{table_name} dropped successfully." + get_dry_run_text(dry_run))
 
 def alter_all_indices(conn, schema_name, table_name, command, dry_run = False):
     with conn.cursor() as cursor:
@@ -576,7 +1794,7 @@ def alter_all_indices(conn, schema_name, table_name, command, dry_run = False):
         execute_sql_with_retry(cursor, query_get_indices)
     if not dry_run:
         conn.commit()
-    print(f"Indices for table {target_schema}.{table_name}: {command}." + get_dry_run_text(dry_run))
+    print(f"Indices for table {schema_name}.{table_name}: {command}." + get_dry_run_text(dry_run))
 
 def ireplace(old, new, text) -> str:
     idx = 0
@@ -620,11 +1838,13 @@ def create_views(conn, schema, view_definitions, dry_run = False):
             if 'create or alter view' not in view_definition.lower():
                 view_definition = re.sub(r'create\s+view\s+', 'create or alter view ', view_definition, flags = re.IGNORECASE)
             #print(f"sql: {view_definition}")
-            cursor.execute(view_definition)
-            print(' - DONE')
+            if not dry_run:
+                cursor.execute(view_definition)
+                invalidate_catalog_object(conn, schema, view_name)
+            print(' - DONE' + get_dry_run_text(dry_run))
     if not dry_run:
         conn.commit()
-    print(f"Views in schema {target_schema} created" + get_dry_run_text(dry_run))
+    print(f"Views in schema {schema} created" + get_dry_run_text(dry_run))
 
 
 def fetch_synonym_definitions(conn, source_schema, target_schema) -> List[Tuple[str, str]]:
@@ -655,11 +1875,88 @@ def create_synonyms(conn, schema, synonym_definitions, dry_run = False):
             if not dry_run:
                 cursor.execute(drop_sql)
                 cursor.execute(create_sql)
+                invalidate_catalog_object(conn, schema, synonym_name)
             print(' - DONE' + get_dry_run_text(dry_run))
     if not dry_run:
         conn.commit()
     print(f"Synonyms in schema {schema} created" + get_dry_run_text(dry_run))
 
+def get_view_definitions_to_copy(conn, source_schema, target_schema, args) -> List[Tuple[str, str]]:
+    """
+    The definitions of the views given by "--view" or else of the views matching the view filters.
+    """
+    view_definitions = fetch_view_definitions(conn, source_schema, target_schema)
+    if args.views:
+        view_names = args.views
+    else:
+        view_names = filter_strings_by_regex([view_name for view_name, view_definition in view_definitions], args.view_filter, args.view_filter_exclude)
+        print(f"view names: {view_names}")
+    return [(name, definition) for name, definition in view_definitions if name in view_names]
+
+def get_synonym_definitions_to_copy(conn, source_schema, target_schema, args) -> List[Tuple[str, str]]:
+    """
+    The definitions of the synonyms given by "--synonym" or else of the synonyms matching the synonym filters.
+    """
+    synonym_definitions = fetch_synonym_definitions(conn, source_schema, target_schema)
+    if args.synonyms:
+        synonym_names = args.synonyms
+    else:
+        synonym_names = filter_strings_by_regex([synonym_name for synonym_name, base_object_name in synonym_definitions], args.synonym_filter, args.synonym_filter_exclude)
+        print(f"synonym names: {synonym_names}")
+    return [(name, base_object) for name, base_object in synonym_definitions if name in synonym_names]
+
+def get_object_dependencies(conn, schema_name) -> Dict[str, set]:
+    """
+    Return the objects of the schema each view and synonym uses (lower case names): the tables, views and synonyms
+    a view references (sys.sql_expression_dependencies) and the base object of a synonym. Only objects of the same
+    schema and database are returned, as only they are copied together.
+    """
+    with conn.cursor() as cursor:
+        execute_sql_with_retry(cursor, """
+            SELECT o.name AS object_name, d.referenced_entity_name AS referenced_name
+            FROM sys.sql_expression_dependencies d
+                INNER JOIN sys.objects o ON d.referencing_id = o.object_id
+                INNER JOIN sys.schemas s ON o.schema_id = s.schema_id
+                LEFT JOIN sys.objects ro ON d.referenced_id = ro.object_id
+            WHERE s.name = ? AND o.type = 'V' AND d.referenced_server_name IS NULL
+                AND COALESCE(d.referenced_database_name, DB_NAME()) = DB_NAME()
+                AND COALESCE(d.referenced_schema_name, SCHEMA_NAME(ro.schema_id), s.name) = s.name
+            UNION
+            SELECT syn.name, PARSENAME(syn.base_object_name, 1)
+            FROM sys.synonyms syn
+                INNER JOIN sys.schemas s ON syn.schema_id = s.schema_id
+            WHERE s.name = ? AND PARSENAME(syn.base_object_name, 4) IS NULL
+                AND COALESCE(PARSENAME(syn.base_object_name, 3), DB_NAME()) = DB_NAME()
+                AND COALESCE(PARSENAME(syn.base_object_name, 2), s.name) = s.name
+        """, schema_name, schema_name)
+        dependencies = {}
+        for object_name, referenced_name in cursor.fetchall():
+            if referenced_name and referenced_name.lower() != object_name.lower():
+                dependencies.setdefault(object_name.lower(), set()).add(referenced_name.lower())
+        return dependencies
+
+def sort_by_dependencies(names, dependencies) -> List[str]:
+    """
+    Sort the names so that every object comes after the objects it depends on (see get_object_dependencies),
+    otherwise the given order is kept. Dependencies on objects that are not in the list are ignored, objects of
+    a dependency cycle keep their order.
+    """
+    names_by_key = {name.lower(): name for name in names}
+    sorted_names = []
+    visited = set()
+
+    def visit(key):
+        if key in visited or key not in names_by_key:
+            return
+        visited.add(key)
+        for dependency in sorted(dependencies.get(key, [])):
+            visit(dependency)
+        sorted_names.append(names_by_key[key])
+
+    for name in names:
+        visit(name.lower())
+    return sorted_names
+
 
 def get_table_names(conn, schema) -> List[str]:
     cursor = conn.cursor()
@@ -686,212 +1983,1901 @@ def filter_strings_by_regex(strings, include_pattern, exclude_pattern) -> List[s
         filtered_strings = [s for s in filtered_strings if not regex.match(s)]
     return filtered_strings
 
-# Function to fetch index and corresponding columns
-def get_indices(cursor, schema_name, table_name) -> Dict[str, str]:
-    execute_sql_with_retry(cursor, f"""
-        SELECT i.name AS IndexName, COL_NAME(ic.object_id, ic.column_id) AS ColumnName
-        FROM sys.indexes AS i
-        INNER JOIN sys.index_columns AS ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
-        INNER JOIN sys.tables AS t ON i.object_id = t.object_id
-        INNER JOIN sys.schemas AS s ON t.schema_id = s.schema_id
-        WHERE t.name = '{table_name}' AND s.name = '{schema_name}' AND i.type_desc != 'HEAP'
-        ORDER BY i.name, ic.key_ordinal
-    """)
-    indices = {}
-    for row in cursor.fetchall():
-        if row.IndexName not in indices:
-            indices[row.IndexName] = []
-        indices[row.IndexName].append(row.ColumnName)
-    # Sort the columns for each index
-    for index in indices:
-        indices[index] = sorted(indices[index])
-    return indices
+class ContentDifferences(NamedTuple):
+    ranges: List[Tuple[tuple, tuple]] # (lower key exclusive, upper key inclusive) of the smallest ranges that differ, None is unbounded
+    source_only_keys: List[tuple]
+    target_only_keys: List[tuple]
+    different_keys: List[tuple]
+    compared_ranges: int
 
-def compare_table(source_conn, source_schema, table_name, target_conn, target_schema):
-    print(f"Comparing table {source_schema}.{table_name} in source to target ...", end="", flush=True)
+def get_keyset_range_condition(primary_key, lower_key, upper_key) -> Tuple[str, list]:
+    """
+    Condition for the primary keys in the range lower_key < key <= upper_key (None is unbounded), see get_keyset_condition.
+    """
+    conditions = []
+    parameters = []
+    if lower_key is not None:
+        condition, condition_parameters = get_keyset_condition(primary_key, lower_key)
+        conditions.append(condition)
+        parameters.extend(condition_parameters)
+    if upper_key is not None:
+        condition, condition_parameters = get_keyset_condition(primary_key, upper_key)
+        conditions.append(f"NOT {condition}")
+        parameters.extend(condition_parameters)
+    return ' AND '.join(conditions), parameters
+
+def get_row_hash_sql(columns, compare_hash) -> str:
+    column_list = ', '.join([f'source_table.[{column}]' for column in columns])
+    if compare_hash == COMPARE_HASH_HASHBYTES:
+        # the XML representation keeps the exact values and leaves out NULL values
+        return f"HASHBYTES('SHA2_256', (SELECT {column_list} FOR XML RAW, BINARY BASE64))"
+    return f"BINARY_CHECKSUM({column_list})"
+
+def get_range_hash(conn, schema_name, table_name, row_hash_sql, compare_hash, range_condition, parameters) -> tuple:
+    """
+    Number of rows and aggregated hash of the rows of a key range.
+    """
+    if compare_hash == COMPARE_HASH_HASHBYTES:
+        aggregate_sql = "SUM(CAST(CAST(SUBSTRING(h.ROW_HASH, 1, 4) AS int) AS bigint)), SUM(CAST(CAST(SUBSTRING(h.ROW_HASH, 5, 4) AS int) AS bigint))"
+    else:
+        aggregate_sql = "CHECKSUM_AGG(h.ROW_HASH)"
+    with conn.cursor() as cursor:
+        execute_sql_with_retry(cursor, f"""
+            SELECT COUNT_BIG(*), {aggregate_sql}
+            FROM {schema_name}.{table_name} source_table
+            CROSS APPLY (SELECT {row_hash_sql} AS ROW_HASH) h
+            {'WHERE ' + range_condition if range_condition else ''}
+        """, *parameters)
+        return tuple(cursor.fetchone())
+
+def get_row_hashes(conn, schema_name, table_name, primary_key, row_hash_sql, range_condition, parameters) -> Dict[tuple, object]:
+    key_list = ', '.join([f'source_table.[{column.COLUMN_NAME}]' for column in primary_key])
+    with conn.cursor() as cursor:
+        execute_sql_with_retry(cursor, f"""
+            SELECT {key_list}, {row_hash_sql} AS ROW_HASH
+            FROM {schema_name}.{table_name} source_table
+            {'WHERE ' + range_condition if range_condition else ''}
+        """, *parameters)
+        return {tuple(row[:len(primary_key)]): row.ROW_HASH for row in cursor.fetchall()}
+
+def get_range_split_keys(conn, schema_name, table_name, primary_key, row_count, chunks, range_condition, parameters) -> List[tuple]:
+    """
+    Keys that split the rows of a key range into the given number of chunks with the same number of rows.
+    """
+    key_list = ', '.join([f'source_table.[{column.COLUMN_NAME}]' for column in primary_key])
+    numbered_key_list = ', '.join([f'numbered.[{column.COLUMN_NAME}]' for column in primary_key])
+    step = max(1, -(-row_count // chunks))
+    with conn.cursor() as cursor:
+        execute_sql_with_retry(cursor, f"""
+            SELECT {numbered_key_list}
+            FROM (
+                SELECT {key_list}, ROW_NUMBER() OVER (ORDER BY {key_list}) AS n
+                FROM {schema_name}.{table_name} source_table
+                {'WHERE ' + range_condition if range_condition else ''}
+            ) numbered
+            WHERE numbered.n % {step} = 0
+            ORDER BY {numbered_key_list}
+        """, *parameters)
+        return [tuple(row) for row in cursor.fetchall()]
+
+def compare_table_content(source_conn, source_schema, table_name, target_conn, target_schema, content_options, lower_key=None, upper_key=None) -> ContentDifferences:
+    """
+    Compare the rows of the source and target table in the key range lower_key < key <= upper_key (None is unbounded)
+    by hashes: the hashes of the range are computed on both servers at the same time, ranges with different hashes
+    are split into "chunks" ranges and compared again, ranges with at most "min_rows" rows are compared by the
+    hashes of their rows. Only hashes and keys are transferred.
 
-    with source_conn.cursor() as source_cursor:
-        with target_conn.cursor() as target_cursor:
+    :param content_options: dict with hash ("checksum" or "hashbytes"), chunks and min_rows.
+    """
+    primary_key = get_primary_key(source_conn, source_schema, table_name)
+    target_columns = {column.COLUMN_NAME for column in get_copy_columns(target_conn, target_schema, table_name)}
+    columns = [column.COLUMN_NAME for column in get_copy_columns(source_conn, source_schema, table_name) if column.COLUMN_NAME in target_columns]
+    compare_hash = content_options['hash']
+    row_hash_sql = get_row_hash_sql(columns, compare_hash)
+    differences = ContentDifferences([], [], [], [], 0)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        def compare_range(lower, upper) -> int:
+            # returns the number of range hashes compared
+            range_condition, parameters = get_keyset_range_condition(primary_key, lower, upper)
+            source_future = executor.submit(get_range_hash, source_conn, source_schema, table_name, row_hash_sql, compare_hash, range_condition, parameters)
+            target_future = executor.submit(get_range_hash, target_conn, target_schema, table_name, row_hash_sql, compare_hash, range_condition, parameters)
+            source_hash, target_hash = source_future.result(), target_future.result()
+            if source_hash == target_hash:
+                return 1
+
+            source_row_count, target_row_count = source_hash[0], target_hash[0]
+            split_keys = None
+            if max(source_row_count, target_row_count) > content_options['min_rows']:
+                # split the range on the side with more rows
+                if source_row_count >= target_row_count:
+                    split_keys = get_range_split_keys(source_conn, source_schema, table_name, primary_key, source_row_count, content_options['chunks'], range_condition, parameters)
+                else:
+                    split_keys = get_range_split_keys(target_conn, target_schema, table_name, primary_key, target_row_count, content_options['chunks'], range_condition, parameters)
+                split_keys = [key for key in split_keys if key != upper]
+            if not split_keys:
+                # small enough, or it cannot be split any further (e.g. a single row)
+                source_future = executor.submit(get_row_hashes, source_conn, source_schema, table_name, primary_key, row_hash_sql, range_condition, parameters)
+                target_future = executor.submit(get_row_hashes, target_conn, target_schema, table_name, primary_key, row_hash_sql, range_condition, parameters)
+                source_rows, target_rows = source_future.result(), target_future.result()
+                differences.ranges.append((lower, upper))
+                differences.source_only_keys.extend(sorted(key for key in source_rows if key not in target_rows))
+                differences.target_only_keys.extend(sorted(key for key in target_rows if key not in source_rows))
+                differences.different_keys.extend(sorted(key for key, row_hash in source_rows.items() if key in target_rows and target_rows[key] != row_hash))
+                return 1
+
+            bounds = [lower] + split_keys + [upper]
+            return 1 + sum(compare_range(sub_lower, sub_upper) for sub_lower, sub_upper in zip(bounds[:-1], bounds[1:]))
+
+        compared_ranges = compare_range(lower_key, upper_key)
+    return differences._replace(compared_ranges=compared_ranges)
+
+def format_keys(keys) -> str:
+    texts = [str(key[0]) if len(key) == 1 else str(key) for key in keys[:COMPARE_MAX_PRINTED_KEYS]]
+    return ', '.join(texts) + (f", ... ({len(keys) - COMPARE_MAX_PRINTED_KEYS:_} more)" if len(keys) > COMPARE_MAX_PRINTED_KEYS else '')
+
+class SchemaDifference(NamedTuple):
+    object_type: str # table, view or synonym
+    object_name: str
+    part: str # None for the object itself, else column, primary key, index, definition, base object or row count
+    item: str # name of the column or index, else None
+    change: str # DIFF_SOURCE_ONLY, DIFF_TARGET_ONLY, DIFF_MISSING (neither source nor target) or DIFF_DIFFERENT
+    attribute: str # attribute of the column or primary key that differs, else None
+    source: object
+    target: object
+
+def get_index_signature(index) -> tuple:
+    """
+    The definition of the index without its name, indices with the same signature are equal.
+    """
+    return (index.index_type, bool(index.is_unique), bool(index.is_unique_constraint), tuple(index.key_columns),
+        tuple(index.descending_columns), tuple(sorted(index.included_columns)), index.filter_definition)
 
-            # Check if the table exists in the target schema
-            target_cursor.execute(f"""
-                SELECT TABLE_NAME
-                FROM INFORMATION_SCHEMA.TABLES
-                WHERE TABLE_SCHEMA = '{target_schema}' AND TABLE_NAME = '{table_name}'
-            """)
-            target_table_exists = target_cursor.fetchone()
+def format_index(index) -> str:
+    """
+    The definition of the index without its name, e.g. "UNIQUE NONCLUSTERED (A, B DESC) INCLUDE (C)".
+    """
+    key_columns = [f"{column}{' DESC' if column in index.descending_columns else ''}" for column in index.key_columns or index.columns]
+    text = f"{'UNIQUE ' if index.is_unique else ''}{index.index_type} ({', '.join(key_columns)})"
+    if index.included_columns:
+        text += f" INCLUDE ({', '.join(index.included_columns)})"
+    if index.filter_definition:
+        text += f" WHERE {index.filter_definition}"
+    return text
 
-            if not target_table_exists:
-                print(f"\n -  Table {table_name} exists in source but not in target.")
-                return
+def diff_catalogs(source_catalog, target_catalog, table_names, view_names, synonym_names, source_row_counts=None, target_row_counts=None) -> List[SchemaDifference]:
+    """
+    Compare the tables, views and synonyms of two catalog snapshots in memory: objects that exist on one side only,
+    the columns (type, length, precision, scale, nullability, default, identity), primary keys, indices, view
+    definitions (see normalize_definition), synonym base objects and, if given, the row counts of the tables. The
+    source schema name in view definitions and base objects is replaced by the target schema name, as a copy does.
+    """
+    source_schema, target_schema = source_catalog.schema_name, target_catalog.schema_name
+    differences = []
+
+    def add(object_type, object_name, part, item, change, attribute=None, source=None, target=None):
+        differences.append(SchemaDifference(object_type, object_name, part, item, change, attribute, source, target))
+
+    def exists_on_both_sides(object_type, name, source_names, target_names) -> bool:
+        if name in source_names and name in target_names:
+            return True
+        change = DIFF_SOURCE_ONLY if name in source_names else DIFF_TARGET_ONLY if name in target_names else DIFF_MISSING
+        add(object_type, name, None, None, change)
+        return False
+
+    def diff_columns(object_type, name):
+        source_columns = {column.COLUMN_NAME: column for column in source_catalog.get_columns(name)}
+        target_columns = {column.COLUMN_NAME: column for column in target_catalog.get_columns(name)}
+        for column_name, source_column in source_columns.items():
+            target_column = target_columns.get(column_name)
+            if target_column is None:
+                add(object_type, name, 'column', column_name, DIFF_SOURCE_ONLY, source=source_column.DATA_TYPE)
+                continue
+            for attribute in SCHEMA_DIFF_COLUMN_ATTRIBUTES:
+                if getattr(source_column, attribute) != getattr(target_column, attribute):
+                    add(object_type, name, 'column', column_name, DIFF_DIFFERENT, attribute, getattr(source_column, attribute), getattr(target_column, attribute))
+        for column_name, target_column in target_columns.items():
+            if column_name not in source_columns:
+                add(object_type, name, 'column', column_name, DIFF_TARGET_ONLY, target=target_column.DATA_TYPE)
+
+    def diff_primary_key(name):
+        source_primary_key = source_catalog.get_primary_key(name)
+        target_primary_key = target_catalog.get_primary_key(name)
+        if source_primary_key is None or target_primary_key is None:
+            if source_primary_key or target_primary_key:
+                add('table', name, 'primary key', (source_primary_key or target_primary_key).PK_NAME, DIFF_SOURCE_ONLY if source_primary_key else DIFF_TARGET_ONLY,
+                    'COLUMN_NAMES', source_primary_key and source_primary_key.COLUMN_NAMES, target_primary_key and target_primary_key.COLUMN_NAMES)
+            return
+        # the names of primary keys are often generated, only the type and the columns are compared
+        for attribute in ['INDEX_TYPE', 'COLUMN_NAMES']:
+            if getattr(source_primary_key, attribute) != getattr(target_primary_key, attribute):
+                add('table', name, 'primary key', source_primary_key.PK_NAME, DIFF_DIFFERENT, attribute, getattr(source_primary_key, attribute), getattr(target_primary_key, attribute))
+
+    def diff_indices(name):
+        # indices are matched by their definition, an index with the same name but another definition is different
+        source_indices = {get_index_signature(index): index for index in source_catalog.get_indices(name) if not index.is_primary_key}
+        target_indices = {get_index_signature(index): index for index in target_catalog.get_indices(name) if not index.is_primary_key}
+        source_unmatched = {index.index_name: index for signature, index in source_indices.items() if signature not in target_indices}
+        target_unmatched = {index.index_name: index for signature, index in target_indices.items() if signature not in source_indices}
+        for index_name, index in source_unmatched.items():
+            if index_name in target_unmatched:
+                add('table', name, 'index', index_name, DIFF_DIFFERENT, source=format_index(index), target=format_index(target_unmatched[index_name]))
+            else:
+                add('table', name, 'index', index_name, DIFF_SOURCE_ONLY, source=format_index(index))
+        for index_name, index in target_unmatched.items():
+            if index_name not in source_unmatched:
+                add('table', name, 'index', index_name, DIFF_TARGET_ONLY, target=format_index(index))
+
+    source_tables, target_tables = set(source_catalog.tables), set(target_catalog.tables)
+    for name in table_names:
+        if not exists_on_both_sides('table', name, source_tables, target_tables):
+            continue
+        diff_columns('table', name)
+        diff_primary_key(name)
+        diff_indices(name)
+        if source_row_counts is not None and target_row_counts is not None and source_row_counts.get(name) != target_row_counts.get(name):
+            add('table', name, 'row count', None, DIFF_DIFFERENT, source=source_row_counts.get(name), target=target_row_counts.get(name))
+
+    for name in view_names:
+        if not exists_on_both_sides('view', name, source_catalog.views, target_catalog.views):
+            continue
+        diff_columns('view', name)
+        source_definition = source_catalog.views[name] or ''
+        source_definition = ireplace(f'{source_schema}.', f'{target_schema}.', source_definition)
+        source_definition = ireplace(f'[{source_schema}].', f'[{target_schema}].', source_definition)
+        if normalize_definition(source_definition) != normalize_definition(target_catalog.views[name] or ''):
+            add('view', name, 'definition', None, DIFF_DIFFERENT, source=source_catalog.views[name], target=target_catalog.views[name])
+
+    for name in synonym_names:
+        if not exists_on_both_sides('synonym', name, source_catalog.synonyms, target_catalog.synonyms):
+            continue
+        source_base_object = ireplace(f'{source_schema}.', f'{target_schema}.', source_catalog.synonyms[name])
+        source_base_object = ireplace(f'[{source_schema}].', f'[{target_schema}].', source_base_object)
+        if normalize_definition(source_base_object) != normalize_definition(target_catalog.synonyms[name]):
+            add('synonym', name, 'base object', None, DIFF_DIFFERENT, source=source_catalog.synonyms[name], target=target_catalog.synonyms[name])
+
+    return differences
+
+def format_schema_difference(difference) -> str:
+    if difference.part is None:
+        return f"{difference.object_type.capitalize()} {difference.object_name} " + {DIFF_SOURCE_ONLY: "exists in source but not in target.",
+            DIFF_TARGET_ONLY: "exists in target but not in source.", DIFF_MISSING: "exists neither in source nor in target."}[difference.change]
+    name = f"{difference.object_type} {difference.object_name}"
+    part = f"{difference.part} {difference.item}" if difference.item else difference.part
+    if difference.change == DIFF_SOURCE_ONLY:
+        return f"{name}: {part} exists in source but not in target" + (f" ({difference.source})" if difference.source is not None else '')
+    if difference.change == DIFF_TARGET_ONLY:
+        return f"{name}: {part} exists in target but not in source" + (f" ({difference.target})" if difference.target is not None else '')
+    if difference.part == 'definition':
+        return f"{name}: definitions differ after normalization"
+    if difference.part == 'row count':
+        return f"{name}: row count differs: Source({difference.source if difference.source is None else f'{difference.source:_}'}) vs Target({difference.target if difference.target is None else f'{difference.target:_}'})"
+    if difference.attribute:
+        return f"{name}: {part} has different {difference.attribute}: Source({difference.source}) vs Target({difference.target})"
+    return f"{name}: {part} differs: Source({difference.source}) vs Target({difference.target})"
+
+def load_schema_snapshot(conn, schema_name, approximate_counts=False) -> Tuple[CatalogSnapshot, Dict[str, int]]:
+    return load_catalog(conn, schema_name), get_table_sizes(conn, schema_name) if approximate_counts else None
+
+def get_exact_row_counts(conn, schema_name, table_names) -> Dict[str, int]:
+    """
+    The exact number of rows (COUNT_BIG) of the tables, one query per table.
+    """
+    row_counts = {}
+    with conn.cursor() as cursor:
+        for table_name in table_names:
+            execute_sql_with_retry(cursor, f"SELECT COUNT_BIG(*) FROM [{schema_name}].[{table_name}]")
+            row_counts[table_name] = cursor.fetchone()[0]
+    return row_counts
+
+def compare_schema(source_conn, source_schema, target_conn, target_schema, table_names, args):
+    """
+    Compare the tables (--compare-table) and the views and synonyms (--compare-view) of the source and target schema:
+    one catalog snapshot per side, loaded on both servers at the same time, is compared in memory (see diff_catalogs),
+    the differences are printed and written to the JSON report (--compare-report). The row counts of the tables that
+    exist on both sides are counted exactly (on both servers at the same time), or read from the partition metadata with
+    --compare-approximate-counts. With --compare-content, the content of the tables is compared afterwards.
+    """
+    print(f"Comparing schema {source_schema} in source to {target_schema} in target ...", end="", flush=True)
+    start_time = perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        source_future = executor.submit(load_schema_snapshot, source_conn, source_schema, args.compare_approximate_counts)
+        target_future = executor.submit(load_schema_snapshot, target_conn, target_schema, args.compare_approximate_counts)
+        (source_catalog, source_row_counts), (target_catalog, target_row_counts) = source_future.result(), target_future.result()
+
+    # with all tables and without --view/--synonym, the objects that only exist in the target are compared as well
+    if args.compare_table and (args.copy_all_tables or not args.tables):
+        source_tables = set(source_catalog.tables)
+        table_names = table_names + filter_strings_by_regex([name for name in target_catalog.tables if name not in source_tables], args.table_filter, args.table_filter_exclude)
+    view_names, synonym_names = [], []
+    if args.compare_view:
+        view_names = args.views or filter_strings_by_regex(sorted(set(source_catalog.views) | set(target_catalog.views)), args.view_filter, args.view_filter_exclude)
+        synonym_names = args.synonyms or filter_strings_by_regex(sorted(set(source_catalog.synonyms) | set(target_catalog.synonyms)), args.synonym_filter, args.synonym_filter_exclude)
+
+    if not args.compare_approximate_counts:
+        source_tables, target_tables = set(source_catalog.tables), set(target_catalog.tables)
+        counted_tables = [name for name in table_names if name in source_tables and name in target_tables]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            source_future = executor.submit(get_exact_row_counts, source_conn, source_schema, counted_tables)
+            target_future = executor.submit(get_exact_row_counts, target_conn, target_schema, counted_tables)
+            source_row_counts, target_row_counts = source_future.result(), target_future.result()
+
+    differences = diff_catalogs(source_catalog, target_catalog, table_names, view_names, synonym_names, source_row_counts, target_row_counts)
+    duration_sec = perf_counter() - start_time
+    print(f" - DONE in {duration_sec:.1f} seconds")
+    for difference in differences:
+        print(f" - {format_schema_difference(difference)}")
+
+    object_types = ['table', 'view', 'synonym']
+    differing_objects = {object_type: len({difference.object_name for difference in differences if difference.object_type == object_type}) for object_type in object_types}
+    print(f"Compared {len(table_names):_} tables, {len(view_names):_} views and {len(synonym_names):_} synonyms: {len(differences):_} differences in "
+        f"{differing_objects['table']:_} tables, {differing_objects['view']:_} views and {differing_objects['synonym']:_} synonyms", flush=True)
+
+    report = {
+        'created': datetime.now().isoformat(),
+        'source': {'server': source_conn.getinfo(pyodbc.SQL_SERVER_NAME), 'database': source_conn.getinfo(pyodbc.SQL_DATABASE_NAME), 'schema': source_schema},
+        'target': {'server': target_conn.getinfo(pyodbc.SQL_SERVER_NAME), 'database': target_conn.getinfo(pyodbc.SQL_DATABASE_NAME), 'schema': target_schema},
+        'duration_sec': round(duration_sec, 3),
+        'row_counts': 'approximate' if args.compare_approximate_counts else 'exact',
+        'compared': {'tables': len(table_names), 'views': len(view_names), 'synonyms': len(synonym_names)},
+        'differing_objects': differing_objects,
+        'differences': [difference._asdict() for difference in differences],
+        'content': {},
+    }
+
+    content_options = get_compare_content_options(args)
+    if content_options:
+        # only tables that exist on both sides
+        missing_tables = {difference.object_name for difference in differences if difference.object_type == 'table' and difference.part is None}
+        for table_name in table_names:
+            if table_name not in missing_tables:
+                report['content'][table_name] = compare_content(source_conn, source_schema, table_name, target_conn, target_schema, content_options)
+
+    with open(args.compare_report_file_name, 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+    print(f"Schema compare report written to {args.compare_report_file_name}")
+    return differences
+
+def compare_content(source_conn, source_schema, table_name, target_conn, target_schema, content_options) -> dict:
+    """
+    Compare the content of the table (see compare_table_content), print the differences and return them for the report.
+    """
+    print(f"Comparing content of table {source_schema}.{table_name} in source to target ...", end="", flush=True)
+    if not get_primary_key(source_conn, source_schema, table_name):
+        print("\n - Content not compared, table has no primary key. - DONE")
+        return {'compared': False}
+
+    start_time = perf_counter()
+    differences = compare_table_content(source_conn, source_schema, table_name, target_conn, target_schema, content_options)
+    if differences.source_only_keys:
+        print(f"\n - {len(differences.source_only_keys):_} rows exist in source table but not in target table: {format_keys(differences.source_only_keys)}", end="")
+    if differences.target_only_keys:
+        print(f"\n - {len(differences.target_only_keys):_} rows exist in target table but not in source table: {format_keys(differences.target_only_keys)}", end="")
+    if differences.different_keys:
+        print(f"\n - {len(differences.different_keys):_} rows have different content: {format_keys(differences.different_keys)}", end="")
+    print(f"\n - Content compared with {differences.compared_ranges:_} range hashes in {perf_counter() - start_time:.1f} seconds - DONE")
+    return {
+        'compared': True,
+        'source_only_rows': len(differences.source_only_keys),
+        'target_only_rows': len(differences.target_only_keys),
+        'different_rows': len(differences.different_keys),
+        'keys': {
+            'source_only': differences.source_only_keys[:COMPARE_MAX_PRINTED_KEYS],
+            'target_only': differences.target_only_keys[:COMPARE_MAX_PRINTED_KEYS],
+            'different': differences.different_keys[:COMPARE_MAX_PRINTED_KEYS],
+        },
+        'compared_ranges': differences.compared_ranges,
+    }
+
+
+def normalize_definition(definition):
+    """Normalize view definition by removing extra spaces and making it lowercase."""
+    # Convert to lowercase
+    definition = definition.lower()
+
+    # Remove extra whitespace (multiple spaces, newlines, etc.)
+    definition = re.sub(r'\s+', ' ', definition).strip()
+
+    # Copied views are created with "create or alter view" (see create_views)
+    definition = re.sub(r'^create or alter view ', 'create view ', definition)
+
+    return definition
 
-            # Get column info for source and target tables
-            source_cursor.execute(f"""
-                SELECT COLUMN_NAME, DATA_TYPE
-                FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_SCHEMA = '{source_schema}' AND TABLE_NAME = '{table_name}'
-            """)
-            source_columns = {row.COLUMN_NAME: row.DATA_TYPE for row in source_cursor.fetchall()}
 
-            target_cursor.execute(f"""
-                SELECT COLUMN_NAME, DATA_TYPE
-                FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_SCHEMA = '{target_schema}' AND TABLE_NAME = '{table_name}'
+class ProgressStore:
+    """
+    The progress track file (see --progress-track-file) as SQLite database in WAL mode: one row per operation id
+    with its status (START, SUCCESS or ERROR), the start and finish time, the duration, the number of attempts and
+    the last error, and the last value per id and kind (WATERMARK, VERSION, CHECKPOINT, RANGES). Lookups use the primary
+    keys and every change is one transaction, so several threads and processes can use the same file. Every
+    thread uses its own SQLite connection. A progress track file of the former text format is migrated on first
+    use, the text file is kept with the suffix ".txt".
+    """
+    SQLITE_HEADER = b'SQLite format 3\x00'
+    TEXT_LINE_PATTERN = re.compile(r'^(.*?): (START|SUCCESS|ERROR|WATERMARK|VERSION|CHECKPOINT)(?: (.*))? @(\S+)$')
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.local = threading.local()
+        text_lines = self.read_text_file()
+        with self.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS progress (
+                    id TEXT NOT NULL PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    duration_sec REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS progress_status ON progress (status)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS progress_value (
+                    id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    value TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (id, kind)
+                )
             """)
-            target_columns = {row.COLUMN_NAME: row.DATA_TYPE for row in target_cursor.fetchall()}
+            if text_lines:
+                self.migrate_text_lines(conn, text_lines)
+
+    def read_text_file(self) -> List[str]:
+        """
+        Move a progress track file of the text format away and return its lines, or None.
+        """
+        if not os.path.exists(self.file_name) or os.path.getsize(self.file_name) == 0:
+            return None
+        with open(self.file_name, 'rb') as file:
+            if file.read(len(self.SQLITE_HEADER)) == self.SQLITE_HEADER:
+                return None
+        with open(self.file_name, 'r') as file:
+            lines = file.read().splitlines()
+        os.replace(self.file_name, self.file_name + '.txt')
+        print(f"Migrating progress track file {self.file_name} ({len(lines)} lines) to SQLite, the text file is kept as {self.file_name}.txt")
+        return lines
+
+    def migrate_text_lines(self, conn, lines):
+        for line in lines:
+            match = self.TEXT_LINE_PATTERN.match(line)
+            if not match:
+                continue
+            id, status, value, time_text = match.groups()
+            if status in [STATUS_START, STATUS_SUCCESS, STATUS_ERROR]:
+                # a SUCCESS line was final in the text format, even if START lines of later runs followed
+                conn.execute("""
+                    INSERT INTO progress (id, status, started_at, finished_at, attempts, updated_at) VALUES (?, ?, ?, ?, 1, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        status = CASE WHEN progress.status = 'SUCCESS' THEN progress.status ELSE excluded.status END,
+                        finished_at = COALESCE(excluded.finished_at, progress.finished_at),
+                        duration_sec = COALESCE(ROUND((julianday(excluded.finished_at) - julianday(progress.started_at)) * 86400, 3), progress.duration_sec),
+                        updated_at = excluded.updated_at
+                """, (id, status, time_text if status == STATUS_START else None, time_text if status != STATUS_START else None, time_text))
+            else:
+                conn.execute("INSERT OR REPLACE INTO progress_value (id, kind, value, updated_at) VALUES (?, ?, ?, ?)", (id, status, value, time_text))
+
+    def get_connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # autocommit mode, the transactions are started explicitly (see transaction)
+            conn = sqlite3.connect(self.file_name, timeout=60, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        conn = self.get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now().isoformat(timespec='milliseconds')
+
+    def has_success(self, id) -> bool:
+        row = self.get_connection().execute("SELECT 1 FROM progress WHERE id = ? AND status = ?", (id, STATUS_SUCCESS)).fetchone()
+        return row is not None
+
+    def get_status(self, id) -> str:
+        row = self.get_connection().execute("SELECT status FROM progress WHERE id = ?", (id,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, id_prefix):
+        """
+        Delete the statuses and values of all ids starting with the prefix.
+        """
+        pattern = id_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM progress WHERE id LIKE ? ESCAPE '\\'", (pattern,))
+            conn.execute("DELETE FROM progress_value WHERE id LIKE ? ESCAPE '\\'", (pattern,))
+
+    def start(self, id):
+        now = self.now()
+        with self.transaction() as conn:
+            conn.execute("""
+                INSERT INTO progress (id, status, started_at, attempts, updated_at) VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (id) DO UPDATE SET status = excluded.status, started_at = excluded.started_at, finished_at = NULL,
+                    duration_sec = NULL, attempts = progress.attempts + 1, error = NULL, updated_at = excluded.updated_at
+            """, (id, STATUS_START, now, now))
+
+    def finish(self, id, status, error=None):
+        now = self.now()
+        with self.transaction() as conn:
+            conn.execute("""
+                INSERT INTO progress (id, status, finished_at, error, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET status = excluded.status, finished_at = excluded.finished_at, error = excluded.error,
+                    duration_sec = ROUND((julianday(excluded.finished_at) - julianday(progress.started_at)) * 86400, 3), updated_at = excluded.updated_at
+            """, (id, status, now, error, now))
+
+    def set_value(self, id, kind, value):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO progress_value (id, kind, value, updated_at) VALUES (?, ?, ?, ?)", (id, kind, value, self.now()))
+
+    def get_value(self, id, kind) -> str:
+        row = self.get_connection().execute("SELECT value FROM progress_value WHERE id = ? AND kind = ?", (id, kind)).fetchone()
+        return row[0] if row else None
+
+    def list(self, statuses=None) -> List[sqlite3.Row]:
+        conn = self.get_connection()
+        sql = "SELECT id, status, started_at, finished_at, duration_sec, attempts, error FROM progress"
+        if statuses:
+            sql += f" WHERE status IN ({', '.join(['?' for _ in statuses])})"
+        return conn.execute(sql + " ORDER BY COALESCE(started_at, finished_at), id", statuses or []).fetchall()
+
+progress_stores: Dict[str, ProgressStore] = {}
+
+def get_progress_store(file_name) -> ProgressStore:
+    with progress_track_lock:
+        store = progress_stores.get(file_name)
+        if store is None:
+            store = ProgressStore(file_name)
+            progress_stores[file_name] = store
+        return store
+
+def has_progress_track_success(file_name, id) -> bool:
+    if not file_name:
+        return False
+    return get_progress_store(file_name).has_success(id)
+
+def write_progress_track(file_name, id, status):
+    """
+    Record a status (START, SUCCESS, "ERROR <message>") of the id, or a value ("WATERMARK <value>", "VERSION <value>",
+    "CHECKPOINT <value>").
+    """
+    if not file_name:
+        return
+    store = get_progress_store(file_name)
+    kind, _, value = status.partition(' ')
+    if kind == STATUS_START:
+        store.start(id)
+    elif kind in [STATUS_SUCCESS, STATUS_ERROR]:
+        store.finish(id, kind, value or None)
+    else:
+        store.set_value(id, kind, value)
+
+def get_progress_track_status(file_name, id) -> str:
+    """
+    Return the last status (START, SUCCESS or ERROR) of the id, None if it was never started.
+    """
+    if not file_name:
+        return None
+    return get_progress_store(file_name).get_status(id)
+
+def clear_progress_track(file_name, id_prefix):
+    """
+    Forget the statuses and values of all ids starting with the prefix (e.g. the ranges of a table that is copied again).
+    """
+    if not file_name:
+        return
+    get_progress_store(file_name).delete(id_prefix)
 
-            # Compare column names and types
-            for col, type in source_columns.items():
-                if col not in target_columns:
-                    print(f"\n - Column {col} exists in source table but not in target table.", end="")
-                elif type != target_columns[col]:
-                    print(f"\n - Column {col} has different type: Source({type}) vs Target({target_columns[col]})", end="")
+def get_progress_track_value(file_name, id, status) -> str:
+    """
+    Return the last value of the given kind (e.g. WATERMARK) of the id, None if there is none.
+    """
+    if not file_name:
+        return None
+    return get_progress_store(file_name).get_value(id, status)
 
-            for col, type in target_columns.items():
-                if col not in source_columns:
-                    print(f"\n - Column {col} exists in target table but not in source table.", end="")
+def execute_with_progress_track(track_file_name, id, function, force_rerun=False):
+    if not force_rerun and has_progress_track_success(track_file_name, id):
+        print(f'Skipping {id}, was already processed successfully before (see {track_file_name}!')
+        return
+    if force_rerun:
+        print(f'Forcing re-execution of {id} - ', end="", flush=True)
+    write_progress_track(track_file_name, id, STATUS_START)
+    try:
+        function() # passed as lambda
+    except BaseException as e:
+        write_progress_track(track_file_name, id, f'{STATUS_ERROR} {type(e).__name__}: {e}')
+        raise
+    write_progress_track(track_file_name, id, STATUS_SUCCESS)
 
-            # Compare indices
-            source_indices = get_indices(source_cursor, source_schema, table_name)
-            target_indices = get_indices(target_cursor, target_schema, table_name)
+def print_progress_list(file_name, selection):
+    """
+    Print the operations of the progress track file: "pending" (started, but not finished: running or interrupted),
+    "failed", "success" or "all".
+    """
+    statuses = {'pending': [STATUS_START], 'failed': [STATUS_ERROR], 'success': [STATUS_SUCCESS], 'all': None}[selection]
+    rows = get_progress_store(file_name).list(statuses)
+    print(f"{len(rows)} operation(s){'' if selection == 'all' else ' ' + selection} in {file_name}:")
+    for row in rows:
+        duration = f"{row['duration_sec']:.1f}s" if row['duration_sec'] is not None else ''
+        print(f"{row['status']:<8} {row['started_at'] or '':<23} {duration:>10} {row['attempts']:>3}x  {row['id']}{'  ' + row['error'] if row['error'] else ''}")
+
+def get_compare_content_options(args) -> dict:
+    """
+    Options for compare_table_content from the command line arguments, None if the content is not compared.
+    """
+    if not args.compare_content and not args.repair:
+        return None
+    return {
+        'hash': args.compare_hash,
+        'chunks': max(2, args.compare_chunks),
+        'min_rows': args.compare_min_rows,
+    }
 
-            source_index_columns = {tuple(sorted(columns)) for columns in source_indices.values()}
-            target_index_columns = {tuple(sorted(columns)) for columns in target_indices.values()}
+def get_index_options(args) -> dict:
+    """
+    Build options of the indices (see get_create_index_query) from the command line arguments.
+    """
+    return {
+        'sort_in_tempdb': args.index_sort_in_tempdb,
+        'online': args.index_online,
+        'maxdop': args.index_maxdop,
+        'data_compression': args.index_data_compression,
+    }
 
-            for columns in source_index_columns:
-                if columns not in target_index_columns:
-                    print(f"\n - Index with columns {columns} exists in source table but not in target table.", end="")
+def get_copy_data_options(args, target_config, source_config=None) -> dict:
+    """
+    Keyword arguments for copy_data from the command line arguments. The arrow engine needs both connection configs.
+    """
+    bulk_options = None
+    if args.writer != WRITER_INSERT:
+        bulk_options = {
+            'writer': args.writer,
+            'dir': args.bulk_dir,
+            'server_dir': args.bulk_server_dir or args.bulk_dir,
+            'tablock': args.bulk_tablock,
+            'bcp': args.bcp_path,
+            'config': target_config,
+        }
+    return {
+        'dry_run': args.dry_run,
+        'page_size': args.page_size,
+        'where_clause': args.where_clause,
+        'joins': args.joins,
+        'paging': args.paging,
+        'pipeline_depth': args.pipeline_depth,
+        'bulk_options': bulk_options,
+        # only a heap created by this copy is locked, an existing (truncated) target table stays available
+        'table_lock': args.heap_load and args.create_table and not args.truncate_table and args.page_start == 1,
+        'auto_page_size': {'target_page_bytes': args.target_page_mb * 1024 * 1024, 'max_page_bytes': args.max_page_mb * 1024 * 1024} if args.auto_page_size else None,
+        'arrow_options': {
+            'source_config': source_config,
+            'target_config': target_config,
+            'table_filter': args.engine_table_filter,
+            'max_text_size': args.arrow_max_text_size,
+            'max_binary_size': args.arrow_max_binary_size,
+        } if args.engine == ENGINE_ARROW else None,
+    }
+
+def copy_table(source_conn, target_conn, source_schema, table_name, target_schema, args, source_config=None, target_config=None, build_indices_later=False):
+    """
+    Copy one table: truncate or drop/create it, drop the indices, copy the data and create the indices,
+    as configured by the command line arguments. The connection configs are needed to open more connections
+    for "--range-partitions" and "--index-workers". With build_indices_later, the indices are not created,
+    the caller builds the indices of all tables together (see build_indices).
+    """
+    if args.incremental:
+        sync_table_incremental(source_conn, target_conn, source_schema, table_name, target_schema, args, target_config)
+        return
+
+    # Determine if we need to re-drop/create (i.e., copy_data was not completed before)
+    id_where_clause = "." + args.where_clause.replace("\r", " ").replace("\n", " ") if args.where_clause else ''
+    id_joins = "." + ".".join(args.joins) if args.joins else ''
+    copy_status_id = f'copy_{source_schema}.{table_name}{id_where_clause}{id_joins}'
+    copy_data_completed = has_progress_track_success(args.progress_file_name, copy_status_id)
+    # a keyset copy that was interrupted continues after the key of its last committed page (see copy_data), not with
+    # joins: the rows after the key cannot be restricted to the joined rows in the target table
+    use_checkpoint = args.paging == PAGING_KEYSET and args.page_start == 1 and args.range_partitions <= 1 and args.engine == ENGINE_PYODBC and not args.joins
+    has_checkpoint = use_checkpoint and not copy_data_completed and get_progress_track_value(args.progress_file_name, copy_status_id, STATUS_CHECKPOINT) is not None
+    # an interrupted copy in ranges continues with the ranges that were not finished (see copy_data_ranges)
+    use_ranges = args.range_partitions > 1 and args.page_start == 1 and source_config and target_config
+    has_range_progress = use_ranges and not copy_data_completed and get_progress_track_value(args.progress_file_name, copy_status_id, STATUS_RANGES) is not None
+    force_recreate = not copy_data_completed and not has_checkpoint and not has_range_progress # force drop/create if the copy was not completed before (prevents hanging pyodbc executemany))
+    if use_ranges and not copy_data_completed and not has_range_progress:
+        # the ranges of an earlier copy do not exist in the target table anymore (or it is copied again)
+        clear_progress_track(args.progress_file_name, f"{copy_status_id}.range[")
+
+    if args.truncate_table:
+        if args.page_start != 1:
+            print("WARNING: Setting a start page and truncating the table does not make sense! - ignore the truncation!")
+        else:
+            status_id = f'truncate_{target_schema}.{table_name}'
+            execute_with_progress_track(args.progress_file_name, status_id, lambda: truncate_table(target_conn, target_schema, table_name, args.dry_run))
 
-            for columns in target_index_columns:
-                if columns not in source_index_columns:
-                    print(f"\n - Index with columns {columns} exists in target table but not in source table.", end="")
+    elif args.create_table:
+        if args.page_start != 1:
+            print("WARNING: Setting a start page and recreating the table does not make sense - ignore the table creation!")
+        else:
+            status_id = f'drop-table_{target_schema}.{table_name}'
+            execute_with_progress_track(args.progress_file_name, status_id, lambda: drop_table_if_exists(target_conn, target_schema, table_name, args.dry_run), force_rerun=force_recreate)
 
-            # Compare the number of rows
-            source_cursor.execute(f"SELECT COUNT(*) FROM {source_schema}.{table_name}")
-            source_row_count = source_cursor.fetchone()[0]
+            status_id = f'create-table_{target_schema}.{table_name}'
+            execute_with_progress_track(args.progress_file_name, status_id, lambda: create_table(source_conn, target_conn, source_schema, table_name, target_schema, args.dry_run, args.heap_load), force_rerun=force_recreate)
 
-            target_cursor.execute(f"SELECT COUNT(*) FROM {target_schema}.{table_name}")
-            target_row_count = target_cursor.fetchone()[0]
 
-            if source_row_count != target_row_count:
-                print(f"\n - Row count differs: Source({source_row_count:_}) vs Target({target_row_count:_})", end="")
+    # drop indices (no need if tables were dropped and recreated just before):
+    if args.drop_indices and not args.create_table:
+        if args.page_start != 1:
+            print("WARNING: Setting a start page results in ignoring index dropping!")
+        else:
+            status_id = f'drop_indices_{target_schema}.{table_name}'
+            execute_with_progress_track(args.progress_file_name, status_id, lambda: drop_all_indices(target_conn, target_schema, table_name, args.dry_run))
 
-            print(" - DONE")
 
+    # If a where clause is set and the rows should also be deleted first:
+    if args.where_clause and args.delete_where:
+        status_id = f'delete_data_{target_schema}.{table_name}{id_where_clause}'
+        execute_with_progress_track(args.progress_file_name, status_id, lambda: delete_data(target_conn, target_schema, table_name, args.where_clause, args.joins, args.dry_run))
 
-def compare_views(source_conn, source_schema, view_definitions, target_conn, target_schema):
-    for view_name, view_definition in view_definitions:         
-        compare_view(source_conn, source_schema, view_name, target_conn, target_schema)
 
-def compare_view(source_conn, source_schema, view_name, target_conn, target_schema):
-    print(f"Comparing view {source_schema}.{view_name} in source to target ...", end="", flush=True)
+    # Copy data from source to target
+    if args.copy_data:
+        # clustered indices cannot be disabled (then insertion is not possible anymore!)
+        # alter_all_indices(target_conn, target_schema, table_name, 'DISABLE', args.dry_run)
+        if use_ranges:
+            execute_with_progress_track(args.progress_file_name, copy_status_id, lambda: copy_data_ranges(source_config, target_config, source_conn, target_conn, source_schema, table_name, target_schema, copy_status_id, args))
+        else:
+            checkpoint_options = {'progress_file_name': args.progress_file_name, 'checkpoint_id': copy_status_id} if use_checkpoint else {}
+            execute_with_progress_track(args.progress_file_name, copy_status_id, lambda: copy_data(source_conn, target_conn, source_schema, table_name, target_schema, args.page_start - 1, **get_copy_data_options(args, target_config, source_config), **checkpoint_options))
+        # alter_all_indices(target_conn, target_schema, table_name, 'REBUILD', args.dry_run)
+
+    # add the primary key after loading the heap
+    if args.heap_load and args.create_table and not args.truncate_table and args.page_start == 1:
+        status_id = f'add-primary-key_{target_schema}.{table_name}'
+        execute_with_progress_track(args.progress_file_name, status_id, lambda: add_primary_key(source_conn, target_conn, source_schema, table_name, target_schema, args.dry_run), force_rerun=force_recreate)
+
+    # create indices
+    if args.copy_indices and not build_indices_later:
+        if args.page_start != 1 and not args.drop_indices:
+            print("WARNING: Setting a start page results in ignoring index creation!")
+        else:
+            status_id = f'copy-indices_{source_schema}.{table_name}'
+            execute_with_progress_track(args.progress_file_name, status_id, lambda: copy_indices(source_conn, target_conn, source_schema, table_name, target_schema, args.dry_run, get_index_options(args), args.index_workers, target_config))
 
-    with source_conn.cursor() as source_cursor:
+def get_watermark_column(conn, schema_name, table_name, column_name=None) -> ColumnInfo:
+    """
+    The column used as high-water mark: the given column or the rowversion column of the table.
+    """
+    columns = get_catalog(conn, schema_name, table_name).get_columns(table_name)
+    for column in columns:
+        if (column_name and column.COLUMN_NAME.lower() == column_name.lower()) or (not column_name and column.DATA_TYPE == 'timestamp'):
+            return column
+    if column_name:
+        raise RuntimeError(f"Watermark column {column_name} not found in table {schema_name}.{table_name}")
+    raise RuntimeError(f"Table {schema_name}.{table_name} has no rowversion column, please set a watermark column with --watermark-column")
+
+def encode_watermark(value) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + value.hex().upper()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def decode_watermark(text, data_type):
+    if data_type in ['timestamp', 'binary', 'varbinary']:
+        return bytes.fromhex(text[2:])
+    if data_type in ['datetime', 'datetime2', 'smalldatetime']:
+        return datetime.fromisoformat(text)
+    if data_type == 'date':
+        return date.fromisoformat(text)
+    if data_type in ['int', 'bigint', 'smallint', 'tinyint']:
+        return int(text)
+    if data_type in ['decimal', 'numeric']:
+        return Decimal(text)
+    return text
+
+def encode_key(key) -> str:
+    """
+    Encode the primary key values of a row as text for the progress track file (see encode_watermark).
+    """
+    return json.dumps([encode_watermark(value) for value in key])
+
+def decode_key(text, primary_key) -> tuple:
+    return tuple(decode_watermark(value, column.DATA_TYPE) for value, column in zip(json.loads(text), primary_key))
+
+def get_watermark_upper_bound(conn, schema_name, table_name, column):
+    """
+    The high-water mark of the rows to copy now. For a rowversion column this is MIN_ACTIVE_ROWVERSION() (exclusive),
+    so rows of transactions that are still open are copied by the next run, otherwise the maximum value (inclusive).
+    """
+    with conn.cursor() as cursor:
+        if column.DATA_TYPE == 'timestamp':
+            execute_sql_with_retry(cursor, "SELECT MIN_ACTIVE_ROWVERSION()")
+        else:
+            execute_sql_with_retry(cursor, f"SELECT MAX([{column.COLUMN_NAME}]) FROM {schema_name}.{table_name}")
+        return cursor.fetchone()[0]
+
+def get_watermark_condition(column, lower, upper) -> Tuple[str, list]:
+    """
+    Condition for the rows between the high-water mark of the last run (lower, None for the first run) and the current one (upper).
+
+    Other columns than rowversion columns include both high-water marks: rows committed after the last run with the same
+    value as its high-water mark are read again by the next run, the rows read twice are matched by the merge.
+    """
+    column_sql = f"source_table.[{column.COLUMN_NAME}]"
+    lower_operator, upper_operator = ('>=', '<') if column.DATA_TYPE == 'timestamp' else ('>=', '<=')
+    conditions = [f"{column_sql} {upper_operator} {placeholder(column.DATA_TYPE)}"]
+    parameters = [upper]
+    if lower is not None:
+        conditions.insert(0, f"{column_sql} {lower_operator} {placeholder(column.DATA_TYPE)}")
+        parameters.insert(0, lower)
+    return ' AND '.join(conditions), parameters
+
+def execute_apply_staging(target_cursor, target_schema, table_name, staging_table_name, columns, key_column_names, merge_mode) -> int:
+    """
+    Execute the statements that apply the rows of the staging table to the target table (not committed),
+    return the number of rows merged or inserted.
+    """
+    column_list = ', '.join([f'[{column.COLUMN_NAME}]' for column in columns])
+    on_sql = ' AND '.join([f'target_table.[{name}] = staging_table.[{name}]' for name in key_column_names])
+    has_identity = any(column.is_identity for column in columns)
+
+    if merge_mode == MERGE_MODE_MERGE:
+        update_columns = [column.COLUMN_NAME for column in columns if column.COLUMN_NAME not in key_column_names and not column.is_identity]
+        update_sql = ', '.join([f'target_table.[{name}] = staging_table.[{name}]' for name in update_columns])
+        statements = [f"""
+            MERGE {target_schema}.{table_name} WITH (HOLDLOCK) AS target_table
+            USING {target_schema}.{staging_table_name} AS staging_table
+            ON {on_sql}
+            {'WHEN MATCHED THEN UPDATE SET ' + update_sql if update_columns else ''}
+            WHEN NOT MATCHED BY TARGET THEN INSERT ({column_list}) VALUES ({', '.join([f'staging_table.[{column.COLUMN_NAME}]' for column in columns])});
+        """]
+    else:
+        statements = [
+            f"DELETE target_table FROM {target_schema}.{table_name} target_table JOIN {target_schema}.{staging_table_name} staging_table ON {on_sql}",
+            f"INSERT INTO {target_schema}.{table_name} ({column_list}) SELECT {column_list} FROM {target_schema}.{staging_table_name}",
+        ]
+
+    row_count = 0
+    if has_identity:
+        execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{table_name} ON")
+    for statement in statements:
+        execute_sql(target_cursor, statement)
+        row_count = target_cursor.rowcount
+    if has_identity:
+        execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{table_name} OFF")
+    return row_count
+
+def apply_staging_table(source_conn, target_conn, source_schema, table_name, target_schema, staging_table_name, merge_mode, dry_run = False):
+    """
+    Apply the rows of the staging table to the target table, matched on the primary key of the source table:
+    with one MERGE statement or by deleting the matching rows and inserting all rows of the staging table.
+    """
+    print(f"Applying {staging_table_name} to table {target_schema}.{table_name} using {merge_mode} ...", end="", flush=True)
+    start_time = perf_counter()
+    columns = get_copy_columns(source_conn, source_schema, table_name)
+    key_column_names = [column.COLUMN_NAME for column in get_primary_key(source_conn, source_schema, table_name)]
+
+    row_count = 0
+    if not dry_run:
         with target_conn.cursor() as target_cursor:
+            row_count = execute_apply_staging(target_cursor, target_schema, table_name, staging_table_name, columns, key_column_names, merge_mode)
+        target_conn.commit()
+    print(f" {row_count:_} rows - done in {perf_counter() - start_time:.1f} seconds" + get_dry_run_text(dry_run))
 
-            # Check if the view exists in the target schema
-            target_cursor.execute(f"""
-                SELECT TABLE_NAME
-                FROM INFORMATION_SCHEMA.VIEWS
-                WHERE TABLE_SCHEMA = '{target_schema}' AND TABLE_NAME = '{view_name}'
-            """)
-            target_view_exists = target_cursor.fetchone()
+def create_staging_table(target_conn, target_schema, table_name, dry_run = False) -> str:
+    """
+    (Re)create the staging table with the columns of the target table, without keys and indices, and return its name.
+    The staging table is marked with the extended property STAGING_TABLE_PROPERTY (see drop_staging_table_if_exists).
+    """
+    staging_table_name = f'{table_name}{STAGING_TABLE_SUFFIX}'
+    drop_staging_table_if_exists(target_conn, target_schema, staging_table_name, dry_run)
+    if not dry_run:
+        with target_conn.cursor() as target_cursor:
+            execute_sql(target_cursor, f"SELECT TOP 0 * INTO {target_schema}.{staging_table_name} FROM {target_schema}.{table_name}")
+            execute_sql_with_retry(target_cursor, """
+                EXEC sys.sp_addextendedproperty @name = ?, @value = N'1', @level0type = N'SCHEMA', @level0name = ?, @level1type = N'TABLE', @level1name = ?
+            """, STAGING_TABLE_PROPERTY, target_schema, staging_table_name)
+        target_conn.commit()
+        invalidate_catalog_object(target_conn, target_schema, staging_table_name)
+    return staging_table_name
 
-            if not target_view_exists:
-                print(f"\n - View {view_name} exists in source but not in target.")
-                return
+def drop_staging_table_if_exists(target_conn, target_schema, staging_table_name, dry_run = False):
+    """
+    Drop the staging table if it exists. Raises an error if a table with this name exists that was not created
+    as staging table by this script (it has no STAGING_TABLE_PROPERTY), such a table is never dropped.
+    """
+    with target_conn.cursor() as target_cursor:
+        execute_sql_with_retry(target_cursor, """
+            SELECT t.name, ep.value AS STAGING_MARK
+            FROM sys.tables t
+                JOIN sys.schemas s ON t.schema_id = s.schema_id
+                LEFT JOIN sys.extended_properties ep ON ep.class = 1 AND ep.major_id = t.object_id AND ep.minor_id = 0 AND ep.name = ?
+            WHERE s.name = ? AND t.name = ?
+        """, STAGING_TABLE_PROPERTY, target_schema, staging_table_name)
+        row = target_cursor.fetchone()
+    if row is None:
+        return
+    if row.STAGING_MARK is None:
+        raise RuntimeError(f"Table {target_schema}.{staging_table_name} exists, but it is not a staging table of this script - it is not dropped, please rename it")
+    drop_table_if_exists(target_conn, target_schema, staging_table_name, dry_run)
+
+def sync_table_incremental(source_conn, target_conn, source_schema, table_name, target_schema, args, target_config=None):
+    """
+    Copy the rows of a table that changed since the last run (see "--incremental"): the rows between the
+    high-water mark stored in the progress track file and the current one are copied into a staging table
+    and applied to the target table (see apply_staging_table), then the new high-water mark is stored.
+    """
+    watermark_id = f'watermark_{source_schema}.{table_name}'
+    column = get_watermark_column(source_conn, source_schema, table_name, args.watermark_column)
+    if not get_primary_key(source_conn, source_schema, table_name):
+        raise RuntimeError(f"Table {source_schema}.{table_name} has no primary key, it cannot be synchronized incrementally")
 
-            # Get column info for source and target views
-            source_cursor.execute(f"""
-                SELECT COLUMN_NAME, DATA_TYPE
-                FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_SCHEMA = '{source_schema}' AND TABLE_NAME = '{view_name}'
-            """)
-            source_columns = {row.COLUMN_NAME: row.DATA_TYPE for row in source_cursor.fetchall()}
+    lower_text = get_progress_track_value(args.progress_file_name, watermark_id, STATUS_WATERMARK)
+    lower = decode_watermark(lower_text, column.DATA_TYPE) if lower_text is not None else None
+    upper = get_watermark_upper_bound(source_conn, source_schema, table_name, column)
+    print(f"Incremental sync of table {table_name} on column {column.COLUMN_NAME} from {lower_text or 'the beginning'} to {encode_watermark(upper) if upper is not None else '-'}")
+    if upper is None:
+        print(f"Table {source_schema}.{table_name} is empty - nothing done.")
+        return
+
+    created = False
+    if not table_exists(target_conn, target_schema, table_name):
+        create_table(source_conn, target_conn, source_schema, table_name, target_schema, args.dry_run)
+        created = True
+
+    condition, parameters = get_watermark_condition(column, lower, upper)
+    where_clause = f"({args.where_clause}) AND {condition}" if args.where_clause else condition
+
+    staging_table_name = create_staging_table(target_conn, target_schema, table_name, args.dry_run)
 
-            target_cursor.execute(f"""
-                SELECT COLUMN_NAME, DATA_TYPE
-                FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_SCHEMA = '{target_schema}' AND TABLE_NAME = '{view_name}'
+    copy_data_options = get_copy_data_options(args, target_config)
+    copy_data_options.update(where_clause=where_clause, where_parameters=parameters, target_table_name=staging_table_name, table_lock=False)
+    copy_data(source_conn, target_conn, source_schema, table_name, target_schema, 0, **copy_data_options)
+
+    apply_staging_table(source_conn, target_conn, source_schema, table_name, target_schema, staging_table_name, args.merge_mode, args.dry_run)
+    drop_staging_table_if_exists(target_conn, target_schema, staging_table_name, args.dry_run)
+
+    if created and args.copy_indices:
+        copy_indices(source_conn, target_conn, source_schema, table_name, target_schema, args.dry_run, get_index_options(args), args.index_workers, target_config)
+
+    if not args.dry_run:
+        write_progress_track(args.progress_file_name, watermark_id, f'{STATUS_WATERMARK} {encode_watermark(upper)}')
+
+def get_sync_version(conn, sync_mode, schema_name, table_name):
+    """
+    The current version of the source database: the change tracking version or the maximum CDC log sequence number.
+    Raises an error if change tracking or CDC is not enabled for the table.
+    """
+    with conn.cursor() as cursor:
+        if sync_mode == SYNC_CHANGE_TRACKING:
+            execute_sql_with_retry(cursor, "SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(?)), CHANGE_TRACKING_CURRENT_VERSION()", f'{schema_name}.{table_name}')
+            min_valid_version, current_version = cursor.fetchone()
+            if min_valid_version is None:
+                raise RuntimeError(f"Change tracking is not enabled for table {schema_name}.{table_name}")
+            return current_version
+        get_capture_instance(conn, schema_name, table_name)
+        execute_sql_with_retry(cursor, "SELECT sys.fn_cdc_get_max_lsn()")
+        return cursor.fetchone()[0]
+
+def get_capture_instance(conn, schema_name, table_name) -> str:
+    with conn.cursor() as cursor:
+        execute_sql_with_retry(cursor, """
+            SELECT TOP 1 capture_instance
+            FROM cdc.change_tables
+            WHERE source_object_id = OBJECT_ID(?)
+            ORDER BY create_date DESC
+        """, f'{schema_name}.{table_name}')
+        row = cursor.fetchone()
+        if not row:
+            raise RuntimeError(f"Change data capture is not enabled for table {schema_name}.{table_name}")
+        return row.capture_instance
+
+def decode_sync_version(sync_mode, text):
+    return decode_watermark(text, 'bigint' if sync_mode == SYNC_CHANGE_TRACKING else 'binary')
+
+def read_changes(source_cursor, sync_mode, source_schema, table_name, columns, key_column_names, last_version, current_version) -> bool:
+    """
+    Execute the query for the changes after last_version up to current_version. Every row has the columns
+    SYNC_OPERATION ('D' for a delete, 'U' for an insert or update), SYNC_VERSION and the copied columns. Returns
+    False if there cannot be any changes.
+
+    Change tracking returns one row per changed key with the current values of the row (deleted if the row does
+    not exist anymore), CDC returns all changes in the order they were made.
+    """
+    if sync_mode == SYNC_CHANGE_TRACKING:
+        if last_version >= current_version:
+            return False
+        execute_sql_with_retry(source_cursor, "SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(?))", f'{source_schema}.{table_name}')
+        min_valid_version = source_cursor.fetchone()[0]
+        if min_valid_version is not None and last_version < min_valid_version:
+            raise RuntimeError(f"Change tracking data of table {source_schema}.{table_name} since version {last_version} was already cleaned up, the table must be copied again (remove its sync version from the progress track file)")
+        key_condition = ' AND '.join([f'source_table.[{name}] = ct.[{name}]' for name in key_column_names])
+        select_list = ', '.join([f'ct.[{column}]' if column in key_column_names else f'source_table.[{column}]' for column in columns])
+        execute_sql_with_retry(source_cursor, f"""
+            SELECT CASE WHEN source_table.[{key_column_names[0]}] IS NULL THEN 'D' ELSE 'U' END AS SYNC_OPERATION,
+                ct.SYS_CHANGE_VERSION AS SYNC_VERSION, {select_list}
+            FROM CHANGETABLE(CHANGES {source_schema}.{table_name}, ?) ct
+            LEFT JOIN {source_schema}.{table_name} source_table ON {key_condition}
+            WHERE ct.SYS_CHANGE_VERSION <= ?
+            ORDER BY ct.SYS_CHANGE_VERSION
+        """, last_version, current_version)
+        return True
+
+    if last_version >= current_version:
+        return False
+    capture_instance = get_capture_instance(source_cursor.connection, source_schema, table_name)
+    execute_sql_with_retry(source_cursor, "SELECT sys.fn_cdc_get_min_lsn(?)", capture_instance)
+    min_lsn = source_cursor.fetchone()[0]
+    if last_version < min_lsn:
+        raise RuntimeError(f"Change data of table {source_schema}.{table_name} since {encode_watermark(last_version)} was already cleaned up, the table must be copied again (remove its sync version from the progress track file)")
+    select_list = ', '.join([f'[{column}]' for column in columns])
+    execute_sql_with_retry(source_cursor, f"""
+        SELECT CASE WHEN __$operation = 1 THEN 'D' ELSE 'U' END AS SYNC_OPERATION,
+            __$start_lsn AS SYNC_VERSION, {select_list}
+        FROM cdc.fn_cdc_get_all_changes_{capture_instance}(sys.fn_cdc_increment_lsn(?), ?, N'all')
+        WHERE __$operation IN (1, 2, 4)
+        ORDER BY __$start_lsn, __$seqval
+    """, last_version, current_version)
+    return True
+
+def get_sync_lag_sec(conn, sync_mode, version) -> float:
+    """
+    Seconds since the change with the given version was committed in the source database, None if unknown
+    (e.g. missing permission on sys.dm_tran_commit_table).
+    """
+    if sync_mode == SYNC_CHANGE_TRACKING:
+        commit_time_sql = "(SELECT commit_time FROM sys.dm_tran_commit_table WHERE commit_ts = ?)"
+    else:
+        commit_time_sql = "sys.fn_cdc_map_lsn_to_time(?)"
+    try:
+        with conn.cursor() as cursor:
+            execute_sql(cursor, f"SELECT DATEDIFF(millisecond, {commit_time_sql}, SYSDATETIME())", version)
+            lag_msec = cursor.fetchone()[0]
+            return lag_msec / 1000 if lag_msec is not None else None
+    except pyodbc.Error:
+        return None
+
+def apply_change_batch(target_conn, target_schema, table_name, staging_table_name, columns, key_column_names, input_sizes, rows, merge_mode) -> Tuple[int, int]:
+    """
+    Apply a batch of changed rows (see read_changes) in one transaction: only the last change of every key is
+    applied, deleted keys are deleted in the target table, the other rows are written to the staging table
+    and merged. Returns the number of upserted and deleted rows.
+    """
+    column_names = [column.COLUMN_NAME for column in columns]
+    key_indices = [column_names.index(name) for name in key_column_names]
+    last_changes = {}
+    for row in rows:
+        values = tuple(row)[2:]
+        last_changes[tuple(values[index] for index in key_indices)] = (row.SYNC_OPERATION, values)
+    deletes = [key for key, (operation, values) in last_changes.items() if operation == 'D']
+    upserts = [values for operation, values in last_changes.values() if operation != 'D']
+
+    with target_conn.cursor() as target_cursor:
+        target_cursor.fast_executemany = True
+        if deletes:
+            key_condition = ' AND '.join([f'[{name}] = ?' for name in key_column_names])
+            target_cursor.executemany(f"DELETE FROM {target_schema}.{table_name} WHERE {key_condition}", deletes)
+        if upserts:
+            has_identity = any(column.is_identity for column in columns)
+            execute_sql(target_cursor, f"TRUNCATE TABLE {target_schema}.{staging_table_name}")
+            if has_identity:
+                execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{staging_table_name} ON")
+            placeholders = ', '.join(['?' for _ in column_names])
+            target_cursor.setinputsizes(input_sizes)
+            target_cursor.executemany(f"INSERT INTO {target_schema}.{staging_table_name} ({', '.join([f'[{name}]' for name in column_names])}) VALUES ({placeholders})", upserts)
+            if has_identity:
+                execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{staging_table_name} OFF")
+            execute_apply_staging(target_cursor, target_schema, table_name, staging_table_name, columns, key_column_names, merge_mode)
+    target_conn.commit()
+    return len(upserts), len(deletes)
+
+def sync_table_changes(source_conn, target_conn, source_schema, table_name, target_schema, staging_table_name, last_version, args) -> Tuple[int, int, float, object]:
+    """
+    Apply the changes of the table since its last applied version in batches of "--sync-batch-size" rows and
+    store the new version. Returns the number of upserted and deleted rows, the lag (seconds since the
+    oldest applied change was committed) and the new version.
+    """
+    version_id = f'sync-version_{source_schema}.{table_name}'
+    current_version = get_sync_version(source_conn, args.continuous_sync, source_schema, table_name)
+    columns = get_copy_columns(source_conn, source_schema, table_name)
+    key_column_names = [column.COLUMN_NAME for column in get_primary_key(source_conn, source_schema, table_name)]
+    input_sizes = get_input_sizes(source_conn, source_schema, table_name)
+
+    upsert_count, delete_count, oldest_version = 0, 0, None
+    with source_conn.cursor() as source_cursor:
+        if read_changes(source_cursor, args.continuous_sync, source_schema, table_name, [column.COLUMN_NAME for column in columns], key_column_names, last_version, current_version):
+            while True:
+                rows = source_cursor.fetchmany(args.sync_batch_size)
+                if not rows:
+                    break
+                if oldest_version is None:
+                    oldest_version = rows[0].SYNC_VERSION
+                if not args.dry_run:
+                    upserts, deletes = apply_change_batch(target_conn, target_schema, table_name, staging_table_name, columns, key_column_names, input_sizes, rows, args.merge_mode)
+                    upsert_count += upserts
+                    delete_count += deletes
+
+    lag_sec = get_sync_lag_sec(source_conn, args.continuous_sync, oldest_version) if oldest_version is not None else 0.0
+    if not args.dry_run and current_version != last_version:
+        write_progress_track(args.progress_file_name, version_id, f'{STATUS_VERSION} {encode_watermark(current_version)}')
+    return upsert_count, delete_count, lag_sec, current_version
+
+def continuous_sync(source_conn, target_conn, source_schema, table_names, target_schema, args, source_config=None, target_config=None):
+    """
+    Copy the tables that were not synchronized before and keep applying their changes (see "--continuous-sync").
+    """
+    # initial copy of the tables without a stored version: the version is taken before the copy, so changes made
+    # during the copy are applied again by the first cycle (applying changes is idempotent)
+    copy_args = argparse.Namespace(**{**vars(args), 'progress_file_name': None, 'incremental': False})
+    versions = {} # last applied version per table, only kept here in a dry run (nothing is stored then)
+    for table_name in table_names:
+        version_id = f'sync-version_{source_schema}.{table_name}'
+        if not get_primary_key(source_conn, source_schema, table_name):
+            raise RuntimeError(f"Table {source_schema}.{table_name} has no primary key, it cannot be synchronized")
+        version_text = get_progress_track_value(args.progress_file_name, version_id, STATUS_VERSION)
+        if version_text is None:
+            version = get_sync_version(source_conn, args.continuous_sync, source_schema, table_name)
+            print(f"Initial copy of table {table_name} for {args.continuous_sync} sync at version {encode_watermark(version)}")
+            copy_table(source_conn, target_conn, source_schema, table_name, target_schema, copy_args, source_config, target_config)
+            if not args.dry_run:
+                write_progress_track(args.progress_file_name, version_id, f'{STATUS_VERSION} {encode_watermark(version)}')
+        else:
+            version = decode_sync_version(args.continuous_sync, version_text)
+        versions[table_name] = version
+
+    staging_table_names = {table_name: create_staging_table(target_conn, target_schema, table_name, args.dry_run) for table_name in table_names}
+    cycle = 0
+    try:
+        while True:
+            cycle += 1
+            start_time = perf_counter()
+            change_count, max_lag_sec = 0, 0.0
+            for table_name in table_names:
+                upserts, deletes, lag_sec, versions[table_name] = sync_table_changes(source_conn, target_conn, source_schema, table_name, target_schema, staging_table_names[table_name], versions[table_name], args)
+                change_count += upserts + deletes
+                if upserts or deletes:
+                    print(f"  {table_name}: {upserts:_} upserts, {deletes:_} deletes (lag {f'{lag_sec:.1f}s' if lag_sec is not None else 'unknown'})", flush=True)
+                if lag_sec is not None:
+                    max_lag_sec = max(max_lag_sec, lag_sec)
+            print(f"Sync cycle {cycle} done in {perf_counter() - start_time:.1f} seconds: {change_count:_} changes in {len(table_names)} tables, max lag {max_lag_sec:.1f}s" + get_dry_run_text(args.dry_run), flush=True)
+
+            if args.sync_cycles and cycle >= args.sync_cycles:
+                break
+            time.sleep(args.sync_poll_interval)
+    except KeyboardInterrupt:
+        print(f"Sync stopped after {cycle} cycle(s).")
+    finally:
+        for staging_table_name in staging_table_names.values():
+            drop_staging_table_if_exists(target_conn, target_schema, staging_table_name, args.dry_run)
+
+class ThreadOutput:
+    """
+    Replacement for sys.stdout that collects the output of a worker thread in a buffer (after start_buffer was
+    called in that thread), so the output of a table is printed as one block instead of interleaving with the
+    output of the other workers. Output of all other threads is written through.
+    """
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(text)
+        with self.lock:
+            return self.stdout.write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stdout.flush()
+
+    def print_direct(self, text):
+        with self.lock:
+            self.stdout.write(text + '\n')
+            self.stdout.flush()
+
+    def start_buffer(self):
+        self.local.buffer = io.StringIO()
+
+    def flush_buffer(self):
+        buffer = self.local.buffer
+        self.local.buffer = None
+        with self.lock:
+            self.stdout.write(buffer.getvalue())
+            if not buffer.getvalue().endswith('\n'):
+                self.stdout.write('\n')
+            self.stdout.flush()
+
+class WorkerConnections:
+    """
+    Source and target session pair per worker thread (see Session). The connections are taken from the connection
+    pool on first use in a thread and returned to it together by close_all(), so the next workers reuse them without
+    a new login. Without source config, only target connections are used.
+    """
+    def __init__(self, source_config, target_config):
+        self.source_config = source_config
+        self.target_config = target_config
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def get(self) -> Tuple[Session, Session]:
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            connections = (Session(connection_pool.acquire(self.source_config), self.source_config) if self.source_config else None,
+                           Session(connection_pool.acquire(self.target_config), self.target_config))
+            self.local.connections = connections
+            with self.lock:
+                self.connections.append(connections)
+        return connections
+
+    def reset(self):
+        """
+        Close the connections of the current thread (e.g. after an error, they are not returned to the pool because
+        of a possibly broken connection or left over session state like IDENTITY_INSERT), the next get() opens new ones.
+        """
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            return
+        self.local.connections = None
+        with self.lock:
+            self.connections.remove(connections)
+        for session in connections:
+            if session is not None:
+                connection_pool.discard(session.conn)
+
+    def close_all(self):
+        with self.lock:
+            for source_session, target_session in self.connections:
+                if source_session:
+                    connection_pool.release(self.source_config, source_session.conn)
+                connection_pool.release(self.target_config, target_session.conn)
+            self.connections = []
+
+def get_table_sizes(conn, schema) -> Dict[str, int]:
+    """
+    Return the number of rows of all tables in the schema, read from the partition metadata (no table scan).
+    """
+    with conn.cursor() as cursor:
+        execute_sql_with_retry(cursor, """
+            SELECT t.name AS TABLE_NAME, SUM(p.rows) AS ROW_COUNT
+            FROM sys.tables t
+            JOIN sys.schemas s ON t.schema_id = s.schema_id
+            JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+            WHERE s.name = ?
+            GROUP BY t.name
+        """, schema)
+        return {row.TABLE_NAME: row.ROW_COUNT for row in cursor.fetchall()}
+
+def get_key_ranges(conn, schema_name, table_name, primary_key, partitions, split='minmax', where_clause=None, joins=None) -> List[Tuple[object, object]]:
+    """
+    Split the values of the numerical primary key into disjoint ranges [lower, upper). The lower bound of
+    the first range and the upper bound of the last range are None (unbounded).
+
+    :param split: "minmax" for ranges of equal key width, "quantile" for ranges with the same number of rows.
+    """
+    join_sql = " ".join([f'\nJOIN {join}' for join in joins]) if joins else ''
+    where_sql = 'WHERE ' + where_clause if where_clause else ''
+    with conn.cursor() as cursor:
+        if split == 'quantile':
+            execute_sql_with_retry(cursor, f"""
+                SELECT MIN(tiles.{primary_key}) AS LOWER_BOUND
+                FROM (
+                    SELECT source_table.{primary_key}, NTILE({partitions}) OVER (ORDER BY source_table.{primary_key}) AS tile
+                    FROM {schema_name}.{table_name} source_table
+                    {join_sql}
+                    {where_sql}
+                ) tiles
+                GROUP BY tiles.tile
+                ORDER BY 1
             """)
-            target_columns = {row.COLUMN_NAME: row.DATA_TYPE for row in target_cursor.fetchall()}
-
-            # Compare column names and types
-            for col, type in source_columns.items():
-                if col not in target_columns:
-                    print(f"\n - Column {col} exists in source view but not in target view.", end="")
-                elif type != target_columns[col]:
-                    print(f"\n - Column {col} has different type: Source({type}) vs Target({target_columns[col]})", end="")
-
-            for col, type in target_columns.items():
-                if col not in source_columns:
-                    print(f"\n - Column {col} exists in target view but not in source view.", end="")
-
-            # Compare view definitions
-            source_cursor.execute(f"""
-                SELECT VIEW_DEFINITION
-                FROM INFORMATION_SCHEMA.VIEWS
-                WHERE TABLE_SCHEMA = '{source_schema}' AND TABLE_NAME = '{view_name}'
+            bounds = [row.LOWER_BOUND for row in cursor.fetchall()][1:]
+        else:
+            execute_sql_with_retry(cursor, f"""
+                SELECT MIN(source_table.{primary_key}) AS MIN_KEY, MAX(source_table.{primary_key}) AS MAX_KEY
+                FROM {schema_name}.{table_name} source_table
+                {join_sql}
+                {where_sql}
             """)
-            source_view_definition = source_cursor.fetchone()[0]
+            row = cursor.fetchone()
+            if row.MIN_KEY is None:
+                return [(None, None)]
+            width = (row.MAX_KEY - row.MIN_KEY + 1) / partitions
+            bounds = sorted({int(row.MIN_KEY + width * index) for index in range(1, partitions)})
+            bounds = [bound for bound in bounds if row.MIN_KEY < bound <= row.MAX_KEY]
+
+    bounds = [None] + bounds + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def get_key_range_condition(primary_key, lower, upper) -> str:
+    conditions = []
+    if lower is not None:
+        conditions.append(f"source_table.{primary_key} >= {lower}")
+    if upper is not None:
+        conditions.append(f"source_table.{primary_key} < {upper}")
+    return ' AND '.join(conditions) if conditions else '1 = 1'
+
+def copy_data_ranges(source_config, target_config, source_conn, target_conn, source_schema, table_name, target_schema, copy_status_id, args):
+    """
+    Copy the table in args.range_partitions key ranges at the same time, each range on its own connection pair.
 
-            target_cursor.execute(f"""
-                SELECT VIEW_DEFINITION
-                FROM INFORMATION_SCHEMA.VIEWS
-                WHERE TABLE_SCHEMA = '{target_schema}' AND TABLE_NAME = '{view_name}'
-            """)
-            target_view_definition = target_cursor.fetchone()[0]
+    Every range is tracked in the progress track file on its own, so after a failure only the ranges that were not
+    finished are copied again. The ranges are kept in the progress track file as well, so a restart uses the same
+    ranges even if the data changed in the meantime. A failed range is retried args.range_retries times, after
+    deleting the rows of the range that were already written to the target (also by an interrupted run).
+    """
+    primary_key = get_numerical_primary_key(source_conn, source_schema, table_name)
+    if not primary_key:
+        print(f"Table {table_name} has no numerical primary key, copying it without ranges.")
+        copy_data(source_conn, target_conn, source_schema, table_name, target_schema, 0, **get_copy_data_options(args, target_config, source_config))
+        return
+
+    key_type = get_primary_key(source_conn, source_schema, table_name)[0].DATA_TYPE
+    saved_ranges = get_progress_track_value(args.progress_file_name, copy_status_id, STATUS_RANGES)
+    if saved_ranges:
+        key_ranges = [tuple(None if bound is None else decode_watermark(bound, key_type) for bound in key_range) for key_range in json.loads(saved_ranges)]
+        print(f"Continuing the interrupted copy of table {table_name} with its {len(key_ranges)} ranges.")
+    else:
+        key_ranges = get_key_ranges(source_conn, source_schema, table_name, primary_key, args.range_partitions, args.range_split, args.where_clause, args.joins)
+        if not args.dry_run:
+            write_progress_track(args.progress_file_name, copy_status_id, f"{STATUS_RANGES} {json.dumps([[None if bound is None else encode_watermark(bound) for bound in key_range] for key_range in key_ranges])}")
+    print(f"Copying table {table_name} in {len(key_ranges)} ranges of primary key '{primary_key}' ({args.range_split}) ...", flush=True)
+
+    output = sys.stdout if isinstance(sys.stdout, ThreadOutput) else ThreadOutput(sys.stdout)
+    worker_connections = WorkerConnections(source_config, target_config)
+
+    def copy_range(range_number, lower, upper):
+        range_condition = get_key_range_condition(primary_key, lower, upper)
+        where_clause = f"({args.where_clause}) AND {range_condition}" if args.where_clause else range_condition
+        range_name = f"{table_name} range {range_number}/{len(key_ranges)} [{lower}, {upper})"
+        status_id = f"{copy_status_id}.range[{lower},{upper})"
+        # a range that was started before, but did not finish, has written some of its rows already
+        interrupted = get_progress_track_status(args.progress_file_name, status_id) in [STATUS_START, STATUS_ERROR]
+
+        def copy_range_with_retry():
+            for attempt in range(args.range_retries + 1):
+                output.start_buffer()
+                try:
+                    worker_source_conn, worker_target_conn = worker_connections.get()
+                    if attempt > 0 or interrupted:
+                        delete_data(worker_target_conn, target_schema, table_name, where_clause, args.joins, args.dry_run)
+                    copy_data(worker_source_conn, worker_target_conn, source_schema, table_name, target_schema, 0, **{**get_copy_data_options(args, target_config, source_config), 'where_clause': where_clause},
+                              metrics_range=f"[{lower}, {upper})")
+                    return
+                except Exception as e:
+                    worker_connections.reset()
+                    if attempt >= args.range_retries:
+                        raise
+                    print(f"\nCopying {range_name} failed: {e}")
+                finally:
+                    output.flush_buffer()
+                output.print_direct(f"Retrying {range_name} (attempt {attempt + 2}/{args.range_retries + 1}) ...")
+
+        output.print_direct(f"Started {range_name}")
+        execute_with_progress_track(args.progress_file_name, status_id, copy_range_with_retry)
+        output.print_direct(f"Finished {range_name}")
+
+    previous_stdout = sys.stdout
+    sys.stdout = output
+    start_time = perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=len(key_ranges), thread_name_prefix='range') as executor:
+            futures = [executor.submit(copy_range, index + 1, lower, upper) for index, (lower, upper) in enumerate(key_ranges)]
+            wait(futures)
+            failed = [future.exception() for future in futures if future.exception()]
+            if failed:
+                print(f"{len(failed)} of {len(key_ranges)} ranges of table {table_name} failed, restart to copy the missing ranges.")
+                raise failed[0]
+        metrics.finish_ranges(f'{source_schema}.{table_name}', perf_counter() - start_time, target_table=f'{target_schema}.{table_name}', ranges=len(key_ranges))
+    finally:
+        sys.stdout = previous_stdout
+        worker_connections.close_all()
 
-            # Normalize both view definitions before comparing
-            normalized_source_definition = normalize_definition(source_view_definition)
-            normalized_target_definition = normalize_definition(target_view_definition)
+def merge_adjacent_ranges(key_ranges) -> List[Tuple[tuple, tuple]]:
+    """
+    Merge key ranges (lower exclusive, upper inclusive) in key order where one range ends at the start of the next one.
+    """
+    merged = []
+    for lower, upper in key_ranges:
+        if merged and merged[-1][1] is not None and merged[-1][1] == lower:
+            merged[-1] = (merged[-1][0], upper)
+        else:
+            merged.append((lower, upper))
+    return merged
 
-            if normalized_source_definition != normalized_target_definition:
-                print(f"\n - View definitions differ after normalization:\nSource:\n{source_view_definition}\nTarget:\n{target_view_definition}")
+def repair_table(source_config, target_config, source_conn, target_conn, source_schema, table_name, target_schema, args):
+    """
+    Compare the content of the table (see compare_table_content), then delete the rows of the key ranges that
+    differ in the target table and copy them again, args.repair_workers ranges at the same time, each on its
+    own connection pair. Ranges that match are not touched. A failed repair can simply be repeated.
+    """
+    primary_key = get_primary_key(source_conn, source_schema, table_name)
+    if not primary_key:
+        print(f"Table {table_name} has no primary key, it cannot be repaired.")
+        return
 
-            print(" - DONE")
+    print(f"Comparing table {table_name} to find the ranges to repair ...", end="", flush=True)
+    start_time = perf_counter()
+    differences = compare_table_content(source_conn, source_schema, table_name, target_conn, target_schema, get_compare_content_options(args))
+    key_ranges = merge_adjacent_ranges(differences.ranges)
+    print(f" {len(differences.source_only_keys):_} rows missing, {len(differences.target_only_keys):_} rows too many, {len(differences.different_keys):_} rows different in {len(key_ranges)} ranges ({differences.compared_ranges:_} range hashes compared in {perf_counter() - start_time:.1f} seconds)")
+    if not key_ranges:
+        print(f"Table {table_name} is identical - nothing to repair.")
+        return
+
+    output = sys.stdout if isinstance(sys.stdout, ThreadOutput) else ThreadOutput(sys.stdout)
+    worker_connections = WorkerConnections(source_config, target_config)
+
+    def repair_range(range_number, lower, upper):
+        range_condition, parameters = get_keyset_range_condition(primary_key, lower, upper)
+        range_name = f"{table_name} range {range_number}/{len(key_ranges)} ({lower}, {upper}]"
+        output.print_direct(f"Started repairing {range_name}")
+        output.start_buffer()
+        try:
+            worker_source_conn, worker_target_conn = worker_connections.get()
+            delete_data(worker_target_conn, target_schema, table_name, range_condition or '1 = 1', None, args.dry_run, parameters)
+            copy_data(worker_source_conn, worker_target_conn, source_schema, table_name, target_schema, 0, **{**get_copy_data_options(args, target_config, source_config), 'where_clause': range_condition or None, 'where_parameters': parameters, 'joins': None, 'table_lock': False})
+        except Exception:
+            worker_connections.reset()
+            raise
+        finally:
+            output.flush_buffer()
+
+    previous_stdout = sys.stdout
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(args.repair_workers, len(key_ranges))), thread_name_prefix='repair') as executor:
+            futures = [executor.submit(repair_range, index + 1, lower, upper) for index, (lower, upper) in enumerate(key_ranges)]
+            wait(futures)
+            failed = [future.exception() for future in futures if future.exception()]
+            if failed:
+                print(f"{len(failed)} of {len(key_ranges)} ranges of table {table_name} could not be repaired, restart the repair.")
+                raise failed[0]
+    finally:
+        sys.stdout = previous_stdout
+        worker_connections.close_all()
 
+def copy_tables_parallel(source_config, target_config, source_conn, source_schema, table_names, target_schema, args):
+    """
+    Copy the tables with args.parallel_tables workers, each one using its own connection pair. The largest
+    tables are started first, so a large table does not start last and prolong the whole run.
+    """
+    table_sizes = get_table_sizes(source_conn, source_schema)
+    table_names = sorted(table_names, key=lambda name: table_sizes.get(name, 0), reverse=True)
+    print(f'Copying {len(table_names)} tables with {args.parallel_tables} workers, largest tables first ...', flush=True)
 
-def normalize_definition(definition):
-    """Normalize view definition by removing extra spaces and making it lowercase."""
-    # Convert to lowercase
-    definition = definition.lower()
+    output = ThreadOutput(sys.stdout)
+    worker_connections = WorkerConnections(source_config, target_config)
 
-    # Remove extra whitespace (multiple spaces, newlines, etc.)
-    definition = re.sub(r'\s+', ' ', definition).strip()
+    def copy_table_worker(table_name):
+        output.print_direct(f'Started table {table_name} ({table_sizes.get(table_name, 0):_} rows)')
+        output.start_buffer()
+        try:
+            worker_source_conn, worker_target_conn = worker_connections.get()
+            copy_table(worker_source_conn, worker_target_conn, source_schema, table_name, target_schema, args, source_config, target_config)
+        except Exception:
+            print(f'Copying table {table_name} failed:')
+            traceback.print_exc(file=sys.stdout)
+            worker_connections.reset()
+            raise
+        finally:
+            output.flush_buffer()
+
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=args.parallel_tables, thread_name_prefix='table') as executor:
+            futures = [executor.submit(copy_table_worker, table_name) for table_name in table_names]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel() # do not start any more tables after an error
+            wait(futures)
+            for future in futures:
+                if not future.cancelled() and future.exception():
+                    raise future.exception()
+    finally:
+        sys.stdout = output.stdout
+        worker_connections.close_all()
 
-    return definition
+class DependencyScheduler:
+    """
+    Run the nodes of a dependency graph with at most workers nodes at the same time. A node starts as soon as all
+    nodes it depends on are done, so independent nodes run concurrently and ready nodes start in the order they
+    were added. If a node fails, the nodes that depend on it (also indirectly) are skipped, all others still run.
+    Nodes are identified by (kind, name), dependencies on nodes that were not added are ignored.
+    """
+    def __init__(self, workers):
+        self.workers = workers
+        self.functions = {}
+        self.dependencies: Dict[tuple, List[tuple]] = {}
 
+    def add(self, key, function, dependencies=()):
+        self.functions[key] = function
+        self.dependencies[key] = list(dependencies)
 
-def has_progress_track_success(file_name, id) -> bool:
-    if not file_name:
-        return False
-    
-    if not os.path.exists(file_name):
-        return False
-    with open(file_name, 'r') as file:
-        for line in file:
-            if line.startswith(f'{id}: {STATUS_SUCCESS}'):
-                return True
-    return False
+    def run(self) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+        """
+        Run all nodes, return the nodes that were done, that failed and that were skipped (because a node they depend
+        on failed or because of a dependency cycle).
+        """
+        dependents = {key: [] for key in self.functions}
+        waiting = {}
+        for key, dependencies in self.dependencies.items():
+            dependencies = set(dependency for dependency in dependencies if dependency in self.functions and dependency != key)
+            for dependency in dependencies:
+                dependents[dependency].append(key)
+            waiting[key] = len(dependencies)
+        done, failed, skipped = [], [], []
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='node') as executor:
+            running = {}
+            def start_ready_nodes():
+                for key in [key for key, count in waiting.items() if count == 0]:
+                    del waiting[key]
+                    running[executor.submit(self.functions[key])] = key
+
+            start_ready_nodes()
+            while running:
+                finished, not_finished = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    if future.exception():
+                        failed.append(key)
+                        subtree = list(dependents[key])
+                        while subtree:
+                            dependent = subtree.pop()
+                            if dependent in waiting:
+                                del waiting[dependent]
+                                skipped.append(dependent)
+                                subtree.extend(dependents[dependent])
+                    else:
+                        done.append(key)
+                        for dependent in dependents[key]:
+                            if dependent in waiting:
+                                waiting[dependent] -= 1
+                start_ready_nodes()
+        skipped.extend(waiting) # dependency cycle
+        return done, failed, skipped
+
+def copy_objects_scheduled(source_config, target_config, source_conn, source_schema, table_names, target_schema, args):
+    """
+    Copy the tables, their indices, the views and the synonyms with the dependency scheduler ("--scheduler dag",
+    see DependencyScheduler) and args.scheduler_workers connection pairs: a view waits only for the tables, views
+    and synonyms it uses (see get_object_dependencies), a synonym for its base object and the indices of a table
+    for its data. Views and synonyms start before the tables (largest first), as they are done quickly.
+    """
+    view_definitions = get_view_definitions_to_copy(source_conn, source_schema, target_schema, args) if args.copy_view else []
+    synonym_definitions = get_synonym_definitions_to_copy(source_conn, source_schema, target_schema, args) if args.copy_synonym else []
+    dependencies = get_object_dependencies(source_conn, source_schema) if view_definitions or synonym_definitions else {}
+    table_sizes = get_table_sizes(source_conn, source_schema) if table_names else {}
+    table_names = sorted(table_names, key=lambda name: table_sizes.get(name, 0), reverse=True)
+    copy_indices_later = args.copy_indices and not args.incremental and (args.page_start == 1 or args.drop_indices)
+
+    # the node of every object name of the schema that is copied (names are not case sensitive)
+    node_keys = {name.lower(): (NODE_TABLE, name) for name in table_names}
+    node_keys.update({name.lower(): (NODE_VIEW, name) for name, definition in view_definitions})
+    node_keys.update({name.lower(): (NODE_SYNONYM, name) for name, base_object_name in synonym_definitions})
+    def get_dependency_keys(name):
+        return [node_keys[dependency] for dependency in dependencies.get(name.lower(), []) if dependency in node_keys]
+
+    output = ThreadOutput(sys.stdout)
+    worker_connections = WorkerConnections(source_config, target_config)
+
+    def create_node(kind, name, function):
+        def run_node():
+            output.print_direct(f'Started {kind} {name}')
+            output.start_buffer()
+            try:
+                worker_source_conn, worker_target_conn = worker_connections.get()
+                function(worker_source_conn, worker_target_conn)
+            except Exception:
+                print(f'Copying {kind} {name} failed:')
+                traceback.print_exc(file=sys.stdout)
+                worker_connections.reset()
+                raise
+            finally:
+                output.flush_buffer()
+        return run_node
+
+    scheduler = DependencyScheduler(args.scheduler_workers)
+    for name, base_object_name in synonym_definitions:
+        scheduler.add((NODE_SYNONYM, name), create_node(NODE_SYNONYM, name, lambda worker_source_conn, worker_target_conn, name=name, base_object_name=base_object_name:
+            create_synonyms(worker_target_conn, target_schema, [(name, base_object_name)], args.dry_run)), get_dependency_keys(name))
+    for name, definition in view_definitions:
+        scheduler.add((NODE_VIEW, name), create_node(NODE_VIEW, name, lambda worker_source_conn, worker_target_conn, name=name, definition=definition:
+            create_views(worker_target_conn, target_schema, [(name, definition)], args.dry_run)), get_dependency_keys(name))
+    for name in table_names:
+        scheduler.add((NODE_TABLE, name), create_node(NODE_TABLE, name, lambda worker_source_conn, worker_target_conn, name=name:
+            copy_table(worker_source_conn, worker_target_conn, source_schema, name, target_schema, args, source_config, target_config, build_indices_later=True)))
+        if copy_indices_later:
+            scheduler.add((NODE_INDICES, name), create_node(NODE_INDICES, name, lambda worker_source_conn, worker_target_conn, name=name:
+                execute_with_progress_track(args.progress_file_name, f'copy-indices_{source_schema}.{name}', lambda: copy_indices(worker_source_conn, worker_target_conn, source_schema, name, target_schema, args.dry_run, get_index_options(args)))),
+                [(NODE_TABLE, name)])
+
+    print(f'Copying {len(table_names)} tables, {len(view_definitions)} views and {len(synonym_definitions)} synonyms in the order of their dependencies with {args.scheduler_workers} workers ...', flush=True)
+    sys.stdout = output
+    try:
+        done, failed, skipped = scheduler.run()
+    finally:
+        sys.stdout = output.stdout
+        worker_connections.close_all()
 
-def write_progress_track(file_name, id, status):
-    if file_name:
-        with open(file_name, "a") as file:
-            now = datetime.now()
-            now_str = now.strftime("%Y-%m-%dT%H:%M:%S")
-            file.write(f'{id}: {status} @{now_str}\n')
+    print(f'{len(done)} objects copied, {len(failed)} failed, {len(skipped)} skipped because an object they depend on failed (or of a dependency cycle).')
+    for kind, name in skipped:
+        print(f'  skipped {kind} {name}')
+    if failed:
+        raise RuntimeError(f"Copying {', '.join([f'{kind} {name}' for kind, name in failed])} failed, restart to copy the missing objects.")
 
-def execute_with_progress_track(track_file_name, id, function, force_rerun=False):
-    write_progress_track(track_file_name, id, STATUS_START)
+def get_arrow_type(column):
+    """
+    Arrow type of the values of the column in the exported Parquet files. Types without a matching Arrow type
+    (e.g. datetimeoffset, xml, sql_variant) are exported as text.
+    """
+    data_type = column.DATA_TYPE
+    if data_type in ['decimal', 'numeric']:
+        return pyarrow.decimal128(column.NUMERIC_PRECISION or 18, column.NUMERIC_SCALE or 0)
+    arrow_types = {
+        'bit': pyarrow.bool_(),
+        'tinyint': pyarrow.uint8(),
+        'smallint': pyarrow.int16(),
+        'int': pyarrow.int32(),
+        'bigint': pyarrow.int64(),
+        'money': pyarrow.decimal128(19, 4),
+        'smallmoney': pyarrow.decimal128(10, 4),
+        'float': pyarrow.float64(),
+        'real': pyarrow.float32(),
+        'date': pyarrow.date32(),
+        'time': pyarrow.time64('us'),
+        'datetime': pyarrow.timestamp('us'),
+        'datetime2': pyarrow.timestamp('us'),
+        'smalldatetime': pyarrow.timestamp('us'),
+        'binary': pyarrow.binary(),
+        'varbinary': pyarrow.binary(),
+        'image': pyarrow.binary(),
+        'hierarchyid': pyarrow.binary(),
+        'geography': pyarrow.binary(),
+        'geometry': pyarrow.binary(),
+    }
+    return arrow_types.get(data_type, pyarrow.string())
 
-    if not force_rerun and has_progress_track_success(track_file_name, id):
-        print(f'Skipping {id}, was already processed successfully before (see {track_file_name}!')
+def get_arrow_array(values, arrow_type):
+    if arrow_type == pyarrow.string():
+        values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+    return pyarrow.array(values, type=arrow_type)
+
+def get_export_table_dir(export_dir, schema_name, table_name) -> str:
+    return os.path.join(export_dir, f'{schema_name}.{table_name}')
+
+def get_part_file_names(table_dir) -> List[str]:
+    if not os.path.isdir(table_dir):
+        return []
+    return sorted([os.path.join(table_dir, name) for name in os.listdir(table_dir) if re.fullmatch(r'part-\d{6}\.parquet', name)])
+
+def read_part_metadata(file_name) -> dict:
+    return json.loads(pyarrow.parquet.read_schema(file_name).metadata[PARQUET_METADATA_KEY])
+
+def write_json_file(file_name, data):
+    # write to a temporary file and rename it, so the file is never read half written
+    with open(file_name + '.tmp', 'w') as file:
+        json.dump(data, file, indent=2, default=str)
+    os.replace(file_name + '.tmp', file_name)
+
+def export_table(source_conn, source_schema, table_name, export_dir, args):
+    """
+    Export the rows of the table (with the where clause and joins) to Parquet files in the directory "schema.table"
+    of the export directory: one compressed file per page, read with the paging of copy_data. The table definition
+    (columns, primary key and indices) is embedded in every file.
+
+    A file is written to a temporary file and renamed when it is complete. After an interruption, keyset paging
+    continues after the last key of the last complete file and offset paging (with a fixed page size) at the next
+    page, stream paging starts over. When all pages are written, a manifest with the files and the number of rows
+    is written, the import only reads tables with a manifest.
+    """
+    table_dir = get_export_table_dir(export_dir, source_schema, table_name)
+    manifest_file_name = os.path.join(table_dir, PARQUET_MANIFEST_FILE)
+    export_options = {'where_clause': args.where_clause, 'joins': args.joins, 'paging': args.paging, 'page_size': args.page_size, 'auto_page_size': args.auto_page_size}
+    if os.path.exists(manifest_file_name):
+        with open(manifest_file_name, 'r') as file:
+            manifest = json.load(file)
+        if manifest['export'] == export_options:
+            print(f"Table {table_name} was already exported to {table_dir} ({manifest['rows']:_} rows) - skipped.")
+            return
+        os.remove(manifest_file_name)
+
+    print(f"Exporting table {table_name} {'using where clause [' + args.where_clause + '] ' if args.where_clause else ''}to {table_dir} ...", end="", flush=True)
+    start_time = perf_counter()
+
+    primary_key = get_primary_key(source_conn, source_schema, table_name)
+    paging = args.paging
+    if paging == PAGING_KEYSET and not primary_key:
+        print(" no primary key, using offset paging ...", end="", flush=True)
+        paging = PAGING_OFFSET
+    elif paging == PAGING_KEYSET and get_lossy_key_column(primary_key):
+        print(f" primary key column '{get_lossy_key_column(primary_key).COLUMN_NAME}' cannot be sought exactly, using offset paging ...", end="", flush=True)
+        paging = PAGING_OFFSET
+
+    column_infos = get_copy_columns(source_conn, source_schema, table_name)
+    columns = [column.COLUMN_NAME for column in column_infos]
+    key_indices = [columns.index(column.COLUMN_NAME) for column in primary_key]
+    schema = pyarrow.schema([pyarrow.field(column.COLUMN_NAME, get_arrow_type(column)) for column in column_infos])
+    table_metadata = get_catalog(source_conn, source_schema, table_name).get_table_metadata(table_name)
+
+    # continue after the files of an interrupted export
+    part_file_names = get_part_file_names(table_dir)
+    page_start = 0
+    start_key = None
+    if part_file_names:
+        last_part = read_part_metadata(part_file_names[-1])
+        if last_part['export'] == export_options and paging == PAGING_KEYSET and last_part['last_key']:
+            start_key = tuple(decode_watermark(value, column.DATA_TYPE) for value, column in zip(last_part['last_key'], primary_key))
+        elif last_part['export'] == export_options and paging == PAGING_OFFSET and not args.auto_page_size:
+            page_start = len(part_file_names)
+        else:
+            for file_name in part_file_names:
+                os.remove(file_name)
+            part_file_names = []
+        print(f" continuing after {len(part_file_names)} exported files ..." if part_file_names else " exported files removed, starting over ...", end="", flush=True)
+
+    total_row_count = get_row_count(source_conn, source_schema, table_name, args.where_clause, args.joins)
+    print(f" {total_row_count:_} rows ..." + get_dry_run_text(args.dry_run), end="", flush=True)
+    if args.dry_run:
+        print(" - done")
+        return
+
+    row_bytes = estimate_row_bytes(source_conn, source_schema, table_name)
+    if args.auto_page_size:
+        page_sizer = PageSizer(args.page_size, row_bytes, args.target_page_mb * 1024 * 1024, args.max_page_mb * 1024 * 1024)
     else:
-        if force_rerun:
-            print(f'Forcing re-execution of {id} - ', end="", flush=True)
-        function() # passed as lambda
-    write_progress_track(track_file_name, id, STATUS_SUCCESS)
+        page_sizer = PageSizer(args.page_size)
+    compression = None if args.parquet_compression == 'none' else args.parquet_compression
+
+    def write_part(page_number, rows):
+        part_metadata = {
+            'table': table_name,
+            'schema': source_schema,
+            'part': page_number,
+            'rows': len(rows),
+            'last_key': [encode_watermark(rows[-1][index]) for index in key_indices] if rows else [],
+            'export': export_options,
+            'table_metadata': table_metadata,
+        }
+        arrays = [get_arrow_array([row[index] for row in rows], field.type) for index, field in enumerate(schema)]
+        table = pyarrow.Table.from_arrays(arrays, schema=schema.with_metadata({PARQUET_METADATA_KEY: json.dumps(part_metadata, default=str)}))
+        file_name = os.path.join(table_dir, f'part-{page_number:06d}.parquet')
+        pyarrow.parquet.write_table(table, file_name + '.tmp', compression=compression)
+        os.replace(file_name + '.tmp', file_name)
+
+    os.makedirs(table_dir, exist_ok=True)
+    page_count = len(part_file_names)
+    with source_conn.cursor() as source_cursor:
+        pages = time_pages(read_pages(source_conn, source_cursor, source_schema, table_name, columns, page_start, page_sizer, args.where_clause, args.joins, primary_key, paging, None, start_key))
+        try:
+            for rows, duration_sec_page_read, read_retries, phases in pages:
+                start_time_page_write = perf_counter()
+                page_count += 1
+                write_part(page_count, rows)
+                duration_sec_page_write = perf_counter() - start_time_page_write
+                print(f" {page_count}r({duration_sec_page_read:.1f}s)w({duration_sec_page_write:.1f}s)", end="", flush=True)
+                page_sizer.update(len(rows), duration_sec_page_read + duration_sec_page_write)
+        finally:
+            pages.close()
+
+    if page_count == 0:
+        write_part(1, []) # an empty table still needs a file with the table definition
+
+    part_file_names = get_part_file_names(table_dir)
+    exported_row_count = sum(pyarrow.parquet.read_metadata(file_name).num_rows for file_name in part_file_names)
+    write_json_file(manifest_file_name, {
+        'table': table_name,
+        'schema': source_schema,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'rows': exported_row_count,
+        'parts': [os.path.basename(file_name) for file_name in part_file_names],
+        'export': export_options,
+    })
+    duration_sec = perf_counter() - start_time
+    print(f" - done in {duration_sec:.1f} seconds ({exported_row_count:_} rows in {len(part_file_names)} files)")
+
+def get_exported_table_names(import_dir, schema_name) -> List[str]:
+    """
+    The tables of the schema that were exported completely (with manifest) to the directory.
+    """
+    prefix = f'{schema_name}.'
+    return sorted([name[len(prefix):] for name in os.listdir(import_dir)
+                   if name.startswith(prefix) and os.path.exists(os.path.join(import_dir, name, PARQUET_MANIFEST_FILE))])
+
+def import_table(target_conn, import_dir, source_schema, table_name, target_schema, args):
+    """
+    Import a table exported by export_table: create the target table from the table definition embedded in the
+    files (with --create-table, or truncate it with --truncate-table), load every file in one transaction and
+    create the indices. Every file is tracked in the progress track file on its own, so a restarted import only
+    loads the files that were not loaded before.
+    """
+    table_dir = get_export_table_dir(import_dir, source_schema, table_name)
+    manifest_file_name = os.path.join(table_dir, PARQUET_MANIFEST_FILE)
+    if not os.path.exists(manifest_file_name):
+        raise RuntimeError(f"Table {source_schema}.{table_name} was not exported (completely) to {table_dir}, no {PARQUET_MANIFEST_FILE} found")
+    with open(manifest_file_name, 'r') as file:
+        manifest = json.load(file)
+    part_file_names = [os.path.join(table_dir, name) for name in manifest['parts']]
+    print(f"Importing table {table_name} from {table_dir} ({manifest['rows']:_} rows in {len(part_file_names)} files){get_dry_run_text(args.dry_run)}:", flush=True)
+    start_time = perf_counter()
+
+    catalog = CatalogSnapshot(None, source_schema)
+    catalog.add_table_metadata(table_name, read_part_metadata(part_file_names[0])['table_metadata'])
+
+    def create_table_from_files():
+        create_table_query = get_create_table_query(None, source_schema, table_name, target_schema, catalog=catalog)
+        if not args.dry_run:
+            with target_conn.cursor() as target_cursor:
+                execute_sql(target_cursor, create_table_query)
+            target_conn.commit()
+        print(f"Table {target_schema}.{table_name} created successfully." + get_dry_run_text(args.dry_run))
+
+    if args.truncate_table:
+        execute_with_progress_track(args.progress_file_name, f'truncate_{target_schema}.{table_name}', lambda: truncate_table(target_conn, target_schema, table_name, args.dry_run))
+    elif args.create_table:
+        execute_with_progress_track(args.progress_file_name, f'drop-table_{target_schema}.{table_name}', lambda: drop_table_if_exists(target_conn, target_schema, table_name, args.dry_run))
+        execute_with_progress_track(args.progress_file_name, f'create-table_{target_schema}.{table_name}', create_table_from_files)
+
+    if not args.dry_run:
+        column_infos = get_copy_columns(target_conn, target_schema, table_name)
+        columns = [column.COLUMN_NAME for column in column_infos]
+        identity_columns = [column.COLUMN_NAME for column in column_infos if column.is_identity]
+        insert_sql = f"INSERT INTO {target_schema}.{table_name} ({', '.join(columns)}) VALUES ({', '.join(['?' for _ in columns])})"
+
+        with target_conn.cursor() as target_cursor:
+            if identity_columns:
+                execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{table_name} ON")
+            target_cursor.fast_executemany = True
+            target_cursor.setinputsizes(get_input_sizes(target_conn, target_schema, table_name))
+
+            def load_part(file_name):
+                start_time_part = perf_counter()
+                row_count = 0
+                for batch in pyarrow.parquet.ParquetFile(file_name).iter_batches(batch_size=args.page_size, columns=columns):
+                    rows = list(zip(*[column.to_pylist() for column in batch.columns]))
+                    if rows:
+                        target_cursor.executemany(insert_sql, rows)
+                    row_count += len(rows)
+                target_conn.commit() # one transaction per file
+                print(f"  file {os.path.basename(file_name)}: {row_count:_} rows loaded in {perf_counter() - start_time_part:.1f} seconds", flush=True)
+
+            for file_name in part_file_names:
+                execute_with_progress_track(args.progress_file_name, f'import_{target_schema}.{table_name}.{os.path.basename(file_name)}', lambda: load_part(file_name))
+
+            if identity_columns:
+                execute_sql_with_retry(target_cursor, f"SET IDENTITY_INSERT {target_schema}.{table_name} OFF")
+
+    if args.copy_indices and args.create_table and not args.truncate_table:
+        index_options = get_index_options(args)
+        for index in get_indices_to_copy(None, source_schema, table_name, catalog):
+            def create_index():
+                index_start_time = perf_counter()
+                if not args.dry_run:
+                    with target_conn.cursor() as target_cursor:
+                        execute_sql_with_retry(target_cursor, get_create_index_query(index, target_schema, table_name, index_options))
+                    target_conn.commit()
+                print(f"  index {index.index_name} on {target_schema}.{table_name} created in {perf_counter() - index_start_time:.1f} seconds{get_dry_run_text(args.dry_run)}", flush=True)
+            execute_with_progress_track(args.progress_file_name, f'create-index_{target_schema}.{table_name}.{index.index_name}', create_index)
+
+    print(f"Table {table_name} imported in {perf_counter() - start_time:.1f} seconds.")
 
 def main():
     logging.basicConfig()
@@ -902,6 +3888,42 @@ def main():
     if ARGS.debug_sql:
         sql_logger.setLevel(logging.DEBUG)
 
+    metrics.configure(ARGS.metrics_file_name, ARGS.metrics_prometheus_file_name)
+    if ARGS.profile:
+        profiler.configure(ARGS.profile_report_file_name, ARGS.profile_cprofile, ARGS.profile_memory)
+
+    if ARGS.progress_list:
+        if not ARGS.progress_file_name:
+            parser.error("--progress-list needs --progress-track-file")
+        print_progress_list(ARGS.progress_file_name, ARGS.progress_list)
+        sys.exit(0)
+    if not ARGS.import_dir and not (ARGS.source_server and ARGS.source_db):
+        parser.error("--source-server and --source-db are required (except with --import-dir)")
+    if not ARGS.export_dir and not (ARGS.target_server and ARGS.target_db):
+        parser.error("--target-server and --target-db are required (except with --export-dir)")
+    if ARGS.export_dir and ARGS.import_dir:
+        parser.error("--export-dir and --import-dir cannot be used together, export with one command and import with another")
+    if (ARGS.export_dir or ARGS.import_dir) and not pyarrow_available:
+        parser.error("--export-dir and --import-dir need pyarrow, please install it first (pip install pyarrow)")
+    if ARGS.engine == ENGINE_ARROW and ARGS.writer != WRITER_INSERT:
+        parser.error("--engine arrow inserts the record batches itself and cannot be used with --writer bcp or bulk-insert")
+    if ARGS.incremental and not ARGS.progress_file_name:
+        parser.error("--incremental needs --progress-track-file to store the high-water marks")
+    if ARGS.continuous_sync and not ARGS.progress_file_name:
+        parser.error("--continuous-sync needs --progress-track-file to store the sync versions")
+    if ARGS.scheduler == SCHEDULER_DAG and (ARGS.compare_table or ARGS.compare_view or ARGS.repair or ARGS.continuous_sync):
+        parser.error("--scheduler dag only copies objects, it cannot be used with --compare-table, --compare-view, --repair or --continuous-sync")
+    if ARGS.compare_min_rows < 1:
+        parser.error("--compare-min-rows must be at least 1")
+    if ARGS.writer == WRITER_BCP and ARGS.target_authentication == 'AzureActiveDirectory':
+        # bcp -G would log in with ActiveDirectoryIntegrated, not with the az login identity of the connections (see TokenCache)
+        parser.error("--writer bcp cannot log in with AzureActiveDirectory authentication, please use --writer bulk-insert")
+    if ARGS.writer == WRITER_BCP:
+        print("WARNING: bcp gets the target password on its command line (-P), other users of this machine can read it in the process list. Prefer --writer bulk-insert.")
+
+    connection_pool.max_idle = ARGS.connection_pool_size
+    Session.max_reconnects = ARGS.reconnect_attempts
+
     source_config = { 
         'driver': ARGS.source_driver,
         'server': ARGS.source_server,
@@ -928,147 +3950,124 @@ def main():
         source_schema = source_config['schema']
         target_schema = target_config['schema']
 
-        # Create connections
-        print(f'connecting to source server {source_config["server"]} db {source_config["database"]}... ', end="", flush=True)
-        source_conn = create_connection(source_config)
-        print(' - DONE')
-
-        if ARGS.source_list_tables:
-            print(f'List of all tables (filter is applied if given):')
-            table_names = get_table_names(source_conn, source_schema)
-            for table_name in filter_strings_by_regex(table_names, ARGS.table_filter, ARGS.table_filter_exclude):
-                print(table_name)
-            sys.exit(0)
-
-        print(f'connecting to target server {target_config["server"]} db {target_config["database"]}... ', end="", flush=True)
-        target_conn = create_connection(target_config)
-        print(' - DONE')
-
-        if ARGS.target_list_tables:
-            print(f'List of all tables (filter is applied if given):')
-            table_names = get_table_names(target_conn, target_schema)
-            for table_name in filter_strings_by_regex(table_names, ARGS.table_filter), ARGS.table_filter_exclude:
-                print(table_name)
-            sys.exit(0)
+        # Create connections (no source server for an import, no target server for an export)
+        if not ARGS.import_dir:
+            print(f'connecting to source server {source_config["server"]} db {source_config["database"]}... ', end="", flush=True)
+            source_conn = Session(create_connection(source_config), source_config)
+            print(' - DONE')
+
+            if ARGS.source_list_tables:
+                print(f'List of all tables (filter is applied if given):')
+                table_names = get_table_names(source_conn, source_schema)
+                for table_name in filter_strings_by_regex(table_names, ARGS.table_filter, ARGS.table_filter_exclude):
+                    print(table_name)
+                sys.exit(0)
+
+        if not ARGS.export_dir:
+            print(f'connecting to target server {target_config["server"]} db {target_config["database"]}... ', end="", flush=True)
+            target_conn = Session(create_connection(target_config), target_config)
+            print(' - DONE')
+
+            if ARGS.target_list_tables:
+                print(f'List of all tables (filter is applied if given):')
+                table_names = get_table_names(target_conn, target_schema)
+                for table_name in filter_strings_by_regex(table_names, ARGS.table_filter), ARGS.table_filter_exclude:
+                    print(table_name)
+                sys.exit(0)
 
         table_names = ARGS.tables if ARGS.tables else []
-        if ARGS.copy_all_tables or (table_names is None and ARGS.compare_table):
-            table_names = get_table_names(source_conn, source_schema)
+        # without --table, --compare-table compares all tables
+        if ARGS.copy_all_tables or (not table_names and ARGS.compare_table):
+            table_names = get_exported_table_names(ARGS.import_dir, source_schema) if ARGS.import_dir else get_table_names(source_conn, source_schema)
 
         table_names = filter_strings_by_regex(table_names, ARGS.table_filter, ARGS.table_filter_exclude)
 
+        if ARGS.export_dir or ARGS.import_dir:
+            for table_name in table_names:
+                if ARGS.export_dir:
+                    execute_with_progress_track(ARGS.progress_file_name, f'export_{source_schema}.{table_name}', lambda: export_table(source_conn, source_schema, table_name, ARGS.export_dir, ARGS))
+                else:
+                    import_table(target_conn, ARGS.import_dir, source_schema, table_name, target_schema, ARGS)
+            metrics.finish(success=True)
+            return
+
+        if ARGS.heap_load and table_names and not ARGS.compare_table and not ARGS.compare_view:
+            check_minimal_logging(target_conn, ARGS)
+
+        if ARGS.warm_connections and table_names and not ARGS.compare_table and not ARGS.compare_view:
+            # the workers of the parallel tables, ranges and repairs need one connection pair each, the index workers one target connection
+            table_workers = ARGS.scheduler_workers if ARGS.scheduler == SCHEDULER_DAG else ARGS.parallel_tables
+            data_workers = max(table_workers * max(1, ARGS.range_partitions), ARGS.repair_workers if ARGS.repair else 1)
+            if data_workers > 1:
+                connection_pool.warm(source_config, data_workers)
+            if max(data_workers, ARGS.index_workers if ARGS.copy_indices else 1) > 1:
+                connection_pool.warm(target_config, max(data_workers, ARGS.index_workers))
+
+        if ARGS.scheduler == SCHEDULER_DAG:
+            copy_objects_scheduled(source_config, target_config, source_conn, source_schema, table_names, target_schema, ARGS)
+            metrics.finish(success=True)
+            return
+
+        # with several index workers and one table at a time, the indices of all tables are built together after the data was copied
+        build_indices_later = (ARGS.copy_indices and ARGS.index_workers > 1 and ARGS.parallel_tables <= 1 and ARGS.page_start == 1
+            and not ARGS.compare_table and not ARGS.compare_view and not ARGS.continuous_sync and not ARGS.repair and not ARGS.incremental)
+
+        if ARGS.compare_table or ARGS.compare_view:
+            compare_schema(source_conn, source_schema, target_conn, target_schema, table_names if ARGS.compare_table else [], ARGS)
+
         for table_name in table_names:
 
-            if ARGS.compare_table:
-                compare_table(source_conn, source_schema, table_name, target_conn, target_schema)
-            
-            if not ARGS.compare_table and not ARGS.compare_view:
-                # Determine if we need to re-drop/create (i.e., copy_data was not completed before)
-                id_where_clause = "." + ARGS.where_clause.replace("\r", " ").replace("\n", " ") if ARGS.where_clause else ''
-                id_joins = "." + ".".join(ARGS.joins) if ARGS.joins else ''
-                copy_status_id = f'copy_{source_schema}.{table_name}{id_where_clause}{id_joins}'
-                copy_data_completed = has_progress_track_success(ARGS.progress_file_name, copy_status_id)
-                force_recreate = not copy_data_completed # force drop/create if the copy was not completed before (prevents hanging pyodbc executemany))
-
-                if ARGS.truncate_table:
-                    if ARGS.page_start != 1:
-                        print("WARNING: Setting a start page and truncating the table does not make sense! - ignore the truncation!")
-                    else:
-                        status_id = f'truncate_{target_schema}.{table_name}'
-                        execute_with_progress_track(ARGS.progress_file_name, status_id, lambda: truncate_table(target_conn, target_schema, table_name, ARGS.dry_run))
-                        
-                elif ARGS.create_table:
-                    if ARGS.page_start != 1:
-                        print("WARNING: Setting a start page and recreating the table does not make sense - ignore the table creation!")
-                    else:
-                        status_id = f'drop-table_{target_schema}.{table_name}'
-                        execute_with_progress_track(ARGS.progress_file_name, status_id, lambda: drop_table_if_exists(target_conn, target_schema, table_name, ARGS.dry_run), force_rerun=force_recreate)
-                        
-                        status_id = f'create-table_{target_schema}.{table_name}'
-                        execute_with_progress_track(ARGS.progress_file_name, status_id, lambda: create_table(source_conn, target_conn, source_schema, table_name, target_schema, ARGS.dry_run), force_rerun=force_recreate)
+            if ARGS.repair and not ARGS.compare_table and not ARGS.compare_view:
+                repair_table(source_config, target_config, source_conn, target_conn, source_schema, table_name, target_schema, ARGS)
 
+            elif not ARGS.compare_table and not ARGS.compare_view and not ARGS.continuous_sync and ARGS.parallel_tables <= 1:
+                copy_table(source_conn, target_conn, source_schema, table_name, target_schema, ARGS, source_config, target_config, build_indices_later)
 
-                # drop indices (no need if tables were dropped and recreated just before):
-                if ARGS.drop_indices and not ARGS.create_table:
-                    if ARGS.page_start != 1:
-                        print("WARNING: Setting a start page results in ignoring index dropping!")
-                    else:
-                        status_id = f'drop_indices_{target_schema}.{table_name}'
-                        execute_with_progress_track(ARGS.progress_file_name, status_id, lambda: drop_all_indices(target_conn, target_schema, table_name, ARGS.dry_run))
-                        
-
-                # If a where clause is set and the rows should also be deleted first:
-                if ARGS.where_clause and ARGS.delete_where:
-                    status_id = f'delete_data_{target_schema}.{table_name}{id_where_clause}'
-                    execute_with_progress_track(ARGS.progress_file_name, status_id, lambda: delete_data(target_conn, target_schema, table_name, ARGS.where_clause, ARGS.joins, ARGS.dry_run))
-                    
-
-                # Copy data from source to target
-                if ARGS.copy_data:
-                    # clustered indices cannot be disabled (then insertion is not possible anymore!)
-                    # alter_all_indices(target_conn, target_schema, table_name, 'DISABLE', ARGS.dry_run)
-                    execute_with_progress_track(ARGS.progress_file_name, copy_status_id, lambda: copy_data(source_conn, target_conn, source_schema, table_name, target_schema, ARGS.page_start - 1, ARGS.dry_run, ARGS.page_size, ARGS.where_clause, ARGS.joins))
-                    # alter_all_indices(target_conn, target_schema, table_name, 'REBUILD', ARGS.dry_run)
-
-                # create indices
-                if ARGS.copy_indices:
-                    if ARGS.page_start != 1 and not ARGS.drop_indices:
-                        print("WARNING: Setting a start page results in ignoring index creation!")
-                    else:
-                        status_id = f'copy-indices_{source_schema}.{table_name}'
-                        execute_with_progress_track(ARGS.progress_file_name, status_id, lambda: copy_indices(source_conn, target_conn, source_schema, table_name, target_schema, ARGS.dry_run))
-                
+        if build_indices_later:
+            # build the indices of all tables at the same time (see --index-workers)
+            print(f"Create index object(s) of {len(table_names)} tables with {ARGS.index_workers} workers:", flush=True)
+            num_indices = build_indices(source_conn, target_conn, source_schema, table_names, target_schema, ARGS.dry_run, get_index_options(ARGS), ARGS.index_workers, target_config, ARGS.progress_file_name)
+            print(f"{num_indices} indices created successfully." + get_dry_run_text(ARGS.dry_run))
+
+        if not ARGS.compare_table and not ARGS.compare_view and not ARGS.continuous_sync and not ARGS.repair and ARGS.parallel_tables > 1:
+            copy_tables_parallel(source_config, target_config, source_conn, source_schema, table_names, target_schema, ARGS)
+
+        if ARGS.continuous_sync and table_names and not ARGS.compare_table and not ARGS.compare_view and not ARGS.repair:
+            continuous_sync(source_conn, target_conn, source_schema, table_names, target_schema, ARGS, source_config, target_config)
 
         # copy views
-        if ARGS.copy_view or ARGS.compare_view:
-            view_definitions = fetch_view_definitions(source_conn, source_schema, target_schema)
-            view_names = []
-            if ARGS.views:
-                view_names = ARGS.views
-                #print(f"view names: {view_names}")
-            else:
-                for view_name, view_definition in view_definitions:
-                    view_names.append(view_name)
-                view_names = filter_strings_by_regex(view_names, ARGS.view_filter, ARGS.view_filter_exclude)
-                print(f"view names: {view_names}")
-            
-            view_definitions = [(name, definition) for name, definition in view_definitions if name in view_names]
+        if ARGS.copy_view and not ARGS.compare_view:
+            view_definitions = get_view_definitions_to_copy(source_conn, source_schema, target_schema, ARGS)
             # print(f"view definitions to process: {view_definitions}")
 
-            if ARGS.compare_view:
-                compare_views(source_conn, source_schema, view_definitions, target_conn, target_schema)
-            else:
-                if ARGS.copy_view:
-                    # ignore progress/status here, as operation is fast!
-                    create_views(target_conn, target_schema, view_definitions, ARGS.dry_run)
+            # a view can use other views, so they are created in the order of their dependencies
+            view_order = sort_by_dependencies([name for name, definition in view_definitions], get_object_dependencies(source_conn, source_schema))
+            view_definitions = sorted(view_definitions, key=lambda view_definition: view_order.index(view_definition[0]))
+            # ignore progress/status here, as operation is fast!
+            create_views(target_conn, target_schema, view_definitions, ARGS.dry_run)
 
         # copy synonyms
-        if ARGS.copy_synonym:
-            synonym_definitions = fetch_synonym_definitions(source_conn, source_schema, target_schema)
-            synonym_names = []
-            if ARGS.synonyms:
-                synonym_names = ARGS.synonyms
-            else:
-                for synonym_name, base_object_name in synonym_definitions:
-                    synonym_names.append(synonym_name)
-                synonym_names = filter_strings_by_regex(synonym_names, ARGS.synonym_filter, ARGS.synonym_filter_exclude)
-                print(f"synonym names: {synonym_names}")
-
-            synonym_definitions = [(name, base_object) for name, base_object in synonym_definitions if name in synonym_names]
+        if ARGS.copy_synonym and not ARGS.compare_view:
+            synonym_definitions = get_synonym_definitions_to_copy(source_conn, source_schema, target_schema, ARGS)
 
             if ARGS.copy_synonym:
                 # ignore progress/status here, as operation is fast!
                 create_synonyms(target_conn, target_schema, synonym_definitions, ARGS.dry_run)
 
+        metrics.finish(success=True)
+
     except Exception as e:
         print(f"An error occurred: {e}")
         traceback.print_exc(file=sys.stdout)
+        metrics.finish(success=False)
         sys.exit(-1)
     finally:
         if source_conn:
             source_conn.close()
         if target_conn:
             target_conn.close()
+        connection_pool.close_all()
+        token_cache.stop()
 
 
 if __name__ == '__main__':
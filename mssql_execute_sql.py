@@ -1,23 +1,14 @@
 #!/usr/bin/env -S uv run --script
 
-# pip install azure-identity
-# from https://stackoverflow.com/questions/58440480/connect-to-azure-sql-in-python-with-mfa-active-directory-interactive-authenticat
-
-try:
-    from azure.identity import AzureCliCredential
-    azure_identity_available = True
-except ImportError:
-    azure_identity_available = False
-
-import pyodbc
 from time import perf_counter
 from datetime import datetime
 
 import sys, traceback
-import struct
 import argparse
 import logging
 
+from mssql_connection import create_connection
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Execute an sql command on an sql server')
 
@@ -34,37 +25,6 @@ def parse_args():
 
     return parser
 
-# Function to create a connection',
-def create_connection(config) -> pyodbc.Connection:
-#    conn_str = f'DRIVER={config["driver"]};SERVER={config["server"]};DATABASE={config["database"]};UID={config["user"]};PWD={config["password"]};Encrypt=Yes;TrustServerCertificate=Yes;'
-# jdbc:sqlserver://portal-int-cl1-prod-sqlserver.database.windows.net:1433;encrypt=true;trustServerCertificate=false;hostNameInCertificate=*.database.windows.net;loginTimeout=30;authentication=ActiveDirectoryPassword
-
-    conn_str = f'DRIVER={config["driver"]};SERVER={config["server"]};DATABASE={config["database"]};Encrypt=Yes;TrustServerCertificate=Yes;hostNameInCertificate=*.database.windows.net;loginTimeout=30'
-    attrs_before = None
-
-    if "authentication" in config and config["authentication"]  == 'AzureActiveDirectory':
-        if not azure_identity_available:
-            print("For AzureActiveDirectory authentication, please install azure-identity first!")
-            sys.exit(-1)
-
-        # Use the cli credential to get a token after the user has signed in via the Azure CLI 'az login' command.
-        credential = AzureCliCredential()
-        databaseToken = credential.get_token('https://database.windows.net/')
-
-        # get bytes from token obtained
-        tokenb = bytes(databaseToken[0], "UTF-16-LE")
-        tokenstruct = struct.pack("=i", len(tokenb)) + tokenb;
-        SQL_COPT_SS_ACCESS_TOKEN = 1256 
-        attrs_before = {SQL_COPT_SS_ACCESS_TOKEN:tokenstruct}
-        print(f'using authentication {config["authentication"]}...', end="")
-
-    else:
-        # username/password:    
-        conn_str = conn_str + f';UID={config["user"]};PWD={config["password"]}'
-        print(f'using authentication username/password', end="")
-    
-    return pyodbc.connect(conn_str, attrs_before = attrs_before)
-
 def execute_sql(connection, sql_commands):
     cursor = connection.cursor()
     for sql_command in sql_commands:
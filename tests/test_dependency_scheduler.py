@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+pytest.importorskip("pyodbc")
+
+from mssql_copy_table import DependencyScheduler
+
+lock = threading.Lock()
+
+
+def record(calls, key, fail=False):
+    """
+    A node function that appends its key to calls (and fails if requested).
+    """
+    def function():
+        with lock:
+            calls.append(key)
+        if fail:
+            raise RuntimeError(f"{key} failed")
+    return function
+
+
+def test_dependencies_run_first():
+    calls = []
+    scheduler = DependencyScheduler(4)
+    scheduler.add(('view', 'V'), record(calls, ('view', 'V')), [('table', 'A'), ('table', 'B')])
+    scheduler.add(('table', 'A'), record(calls, ('table', 'A')))
+    scheduler.add(('table', 'B'), record(calls, ('table', 'B')), [('table', 'MISSING')])
+
+    done, failed, skipped = scheduler.run()
+
+    assert sorted(done) == [('table', 'A'), ('table', 'B'), ('view', 'V')]
+    assert failed == [] and skipped == []
+    assert calls[-1] == ('view', 'V')
+
+
+def test_failure_skips_dependent_subtree():
+    calls = []
+    scheduler = DependencyScheduler(2)
+    scheduler.add(('table', 'A'), record(calls, ('table', 'A'), fail=True))
+    scheduler.add(('index', 'A'), record(calls, ('index', 'A')), [('table', 'A')])
+    scheduler.add(('view', 'V'), record(calls, ('view', 'V')), [('table', 'A')])
+    scheduler.add(('view', 'W'), record(calls, ('view', 'W')), [('view', 'V')])
+    scheduler.add(('table', 'B'), record(calls, ('table', 'B')))
+
+    done, failed, skipped = scheduler.run()
+
+    assert done == [('table', 'B')]
+    assert failed == [('table', 'A')]
+    assert sorted(skipped) == [('index', 'A'), ('view', 'V'), ('view', 'W')]
+    assert sorted(calls) == [('table', 'A'), ('table', 'B')]
+
+
+def test_cycle_is_skipped():
+    calls = []
+    scheduler = DependencyScheduler(2)
+    scheduler.add(('view', 'X'), record(calls, ('view', 'X')), [('view', 'Y')])
+    scheduler.add(('view', 'Y'), record(calls, ('view', 'Y')), [('view', 'X')])
+    scheduler.add(('view', 'Z'), record(calls, ('view', 'Z')), [('view', 'X')])
+    scheduler.add(('table', 'A'), record(calls, ('table', 'A')), [('table', 'A')])
+
+    done, failed, skipped = scheduler.run()
+
+    assert done == [('table', 'A')]
+    assert failed == []
+    assert sorted(skipped) == [('view', 'X'), ('view', 'Y'), ('view', 'Z')]
+    assert calls == [('table', 'A')]
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("pyodbc")
+
+from mssql_copy_table import ProgressStore, STATUS_CHECKPOINT, STATUS_ERROR, STATUS_START, STATUS_SUCCESS, STATUS_WATERMARK
+
+
+def write_text_file(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+
+
+def test_migrated_success_is_final(tmp_path):
+    file_name = tmp_path / 'progress.txt'
+    write_text_file(file_name, [
+        'copy_dbo.A: START @2024-05-01T02:00:00',
+        'copy_dbo.A: SUCCESS @2024-05-01T02:10:00',
+        'copy_dbo.A: START @2024-05-02T02:00:00',
+        'copy_dbo.B: START @2024-05-01T02:00:00',
+        'copy_dbo.B: ERROR connection lost @2024-05-01T02:05:00',
+        'copy_dbo.C: START @2024-05-01T02:00:00',
+    ])
+
+    store = ProgressStore(str(file_name))
+
+    assert store.get_status('copy_dbo.A') == STATUS_SUCCESS
+    assert store.has_success('copy_dbo.A')
+    assert store.get_status('copy_dbo.B') == STATUS_ERROR
+    assert store.get_status('copy_dbo.C') == STATUS_START
+    assert (tmp_path / 'progress.txt.txt').exists()
+
+
+def test_migrated_values(tmp_path):
+    file_name = tmp_path / 'progress.txt'
+    write_text_file(file_name, [
+        'copy_dbo.A: WATERMARK 2024-05-01 @2024-05-01T02:00:00',
+        'copy_dbo.A: WATERMARK 2024-05-02 @2024-05-02T02:00:00',
+        'copy_dbo.B: CHECKPOINT [17] @2024-05-01T02:00:00',
+        'not a progress line',
+    ])
+
+    store = ProgressStore(str(file_name))
+
+    assert store.get_value('copy_dbo.A', STATUS_WATERMARK) == '2024-05-02'
+    assert store.get_value('copy_dbo.B', STATUS_CHECKPOINT) == '[17]'
+    assert ProgressStore(str(file_name)).get_value('copy_dbo.A', STATUS_WATERMARK) == '2024-05-02'